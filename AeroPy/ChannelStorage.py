@@ -0,0 +1,389 @@
+"""
+Typed per-channel sample storage for a collection session.
+
+Each channel configured in TrignoBase.ConfigureCollectionOutput() gets a ChannelBuffer sized from the channel's
+SampleRate. Samples are kept in preallocated NumPy chunks instead of Python lists, so appends are O(1) amortized,
+no per-sample float objects are created and the data can be handed to export/plotting as NumPy views.
+See DataManager.py for a usage example.
+
+For long sessions CollectionStorage(spill_directory=...) creates SpillingChannelBuffers instead: only the newest
+chunks of each channel stay in memory, older samples are appended to one raw file per channel in a session
+directory and read back through a memory map, so memory use stays flat whatever the session length.
+"""
+import json
+import math
+import os
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+FSYNC_POLICIES = ('never', 'chunk', 'close')
+
+
+class ChannelBuffer():
+    """Chunked, typed sample store for a single channel"""
+
+    def __init__(self, sample_rate, dtype=np.float64, chunk_seconds=10.0):
+        self.sample_rate = float(sample_rate)
+        self.dtype = np.dtype(dtype)
+        self.chunk_length = max(1024, int(math.ceil(self.sample_rate * chunk_seconds)))
+        self._chunks = []  # Full chunks, each exactly self.chunk_length samples (merged chunks may be longer)
+        self._current = np.empty(self.chunk_length, dtype=self.dtype)
+        self._current_len = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def append(self, samples):
+        """Append a block of samples (any sequence or array) to the channel"""
+        block = np.asarray(samples, dtype=self.dtype).ravel()
+        remaining = block.size
+        offset = 0
+        while remaining > 0:
+            space = self.chunk_length - self._current_len
+            count = min(space, remaining)
+            self._current[self._current_len:self._current_len + count] = block[offset:offset + count]
+            self._current_len += count
+            offset += count
+            remaining -= count
+            if self._current_len == self.chunk_length:
+                self._chunks.append(self._current)
+                self._current = np.empty(self.chunk_length, dtype=self.dtype)
+                self._current_len = 0
+        self._length += block.size
+
+    def chunks(self):
+        """Return zero-copy views of every filled region, oldest first"""
+        views = list(self._chunks)
+        if self._current_len > 0:
+            views.append(self._current[:self._current_len])
+        return views
+
+    def view(self):
+        """Return the channel as one contiguous array.
+
+        Zero-copy while the data fits in the open chunk. Otherwise everything written so far is merged once into a
+        single block that later calls reuse, so repeated exports/reads of an unchanged channel do not copy again.
+        """
+        if not self._chunks:
+            return self._current[:self._current_len]
+        if len(self._chunks) > 1 or self._current_len > 0:
+            self._chunks = [np.concatenate(self.chunks())]
+            self._current_len = 0
+        return self._chunks[0]
+
+    def latest(self, count):
+        """Return the newest count samples (zero-copy when they are all in the open chunk).
+        Does not merge chunks, so it is safe to call from a reader thread while the acquisition thread appends."""
+        count = min(int(count), self._length)
+        if count <= self._current_len:
+            return self._current[self._current_len - count:self._current_len]
+        tail = []
+        needed = count
+        for chunk in reversed(self.chunks()):
+            tail.append(chunk[max(0, chunk.size - needed):])
+            needed -= tail[-1].size
+            if needed <= 0:
+                break
+        return np.concatenate(tail[::-1])
+
+    def clear(self):
+        """Drop all samples but keep the channel configuration"""
+        self._chunks = []
+        self._current = np.empty(self.chunk_length, dtype=self.dtype)
+        self._current_len = 0
+        self._length = 0
+
+    @property
+    def nbytes(self):
+        """Bytes allocated for this channel (including unused space in the open chunk)"""
+        return sum(chunk.nbytes for chunk in self._chunks) + self._current.nbytes
+
+
+class SpillingChannelBuffer():
+    """Channel store with a fixed in-memory window, older samples are appended to a file on disk.
+
+    Same interface as ChannelBuffer. Every full chunk is written to `filename` (raw samples, native byte order)
+    and the newest `memory_chunks` full chunks plus the open chunk stay in memory for latest(). view() writes out
+    the open chunk and returns a read-only np.memmap over the whole file, one continuous logical array.
+
+    Parameters:
+        fsync: 'never' leave flushing to the OS, 'chunk' fsync after every chunk written,
+               'close' fsync when the channel is flushed for readers (view()/flush()) or closed
+    """
+
+    def __init__(self, sample_rate, filename, dtype=np.float64, chunk_seconds=10.0, memory_chunks=2, fsync='chunk'):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("fsync must be one of " + ", ".join(FSYNC_POLICIES))
+        self.sample_rate = float(sample_rate)
+        self.dtype = np.dtype(dtype)
+        self.chunk_length = max(1024, int(math.ceil(self.sample_rate * chunk_seconds)))
+        self.fsync = fsync
+        self.filename = filename
+        self._file = open(filename, 'w+b')
+        self._window = deque(maxlen=max(0, int(memory_chunks)))  # Newest full chunks, already in the file
+        self._current = np.empty(self.chunk_length, dtype=self.dtype)
+        self._current_len = 0
+        self._current_written = 0   # Samples of the open chunk already in the file
+        self._length = 0
+        self._file_length = 0       # Samples in the file
+        self._map = None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def append(self, samples):
+        """Append a block of samples (any sequence or array) to the channel"""
+        block = np.asarray(samples, dtype=self.dtype).ravel()
+        remaining = block.size
+        offset = 0
+        while remaining > 0:
+            space = self.chunk_length - self._current_len
+            count = min(space, remaining)
+            self._current[self._current_len:self._current_len + count] = block[offset:offset + count]
+            self._current_len += count
+            offset += count
+            remaining -= count
+            if self._current_len == self.chunk_length:
+                self._write_pending()
+                if self.fsync == 'chunk':
+                    self._sync()
+                self._window.append(self._current)
+                self._current = np.empty(self.chunk_length, dtype=self.dtype)
+                self._current_len = 0
+                self._current_written = 0
+        self._length += block.size
+
+    def _write_pending(self):
+        pending = self._current[self._current_written:self._current_len]
+        if pending.size:
+            self._file.write(pending.tobytes())
+            self._file_length += pending.size
+            self._current_written = self._current_len
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _mapped(self, length):
+        """Read-only memory map of the first `length` samples of the file"""
+        if length == 0:
+            return np.empty(0, dtype=self.dtype)
+        if self._map is None or len(self._map) != length:
+            self._map = np.memmap(self.filename, dtype=self.dtype, mode='r', shape=(length,))
+        return self._map
+
+    def flush(self):
+        """Write the open chunk to the file so that the file holds every sample"""
+        self._write_pending()
+        if self.fsync == 'never':
+            self._file.flush()
+        else:
+            self._sync()
+
+    def chunks(self):
+        """Return the file contents (memory mapped) and the samples not written yet, oldest first"""
+        views = []
+        if self._file_length:
+            views.append(self._mapped(self._file_length))
+        if self._current_len > self._current_written:
+            views.append(self._current[self._current_written:self._current_len])
+        return views
+
+    def view(self):
+        """Return the whole channel as one read-only memory-mapped array (flushes the open chunk first)"""
+        self.flush()
+        return self._mapped(self._file_length)
+
+    def latest(self, count):
+        """Return the newest count samples, from memory when they are inside the window.
+        Safe to call from a reader thread while the acquisition thread appends."""
+        count = min(int(count), self._length)
+        if count <= self._current_len:
+            return self._current[self._current_len - count:self._current_len]
+        tail = [self._current[:self._current_len]]
+        needed = count - self._current_len
+        for chunk in reversed(list(self._window)):
+            tail.append(chunk[max(0, chunk.size - needed):])
+            needed -= tail[-1].size
+            if needed <= 0:
+                break
+        if needed > 0:
+            # Older than the window: read the missing part back from the file
+            self._file.flush()
+            start = self._length - count
+            tail.append(np.array(self._mapped(self._file_length)[start:start + needed]))
+        return np.concatenate(tail[::-1])
+
+    def clear(self):
+        """Drop all samples but keep the channel configuration (the file is truncated)"""
+        self._map = None
+        try:
+            self._file.seek(0)
+            self._file.truncate()
+        except OSError:
+            # The old file is still mapped by a reader (Windows refuses to truncate it): start a new file
+            self._file.close()
+            root, ext = os.path.splitext(self.filename)
+            self.filename = root.split('+')[0] + '+' + time.strftime("%H%M%S") + ext
+            self._file = open(self.filename, 'w+b')
+        self._window.clear()
+        self._current = np.empty(self.chunk_length, dtype=self.dtype)
+        self._current_len = 0
+        self._current_written = 0
+        self._length = 0
+        self._file_length = 0
+
+    def close(self):
+        """Flush and close the file, the samples stay on disk"""
+        if not self._file.closed:
+            self._write_pending()
+            self._file.flush()
+            if self.fsync != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory for this channel (the window and the open chunk, not the file)"""
+        return sum(chunk.nbytes for chunk in self._window) + self._current.nbytes
+
+    @property
+    def disk_bytes(self):
+        return self._file_length * self.dtype.itemsize
+
+
+class CollectionStorage():
+    """Ordered set of ChannelBuffers, indexed by position (DataKernel output order) or by channel GUID
+
+    Parameters:
+        spill_directory: None keeps every sample in memory. Otherwise channels are SpillingChannelBuffers writing to
+                         a new session directory created inside spill_directory for each channel layout
+        memory_chunks: full chunks per channel kept in memory when spilling
+        fsync: fsync policy of the spill files, see SpillingChannelBuffer
+        name: prefix of the session directory (e.g. 'data', 'times')
+    """
+
+    def __init__(self, dtype=np.float64, chunk_seconds=10.0, spill_directory=None, memory_chunks=2, fsync='chunk',
+                 name='data'):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("fsync must be one of " + ", ".join(FSYNC_POLICIES))
+        self.dtype = np.dtype(dtype)
+        self.chunk_seconds = chunk_seconds
+        self.spill_directory = spill_directory
+        self.memory_chunks = memory_chunks
+        self.fsync = fsync
+        self.name = name
+        self.session_directory = None   # Created with the first spilling channel
+        self.channels = []
+        self.channel_guids = []
+        self._guid_index = {}
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self.channels[item]
+        return self.channels[self._guid_index[str(item)]]
+
+    def __iter__(self):
+        return iter(self.channels)
+
+    def add_channel(self, guid, sample_rate, dtype=None):
+        """Create the buffer for a channel. Call in the same order as TrignoBase.channel_guids"""
+        dtype = self.dtype if dtype is None else dtype
+        if self.spill_directory is None:
+            buffer = ChannelBuffer(sample_rate, dtype, self.chunk_seconds)
+        else:
+            if self.session_directory is None:
+                os.makedirs(self.spill_directory, exist_ok=True)
+                self.session_directory = tempfile.mkdtemp(
+                    prefix=self.name + time.strftime("_%Y%m%d_%H%M%S_"), dir=self.spill_directory)
+            filename = os.path.join(self.session_directory, "channel_%03d.bin" % len(self.channels))
+            buffer = SpillingChannelBuffer(sample_rate, filename, dtype, self.chunk_seconds,
+                                           self.memory_chunks, self.fsync)
+        self._guid_index[str(guid)] = len(self.channels)
+        self.channel_guids.append(guid)
+        self.channels.append(buffer)
+        if self.session_directory is not None:
+            self._write_manifest()
+        return buffer
+
+    def _write_manifest(self):
+        """channels.json in the session directory: GUID, sample rate, dtype and file of every channel"""
+        manifest = {'channels': [{'guid': str(guid),
+                                  'sample_rate': channel.sample_rate,
+                                  'dtype': channel.dtype.str,
+                                  'file': os.path.basename(channel.filename)}
+                                 for guid, channel in zip(self.channel_guids, self.channels)]}
+        with open(os.path.join(self.session_directory, 'channels.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    def append(self, channel_index, samples):
+        self.channels[channel_index].append(samples)
+
+    def reset(self):
+        """Drop all samples, keep the channel layout (used for repeated collections on an Armed pipeline)"""
+        for channel in self.channels:
+            channel.clear()
+        if self.session_directory is not None:
+            self._write_manifest()
+
+    def clear(self):
+        """Drop all channels (spill files of the previous layout stay on disk)"""
+        for channel in self.channels:
+            if isinstance(channel, SpillingChannelBuffer):
+                channel.close()
+        self.session_directory = None
+        self.channels = []
+        self.channel_guids = []
+        self._guid_index = {}
+
+    def views(self):
+        """Return one contiguous NumPy array per channel, in channel order"""
+        return [channel.view() for channel in self.channels]
+
+    def flush(self):
+        """Write out every spilling channel (no-op for in-memory channels)"""
+        for channel in self.channels:
+            if isinstance(channel, SpillingChannelBuffer):
+                channel.flush()
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory (spilled samples are not counted)"""
+        return sum(channel.nbytes for channel in self.channels)
+
+    @property
+    def disk_bytes(self):
+        return sum(getattr(channel, 'disk_bytes', 0) for channel in self.channels)
+
+    def memory_report(self):
+        """Summarize memory use of the session: total bytes plus samples and bytes per channel"""
+        return {
+            'total_bytes': self.nbytes,
+            'disk_bytes': self.disk_bytes,
+            'session_directory': self.session_directory,
+            'total_samples': sum(len(channel) for channel in self.channels),
+            'channels': [{'guid': str(guid),
+                          'sample_rate': channel.sample_rate,
+                          'samples': len(channel),
+                          'bytes': channel.nbytes}
+                         for guid, channel in zip(self.channel_guids, self.channels)]
+        }
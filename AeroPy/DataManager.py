@@ -3,8 +3,14 @@ This is the class that handles the data that is output from the Delsys Trigno Ba
 Create an instance of this and pass it a reference to the Trigno base for initialization.
 See CollectDataController.py for a usage example.
 """
+import time
+
 import numpy as np
 
+from AeroPy.ChannelStorage import CollectionStorage
+from AeroPy.NetConversion import to_float64, to_time_value
+from AeroPy.SampleClock import SampleClock
+
 
 class DataKernel():
     def __init__(self, trigno_base):
@@ -13,23 +19,55 @@ class DataKernel():
         self.packetCount = 0
         self.sampleCount = 0
         
-        # Initialize with empty lists for each channel
-        self.allcollectiondata = [[] for _ in range(len(trigno_base.channel_guids))]
+        # Typed per-channel sample storage, channels are added in TrignoBase.ConfigureCollectionOutput()
+        self.allcollectiondata = CollectionStorage()
+        self.allcollectiontimes = CollectionStorage()   # (T) time stamps, only filled when streaming YT data
         self.channel1time = []
         self.channel_guids = []
+        self.stream_writer = None   # StreamingCsvWriter fed with every packet while collecting (optional)
+        self.processor = None       # EmgProcessor run on every packet (optional), set up in configureProcessing()
+        self.allenvelopedata = CollectionStorage()      # Processor output, one channel per processed (EMG) channel
+        self.detector = None        # ThrowDetector fed with every packet and its envelopes (optional)
+        self.clock = SampleClock()  # Per-channel sample clock (time of every sample), set up in configureProcessing()
+        self.instrumentation = None # PipelineInstrumentation: poll/process timings and samples per channel (optional)
+
+    def setStorage(self, spill_directory=None, chunk_seconds=10.0, memory_chunks=2, fsync='chunk'):
+        """Replace the sample storages, call before the channels are configured.
+           spill_directory: None keeps the session in memory, otherwise only the newest memory_chunks chunks of
+           chunk_seconds per channel stay in memory and older samples are appended to memory-mapped files in a
+           session directory created there (fsync: 'never', 'chunk' or 'close', see ChannelStorage.py)"""
+        for storage in (self.allcollectiondata, self.allcollectiontimes, self.allenvelopedata):
+            storage.clear()
+        options = dict(chunk_seconds=chunk_seconds, spill_directory=spill_directory, memory_chunks=memory_chunks,
+                       fsync=fsync)
+        self.allcollectiondata = CollectionStorage(name='data', **options)
+        self.allcollectiontimes = CollectionStorage(name='times', **options)
+        self.allenvelopedata = CollectionStorage(name='envelope', **options)
 
     def processData(self, data_queue):
-        """Processes the data from the DelsysAPI and place it in the data_queue argument"""
+        """Processes the data from the DelsysAPI and place it in the data_queue argument (a FrameQueue)
+           Returns True if a packet was received"""
+        poll_start = time.perf_counter()
         outArr = self.GetData()
-        if outArr is not None:
+        if outArr is None:
+            return False
+        else:
+            instrumentation = self.instrumentation
+            if instrumentation is not None:
+                instrumentation.record('poll', time.perf_counter() - poll_start)
+                instrumentation.count_samples([outArr[i][0] for i in range(len(outArr))])
             for i in range(len(outArr)):
-                self.allcollectiondata[i].extend(outArr[i][0].tolist())
+                self.allcollectiondata.append(i, outArr[i][0])
+            self.clock.advance([len(outArr[i][0]) for i in range(len(outArr))])
+            envelopes = self.processEnvelopes([outArr[i][0] for i in range(len(outArr))])
+            self.detectThrows([outArr[i][0] for i in range(len(outArr))], envelopes)
+            stream_writer = self.stream_writer
+            if stream_writer is not None:
+                stream_writer.write_block([outArr[i][0] for i in range(len(outArr))])
             try:
-                for i in range(len(outArr[0])):
-                    if np.asarray(outArr[0]).ndim == 1:
-                        data_queue.append(list(np.asarray(outArr, dtype='object')[0]))
-                    else:
-                        data_queue.append(list(np.asarray(outArr, dtype='object')[:, i]))
+                data_queue.push([outArr[i][0] for i in range(len(outArr))], poll_start)
+                if instrumentation is not None:
+                    instrumentation.record('process', time.perf_counter() - poll_start)
                 try:
                     self.packetCount += len(outArr[0])
                     self.sampleCount += len(outArr[0][0])
@@ -37,29 +75,86 @@ class DataKernel():
                     pass
             except IndexError:
                 pass
+            return True
 
     def processYTData(self, data_queue):
-        """Processes the data from the DelsysAPI and place it in the data_queue argument"""
+        """Processes the data from the DelsysAPI and place it in the data_queue argument (a FrameQueue)
+           Returns True if a packet was received"""
+        poll_start = time.perf_counter()
         outArr = self.GetYTData()
-        if outArr is not None:
-            for i in range(len(outArr)):
-                self.allcollectiondata[i].extend(outArr[i][0].tolist())
+        if outArr is None:
+            return False
+        else:
+            instrumentation = self.instrumentation
+            if instrumentation is not None:
+                instrumentation.record('poll', time.perf_counter() - poll_start)
+                instrumentation.count_samples([outArr[i][0] for i in range(len(outArr))])
             try:
                 yt_outArr = []
                 for i in range(len(outArr)):
-                    chan_yt = outArr[i]
-                    chan_ydata = np.asarray([k.Item2 for k in chan_yt[0]], dtype='object')
+                    chan_ydata, chan_tdata = outArr[i]
+                    self.allcollectiontimes.append(i, chan_tdata)
+                    self.allcollectiondata.append(i, chan_ydata)
                     yt_outArr.append(chan_ydata)
-
-                data_queue.append(list(yt_outArr))
+                self.clock.advance([len(chan) for chan in yt_outArr],
+                                   [outArr[i][1][0] if len(outArr[i][1]) else np.nan for i in range(len(outArr))])
+                envelopes = self.processEnvelopes(yt_outArr)
+                self.detectThrows(yt_outArr, envelopes)
+
+                stream_writer = self.stream_writer
+                if stream_writer is not None:
+                    stream_writer.write_block(yt_outArr, [outArr[i][1] for i in range(len(outArr))])
+                data_queue.push(yt_outArr, poll_start)
+                if instrumentation is not None:
+                    instrumentation.record('process', time.perf_counter() - poll_start)
 
                 try:
-                    self.packetCount += len(outArr[0])
+                    self.packetCount += 1
                     self.sampleCount += len(outArr[0][0])
                 except:
                     pass
             except IndexError:
                 pass
+            return True
+
+    def processEnvelopes(self, channel_values):
+        """Run the EMG processor on a packet and store the envelopes. Returns the envelopes (empty without processor)"""
+        processor = self.processor
+        if processor is None:
+            return []
+        envelopes = processor.process(channel_values)
+        for i, envelope in enumerate(envelopes):
+            self.allenvelopedata.append(i, envelope)
+        return envelopes
+
+    def detectThrows(self, channel_values, envelopes):
+        """Run the throw detector on a packet"""
+        detector = self.detector
+        if detector is not None:
+            detector.process(channel_values, envelopes)
+
+    def configureProcessing(self, channels):
+        """Set up the clock and processing for a channel layout: list of (guid, sample rate, channel type) in
+           packet order"""
+        self.clock.configure([guid for guid, _, _ in channels], [rate for _, rate, _ in channels])
+        self.allenvelopedata.clear()
+        envelope_channels = []
+        if self.processor is not None:
+            self.processor.configure(channels)
+            envelope_channels = list(zip(self.processor.channel_guids, self.processor.channel_rates))
+            for guid, sample_rate in envelope_channels:
+                self.allenvelopedata.add_channel(guid, sample_rate)
+        if self.detector is not None:
+            self.detector.configure(channels, envelope_channels, self.clock)
+
+    def resetProcessing(self):
+        """Clear filter state, envelopes and detected throws before a new collection on the same channel layout"""
+        self.clock.reset()
+        self.allenvelopedata.reset()
+        if self.processor is not None:
+            self.processor.reset()
+        if self.detector is not None:
+            self.detector.reset()
 
     def GetData(self):
         """ Check if data ready from DelsysAPI via Aero CheckDataQueue() - Return True if data is ready
@@ -78,7 +173,7 @@ class DataKernel():
 
                     for j in range(len(self.trigno_base.channel_guids)):            #Loop all channels set during configuration (default behavior is all channels unless updated)
                         chan_data = DataOut[self.trigno_base.channel_guids[j]]      # Index a single channels data from the dictionary based on unique channel GUID (key)
-                        outArr[j].append(np.asarray(chan_data, dtype='object'))     # Create a NumPy array of the channel data and add to the output array
+                        outArr[j].append(to_float64(chan_data))                      # Bulk copy the channel data into a float64 NumPy array
 
                     return outArr
             except Exception as e:
@@ -92,7 +187,7 @@ class DataKernel():
             Get data (PollYTData)
             Organize output channels by their GUID keys
 
-            Return array of all channel data
+            Return array of all channel data - each entry is [values, times] (float64 arrays)
         """
 
         dataReady = self.TrigBase.CheckYTDataQueue()                        # Check if DelsysAPI real-time data queue is ready to retrieve
@@ -104,7 +199,9 @@ class DataKernel():
 
                     for j in range(len(self.trigno_base.channel_guids)):            #Loop all channels set during configuration (default behavior is all channels unless updated)
                         chan_yt_data = DataOut[self.trigno_base.channel_guids[j]]    # Index a single channels data from the dictionary based on unique channel GUID (key)
-                        outArr[j].append(np.asarray(chan_yt_data, dtype='object'))  # Create a NumPy array of the channel data and add to the output array
+                        chan_times, chan_values = to_time_value(chan_yt_data)         # Bulk copy into separate float64 (T) and (Y) arrays
+                        outArr[j].append(chan_values)
+                        outArr[j].append(chan_times)
 
                     return outArr
 
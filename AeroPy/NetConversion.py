@@ -0,0 +1,98 @@
+"""
+Bulk conversion of DelsysAPI (.NET) sample containers to NumPy arrays.
+
+PollData() returns Dictionary<Guid, List<double>> and PollYTData() returns Dictionary<Guid, List<(double, double)>>.
+Iterating those lists from Python crosses the pythonnet interop boundary once per sample. The helpers here copy a
+whole channel in one call instead:
+    List<double>           -> ToArray() + Marshal.Copy into a preallocated float64 array
+    List<(double, double)> -> ToArray() pinned with GCHandle + one memmove into an (n, 2) float64 array
+If the fast path is not available (no CLR loaded, plain Python sequences from a simulator, unexpected layout) the
+helpers fall back to a single Python-level pass per channel.
+"""
+import ctypes
+import sys
+
+import numpy as np
+
+_interop = None          # Cached (IntPtr, Int64, Marshal, GCHandle, GCHandleType) once the CLR is loaded
+_yt_fast_path = True     # Disabled if the pinned (T, Y) layout ever fails validation
+
+
+def _get_interop():
+    """Resolve the .NET interop types lazily so importing this module never loads a CLR runtime"""
+    global _interop
+    if _interop is None and 'clr' in sys.modules:
+        try:
+            from System import IntPtr, Int64
+            from System.Runtime.InteropServices import Marshal, GCHandle, GCHandleType
+            _interop = (IntPtr, Int64, Marshal, GCHandle, GCHandleType)
+        except Exception:
+            _interop = False
+    return _interop or None
+
+
+def _is_net_object(samples):
+    return hasattr(samples, 'ToArray') and hasattr(samples, 'Count')
+
+
+def to_float64(samples):
+    """Copy one channel of Y samples (List<double>, ndarray or Python sequence) into a float64 ndarray"""
+    if isinstance(samples, np.ndarray):
+        return samples.astype(np.float64, copy=False)
+    if not _is_net_object(samples):
+        return np.asarray(samples, dtype=np.float64)
+
+    count = samples.Count
+    out = np.empty(count, dtype=np.float64)
+    if count == 0:
+        return out
+    interop = _get_interop()
+    if interop is not None:
+        IntPtr, Int64, Marshal, GCHandle, GCHandleType = interop
+        try:
+            Marshal.Copy(samples.ToArray(), 0, IntPtr.__overloads__[Int64](out.ctypes.data), count)
+            return out
+        except Exception:
+            pass
+    return np.fromiter(samples, dtype=np.float64, count=count)
+
+
+def to_time_value(samples):
+    """Copy one channel of (T, Y) samples into separate float64 time and value arrays.
+
+    Returns (times, values). Both are views into one (n, 2) block, so no further copy is made.
+    """
+    global _yt_fast_path
+    if isinstance(samples, np.ndarray) and samples.dtype != object:
+        block = samples.astype(np.float64, copy=False).reshape(-1, 2)
+        return block[:, 0], block[:, 1]
+
+    count = samples.Count if _is_net_object(samples) else len(samples)
+    block = np.empty((count, 2), dtype=np.float64)
+    if count == 0:
+        return block[:, 0], block[:, 1]
+
+    interop = _get_interop()
+    if interop is not None and _yt_fast_path and _is_net_object(samples):
+        IntPtr, Int64, Marshal, GCHandle, GCHandleType = interop
+        handle = None
+        try:
+            net_array = samples.ToArray()
+            handle = GCHandle.Alloc(net_array, GCHandleType.Pinned)
+            ctypes.memmove(block.ctypes.data, handle.AddrOfPinnedObject().ToInt64(), block.nbytes)
+            # ValueTuple<double, double> is declared with auto layout, so check the copy against the source once
+            first, last = samples[0], samples[count - 1]
+            if (block[0, 0], block[0, 1], block[-1, 0], block[-1, 1]) == (first.Item1, first.Item2, last.Item1, last.Item2):
+                return block[:, 0], block[:, 1]
+            _yt_fast_path = False
+        except Exception:
+            _yt_fast_path = False
+        finally:
+            if handle is not None:
+                handle.Free()
+
+    if hasattr(samples[0], 'Item1'):
+        block = np.array([(sample.Item1, sample.Item2) for sample in samples], dtype=np.float64)
+    else:
+        block = np.asarray(samples, dtype=np.float64).reshape(count, 2)
+    return block[:, 0], block[:, 1]
@@ -0,0 +1,164 @@
+"""
+Per-channel sample clock of a collection session.
+
+Every configured channel (TrignoBase.channel_guids, channel SampleRate) gets a clock: sample k of channel c is at
+
+    t = offsets[c] + k / rates[c]        (seconds from the start of the collection)
+
+Offsets are 0 unless YT time stamps are streamed, then they come from the first time stamp of each channel.
+advance() counts the samples of every packet, so the clock knows how far each channel has got, where packets
+started (packet_times, on the common time line) and how far the channels drift apart. Time window queries are
+vectorized over all channels: window(t0, t1) returns the [start, stop) sample index of every channel at once.
+
+DataKernel owns the session clock. Export (time columns, common length), the live plot (PlotAligner: packets cut
+at the time every EMG channel has reached) and analysis (ThrowDetector sample indices) all use it instead of
+deriving sample times on their own.
+
+Use Example:
+clock = SampleClock(channel_guids, sample_rates)
+clock.advance([len(samples) for samples in packet])
+starts, stops = clock.window(12.0, 12.5)         # Samples of every channel in [12.0 s, 12.5 s)
+times = clock.times(0, starts[0], stops[0])      # Their time stamps
+"""
+import numpy as np
+
+from AeroPy.ChannelStorage import ChannelBuffer
+
+
+class SampleClock():
+    def __init__(self, channel_guids=(), sample_rates=(), offsets=None):
+        self.configure(channel_guids, sample_rates, offsets)
+
+    def configure(self, channel_guids, sample_rates, offsets=None):
+        """Set the channel layout: GUIDs and sample rates in DataKernel output order, optional start offsets (s)"""
+        self.channel_guids = list(channel_guids)
+        self.rates = np.asarray(sample_rates, dtype=np.float64).reshape(-1)
+        self.offsets = np.zeros(len(self.rates)) if offsets is None else np.asarray(offsets, dtype=np.float64)
+        self._guid_index = {str(guid): i for i, guid in enumerate(self.channel_guids)}
+        self.reset()
+
+    def reset(self):
+        """Back to zero samples, keep the layout (new collection on the same channels)"""
+        self.counts = np.zeros(len(self.rates), dtype=np.int64)
+        self.offsets_set = np.zeros(len(self.rates), dtype=bool)
+        self.packets = 0
+        self.packet_times = ChannelBuffer(100.0, np.float64)   # Covered time after each packet (~74 packets/s)
+
+    def __len__(self):
+        return len(self.rates)
+
+    def channel(self, item):
+        """Channel position of a GUID (positions are passed through)"""
+        if isinstance(item, (int, np.integer)):
+            return int(item)
+        return self._guid_index[str(item)]
+
+    def advance(self, counts, first_times=None):
+        """Count one packet. counts: samples per channel. first_times: time stamp of the first sample of every
+        channel (YT data), used as the channel offset the first time a channel receives samples"""
+        counts = np.asarray(counts, dtype=np.int64)
+        if first_times is not None:
+            starting = ~self.offsets_set & (counts > 0)
+            if starting.any():
+                first_times = np.asarray(first_times, dtype=np.float64)
+                self.offsets[starting] = first_times[starting] - self.counts[starting] / self.rates[starting]
+                self.offsets_set |= starting
+        self.counts += counts
+        self.packets += 1
+        self.packet_times.append([self.covered()])
+
+    def times(self, channel, start=0, stop=None):
+        """Time stamps of samples [start, stop) of a channel (stop defaults to the samples received)"""
+        c = self.channel(channel)
+        stop = self.counts[c] if stop is None else stop
+        return self.offsets[c] + np.arange(start, stop) / self.rates[c]
+
+    def ends(self):
+        """Time reached by every channel (time of its next sample)"""
+        return self.offsets + self.counts / self.rates
+
+    def covered(self, channels=None):
+        """Time up to which every channel (or the given positions) has samples"""
+        if len(self.rates) == 0:
+            return 0.0
+        ends = self.ends()
+        return float(ends.min() if channels is None else ends[channels].min())
+
+    def duration(self):
+        """Time reached by the longest channel (the collection length)"""
+        return float(self.ends().max()) if len(self.rates) else 0.0
+
+    def drift(self):
+        """Seconds each channel is ahead of the slowest one (packet jitter, clock drift between sensors)"""
+        ends = self.ends()
+        return ends - ends.min() if len(ends) else ends
+
+    def index(self, t, channels=None, clip=True):
+        """Index of the first sample at or after time t, for every channel (or the given positions)"""
+        rates = self.rates if channels is None else self.rates[channels]
+        offsets = self.offsets if channels is None else self.offsets[channels]
+        index = np.ceil((t - offsets) * rates - 1e-9).astype(np.int64)
+        if clip:
+            counts = self.counts if channels is None else self.counts[channels]
+            index = np.clip(index, 0, counts)
+        return index
+
+    def window(self, t0, t1, channels=None, clip=True):
+        """[start, stop) sample indexes of the samples in the time window [t0, t1), for every channel"""
+        return self.index(t0, channels, clip), self.index(t1, channels, clip)
+
+    def packet_boundaries(self, channel):
+        """Sample index of channel where each packet ended (on the common time line, see covered())"""
+        c = self.channel(channel)
+        ends = self.packet_times.view()
+        index = np.ceil((ends - self.offsets[c]) * self.rates[c] - 1e-9).astype(np.int64)
+        return np.clip(index, 0, self.counts[c])
+
+
+class PlotAligner():
+    """Cuts a stream of packets (rows of selected channels) at the time every row has reached, so each plot frame
+    covers the same time span on every row whatever the channel rates and packet jitter. Samples past the cut are
+    carried over to the next frame. A row more than stall seconds behind the furthest one (sensor dropout) is padded
+    with zeros up to it, so the other rows keep plotting and the carry stays bounded; samples it delivers later
+    continue from there."""
+
+    def __init__(self, rates, offsets=None, stall=0.1):
+        self.clock = SampleClock(range(len(rates)), rates, offsets)
+        self.stall = stall
+        self.reset()
+
+    def reset(self):
+        self.clock.reset()
+        self.carry = [np.zeros(0)] * len(self.clock)
+        self.emitted = np.zeros(len(self.clock), dtype=np.int64)
+
+    def push(self, rows):
+        """Add one packet (one array per row). Returns the frame: per row the samples up to the common time"""
+        self.clock.advance([len(row) for row in rows])
+        rows = [np.concatenate((carry, np.asarray(row, dtype=np.float64))) if len(carry) else
+                np.asarray(row, dtype=np.float64) for carry, row in zip(self.carry, rows)]
+        ends = self.clock.ends()
+        if len(ends):
+            lead = ends.max()
+            for i in np.flatnonzero(lead - ends > self.stall):
+                padding = int(self.clock.index(lead, [i], clip=False)[0] - self.clock.counts[i])
+                rows[i] = np.concatenate((rows[i], np.zeros(padding)))
+                self.clock.counts[i] += padding
+        stops = self.clock.index(self.clock.covered()) - self.emitted
+        self.emitted += stops
+        frame = [row[:stop] for row, stop in zip(rows, stops)]
+        self.carry = [row[stop:] for row, stop in zip(rows, stops)]
+        return frame
+
+    def next_values(self, next_rows=None, frame=None):
+        """Interpolation target after a frame: first carried sample, else the next packet's first sample,
+        else the frame's last sample"""
+        values = []
+        for i, carry in enumerate(self.carry):
+            if len(carry):
+                values.append(carry[0])
+            elif next_rows is not None and len(next_rows[i]):
+                values.append(next_rows[i][0])
+            else:
+                values.append(frame[i][-1] if frame is not None and len(frame[i]) else 0.0)
+        return values
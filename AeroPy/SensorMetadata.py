@@ -0,0 +1,111 @@
+"""
+Plain-Python snapshots of the sensor and channel properties read through the DelsysAPI.
+
+Every property read on a .NET sensor or channel object is an interop call. SensorSummary copies the properties the
+application uses (pair number, name, mode, firmware, and name/type/rate/id/enabled of every channel) once, and
+SensorMetadataCache keeps those snapshots until the sensors are scanned again: a sensor whose pair number, mode and
+firmware did not change is recognized from those three properties and its channels are not walked again.
+
+CollectionLayout keeps what TrignoBase.ConfigureCollectionOutput derives from the snapshots (streamed channel ids,
+types and rates, EMG plot indices, CSV header rows), so repeated collections restore it instead of rebuilding it.
+The cache holds the layout of the last configuration and drops it with any sensor (setSampleMode, rescan).
+
+portable=True snapshots hold the channel ids as strings so they can be pickled (AcquisitionProcess sends them
+to the GUI process); the default keeps the .NET Guid objects, which key the DataKernel poll results.
+"""
+
+
+class ChannelSummary():
+    def __init__(self, channel, portable=False):
+        self.Name = str(channel.Name)
+        self.Type = str(channel.Type)
+        self.SampleRate = float(channel.SampleRate)
+        self.IsEnabled = bool(channel.IsEnabled)
+        self.Id = str(channel.Id) if portable else channel.Id
+
+
+class ConfigurationSummary():
+    def __init__(self, mode_string):
+        self.ModeString = mode_string
+
+
+def firmware_version(sensor):
+    """Firmware version string of a sensor object ("" when the object does not report one)"""
+    return str(getattr(sensor, 'FirmwareVersion', ""))
+
+
+class SensorSummary():
+    """Copy of the sensor object properties used by the GUI, the CSV headers and the collection configuration"""
+
+    def __init__(self, sensor, portable=False, pair_number=None, mode=None, firmware=None):
+        self.PairNumber = int(sensor.PairNumber) if pair_number is None else pair_number
+        self.FriendlyName = str(sensor.FriendlyName)
+        self.Configuration = ConfigurationSummary(str(sensor.Configuration.ModeString) if mode is None else mode)
+        self.FirmwareVersion = firmware_version(sensor) if firmware is None else firmware
+        self.TrignoChannels = [ChannelSummary(channel, portable) for channel in sensor.TrignoChannels]
+
+    @property
+    def key(self):
+        return (self.PairNumber, self.Configuration.ModeString, self.FirmwareVersion)
+
+
+class CollectionLayout():
+    """
+    Channel layout of a configured pipeline: the streamed channels as (id, sample rate, type), the indices of the EMG
+    channels among them (plotted), and the CSV writer header rows and channel metadata built for them.
+    """
+
+    def __init__(self, stream_yt, channels, emg_indices, csv_writer):
+        self.stream_yt = stream_yt
+        self.channels = list(channels)
+        self.emg_indices = list(emg_indices)
+        self.h1_sensors = list(csv_writer.h1_sensors)
+        self.h2_channels = list(csv_writer.h2_channels)
+        self.channel_info = [dict(info) for info in csv_writer.channel_info]
+
+    @property
+    def channel_guids(self):
+        return [guid for guid, _, _ in self.channels]
+
+    def restore_headers(self, csv_writer):
+        """Put the header rows and channel metadata back into a cleared CsvWriter (copies, the writer appends)"""
+        csv_writer.h1_sensors = list(self.h1_sensors)
+        csv_writer.h2_channels = list(self.h2_channels)
+        csv_writer.channel_info = [dict(info) for info in self.channel_info]
+
+
+class SensorMetadataCache():
+    """SensorSummary of every sensor seen, keyed by (pair number, mode, firmware), and the last CollectionLayout"""
+
+    def __init__(self):
+        self.sensors = {}
+        self.layout = None
+        self.hits = 0
+        self.misses = 0
+
+    def summary(self, sensor):
+        """Snapshot of a .NET sensor object, walked only when its pair number, mode or firmware is new"""
+        if isinstance(sensor, SensorSummary):
+            return sensor
+        pair_number = int(sensor.PairNumber)
+        mode = str(sensor.Configuration.ModeString)
+        firmware = firmware_version(sensor)
+        cached = self.sensors.get((pair_number, mode, firmware))
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        cached = SensorSummary(sensor, pair_number=pair_number, mode=mode, firmware=firmware)
+        self.sensors[cached.key] = cached
+        return cached
+
+    def invalidate(self, pair_number=None):
+        """
+        Forget one sensor (every sensor when pair_number is None), so its next summary() walks it again, and the
+        collection layout built from it
+        """
+        self.layout = None
+        if pair_number is None:
+            self.sensors.clear()
+        else:
+            self.sensors = {key: summary for key, summary in self.sensors.items() if key[0] != pair_number}
@@ -0,0 +1,327 @@
+"""
+Pure-Python stand-in for the DelsysAPI AeroPy class.
+
+SimulatedAeroPy implements the AeroPy methods used by this app (scan, configure, start/stop, data polling,
+triggers, sample modes) so the collection pipeline can run on machines without the Windows-only DelsysAPI
+assembly, e.g. for headless benchmarks. Select it with TrignoBase(..., simulated=True).
+
+Data is generated per channel at the channel's sample rate, either paced by the wall clock (realtime=True) or
+one packet per poll as fast as the caller can consume it (realtime=False). Passing replay_file replays a recorded
+Trigno CSV (data.csv or a CsvWriter export, see Export/CsvLoader.py) instead of synthetic signals.
+"""
+import math
+import re
+import time
+import uuid
+
+import numpy as np
+
+from Export.CsvLoader import load_csv
+
+# Sample modes offered by the simulated Avanti sensors: mode string -> [(channel name, type, sample rate)]
+SAMPLE_MODES = {
+    "EMG raw (2148 Hz), +/-11mv, 10-850Hz": [
+        ("EMG 1", "EMG", 2148.1481)],
+    "EMG plus ACC (+/-16g), +/-11mv, 20-450Hz": [
+        ("EMG 1", "EMG", 1925.926),
+        ("ACC X", "ACC", 148.148),
+        ("ACC Y", "ACC", 148.148),
+        ("ACC Z", "ACC", 148.148)],
+    "EMG (1259 Hz), +/-5.5mv, 20-450Hz": [
+        ("EMG 1", "EMG", 1259.2593)],
+}
+DEFAULT_MODE = "EMG plus ACC (+/-16g), +/-11mv, 20-450Hz"
+PACKET_SECONDS = 0.0135  # Roughly the packet interval of a Trigno base
+
+
+class _Task():
+    """Mimics the .NET Task returned by ScanSensors()/PairSensor()"""
+
+    def __init__(self, result):
+        self.Result = result
+
+
+class _PollResult(dict):
+    """Dictionary<Guid, List<...>> stand-in: dict plus the .Keys property used by DataKernel"""
+
+    @property
+    def Keys(self):
+        return list(self.keys())
+
+
+class SimulatedChannel():
+    def __init__(self, name, channel_type, sample_rate, enabled=True):
+        self.Name = name
+        self.Type = channel_type
+        self.SampleRate = sample_rate
+        self.Id = str(uuid.uuid4())
+        self.IsEnabled = enabled
+
+
+class _Configuration():
+    def __init__(self, mode_string):
+        self.ModeString = mode_string
+
+
+class SimulatedSensor():
+    def __init__(self, pair_number, mode=DEFAULT_MODE, friendly_name="Avanti Sensor", channel_specs=None,
+                 firmware="1.0.0"):
+        self.PairNumber = pair_number
+        self.FriendlyName = friendly_name
+        self.FirmwareVersion = firmware
+        self.Configuration = _Configuration(mode)
+        self.set_channels(channel_specs if channel_specs is not None else SAMPLE_MODES[mode])
+
+    def set_channels(self, channel_specs):
+        self.TrignoChannels = [SimulatedChannel(name, channel_type, rate) for name, channel_type, rate in channel_specs]
+        self.TrignoChannels.append(SimulatedChannel("SkinCheck", "SkinCheck", 74.074, enabled=False))
+
+
+class _SyntheticSource():
+    """EMG: noise with periodic activation bursts (mV). ACC: gravity plus throw-like swings, quantized to 1/32 g"""
+
+    def __init__(self, channel, seed):
+        self.channel = channel
+        self.rng = np.random.default_rng(seed)
+        self.emitted = 0
+
+    def read(self, count):
+        t = (self.emitted + np.arange(count)) / self.channel.SampleRate
+        self.emitted += count
+        activation = 0.5 + 0.5 * np.sin(2 * np.pi * t / 6.0) ** 16  # One burst every ~6 s
+        if str(self.channel.Type) == "EMG":
+            return 0.01 * self.rng.standard_normal(count) + 0.3 * activation * self.rng.standard_normal(count)
+        axis = {"ACC X": 0, "ACC Y": 1, "ACC Z": 2}.get(self.channel.Name, 0)
+        signal = (axis == 2) * -1.0 + 4.0 * (activation - 0.5) * np.cos(2 * np.pi * 3 * t + axis)
+        return np.round(signal * 32) / 32
+
+
+class _ReplaySource():
+    """Replays one column of a recorded file, looping when the end is reached"""
+
+    def __init__(self, samples, loop):
+        self.samples = np.asarray(samples, dtype=np.float64)
+        self.loop = loop
+        self.position = 0
+
+    def read(self, count):
+        if self.samples.size == 0:
+            return np.zeros(0)
+        if not self.loop:
+            block = self.samples[self.position:self.position + count]
+            self.position += block.size
+            return block
+        index = (self.position + np.arange(count)) % self.samples.size
+        self.position += count
+        return self.samples[index]
+
+
+def read_trigno_csv(path):
+    """Read a Trigno CSV (two-header-row or export layout, see Export/CsvLoader.py).
+    Returns [(sensor label, [(channel name, sample rate, samples)])]"""
+    channel_info, values, _, _ = load_csv(path)
+    sensors = []
+    for info, samples in zip(channel_info, values):
+        label = f"({info.get('pair_number', len(sensors) + 1)}) {info.get('sensor_name', '')}"
+        if not sensors or sensors[-1][0] != label:
+            sensors.append((label, []))
+        sensors[-1][1].append((info['name'], info['sample_rate'] or 1.0, samples))
+    return sensors
+
+
+class SimulatedAeroPy():
+    def __init__(self, sensor_count=2, mode=DEFAULT_MODE, realtime=True, replay_file=None, loop_replay=True,
+                 packet_seconds=PACKET_SECONDS, trigger_delay=2.0, seed=0):
+        self.realtime = realtime
+        self.packet_seconds = packet_seconds
+        self.trigger_delay = trigger_delay
+        self.state = 'Off'
+        self.sensors = []
+        self.selected = []
+        self.sources = {}
+        self.yt = False
+        self.start_trigger = False
+        self.stop_trigger = False
+        self.pairing = False
+
+        if replay_file:
+            for pair_number, (label, channels) in enumerate(read_trigno_csv(replay_file), start=1):
+                match = re.match(r"\s*\((\d+)\)\s*(.*)", label)
+                number = int(match.group(1)) if match else pair_number
+                name = match.group(2) if match and match.group(2) else "Avanti Sensor"
+                specs = [(channel_name, channel_name.split()[0], rate) for channel_name, rate, _ in channels]
+                sensor = SimulatedSensor(number, mode="Replay: " + replay_file, friendly_name=name, channel_specs=specs)
+                for channel, (_, _, samples) in zip(sensor.TrignoChannels, channels):
+                    self.sources[channel.Id] = _ReplaySource(samples, loop_replay)
+                self.sensors.append(sensor)
+        else:
+            for pair_number in range(1, sensor_count + 1):
+                self.sensors.append(SimulatedSensor(pair_number, mode))
+        self._seed = seed
+
+    # -- Connection / sensor management
+    def ValidateBase(self, key, license):
+        self.state = 'Connected'
+
+    def GetPipelineState(self):
+        return self.state
+
+    def PairSensor(self, pair_number=None):
+        self.pairing = True
+        sensor = SimulatedSensor(pair_number if pair_number is not None else len(self.sensors) + 1)
+        self.sensors.append(sensor)
+        self.pairing = False
+        return _Task(True)
+
+    def CheckPairStatus(self):
+        return self.pairing
+
+    def CheckPairComponentAdded(self):
+        return not self.pairing
+
+    def CancelPair(self):
+        self.pairing = False
+
+    def ScanSensors(self):
+        self.state = 'Connected'
+        self.selected = []
+        return _Task(True)
+
+    def GetScannedSensorsFound(self):
+        return list(self.sensors)
+
+    def SelectSensor(self, sensor_num):
+        if sensor_num not in self.selected:
+            self.selected.append(sensor_num)
+
+    def SelectAllSensors(self):
+        self.selected = list(range(len(self.sensors)))
+        return True
+
+    def GetSensorObject(self, sensor_no):
+        return self.sensors[self.selected[sensor_no]] if self.selected else self.sensors[sensor_no]
+
+    def GetSensorNames(self):
+        return [sensor.FriendlyName for sensor in self.sensors]
+
+    def GetAllSampleModes(self):
+        return [sensor.Configuration.ModeString for sensor in self.sensors]
+
+    def GetCurrentSensorMode(self, sensor_no):
+        return self.sensors[sensor_no].Configuration.ModeString
+
+    def AvailibleSensorModes(self, sensor_selected):
+        return list(SAMPLE_MODES.keys())
+
+    def SetSampleMode(self, component_num, sample_mode):
+        sensor = self.sensors[component_num]
+        sensor.Configuration = _Configuration(sample_mode)
+        sensor.set_channels(SAMPLE_MODES[sample_mode])
+        self.state = 'Connected'
+
+    # -- Data collection
+    def Configure(self, start_trigger=False, stop_trigger=False):
+        self.start_trigger = start_trigger
+        self.stop_trigger = stop_trigger
+        seed = self._seed
+        for index in (self.selected or range(len(self.sensors))):
+            for channel in self.sensors[index].TrignoChannels:
+                if channel.IsEnabled and channel.Id not in self.sources:
+                    self.sources[channel.Id] = _SyntheticSource(channel, seed)
+                    seed += 1
+        self.state = 'Armed'
+
+    def IsPipelineConfigured(self):
+        return self.state in ('Armed', 'Running')
+
+    def Start(self, yt_data=False):
+        self.yt = yt_data
+        self.state = 'Running'
+        self.start_time = time.perf_counter()
+        self.collect_time = self.start_time + (self.trigger_delay if self.start_trigger else 0.0)
+        self.emitted = {guid: 0 for guid in self.sources}
+        self.packets_polled = 0
+        self.poll_delay_total = 0.0
+        self.poll_delay_count = 0
+
+    def Stop(self):
+        self.state = 'Armed'
+
+    def IsWaitingForStartTrigger(self):
+        return self.state == 'Running' and self.start_trigger and time.perf_counter() < self.collect_time
+
+    def IsWaitingForStopTrigger(self):
+        if not self.stop_trigger or self.state != 'Running':
+            return False
+        return time.perf_counter() < self.collect_time + self.trigger_delay
+
+    def FireStartTrigger(self):
+        """Simulated trigger pulse: start collecting now"""
+        self.collect_time = time.perf_counter()
+
+    def FireStopTrigger(self):
+        """Simulated trigger pulse: stop collecting now"""
+        self.stop_trigger = True
+        self.collect_time = time.perf_counter() - self.trigger_delay
+
+    def _elapsed(self):
+        """Seconds of data available since collection started, or None while not collecting"""
+        if self.state != 'Running' or self.IsWaitingForStartTrigger():
+            return None
+        if not self.realtime:
+            return (self.packets_polled + 1) * self.packet_seconds
+        elapsed = time.perf_counter() - self.collect_time
+        if self.stop_trigger:
+            elapsed = min(elapsed, self.trigger_delay)
+        return elapsed
+
+    def CheckDataQueue(self):
+        elapsed = self._elapsed()
+        if elapsed is None:
+            return False
+        return not self.realtime or int(elapsed / self.packet_seconds) > self.packets_polled
+
+    def CheckYTDataQueue(self):
+        return self.CheckDataQueue()
+
+    def _poll(self):
+        elapsed = self._elapsed()
+        if elapsed is None:
+            return _PollResult()
+        # Data is released in whole packets, like the base does
+        if self.realtime:
+            released = int(elapsed / self.packet_seconds)
+            if released > self.packets_polled:
+                # Time between the oldest unread packet becoming available and this poll
+                ready_at = self.collect_time + (self.packets_polled + 1) * self.packet_seconds
+                self.poll_delay_total += time.perf_counter() - ready_at
+                self.poll_delay_count += 1
+            self.packets_polled = max(self.packets_polled, released)
+        else:
+            self.packets_polled += 1
+        elapsed = self.packets_polled * self.packet_seconds
+        out = _PollResult()
+        for sensor in self.sensors:
+            for channel in sensor.TrignoChannels:
+                if channel.Id not in self.sources:
+                    continue
+                count = max(0, int(math.floor(elapsed * channel.SampleRate)) - self.emitted[channel.Id])
+                start = self.emitted[channel.Id]
+                values = self.sources[channel.Id].read(count)
+                self.emitted[channel.Id] += values.size
+                out[channel.Id] = (start, values, channel.SampleRate)
+        return out
+
+    def mean_poll_delay(self):
+        """Mean seconds between a packet becoming available and being polled (realtime mode only)"""
+        return self.poll_delay_total / self.poll_delay_count if self.poll_delay_count else float('nan')
+
+    def PollData(self):
+        return _PollResult((guid, values) for guid, (start, values, rate) in self._poll().items())
+
+    def PollYTData(self):
+        out = _PollResult()
+        for guid, (start, values, rate) in self._poll().items():
+            times = (start + np.arange(values.size)) / rate
+            out[guid] = np.column_stack((times, values))
+        return out
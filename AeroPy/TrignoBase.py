@@ -1,20 +1,88 @@
 """
 This class creates an instance of the Trigno base. Put your key and license here.
+Pass simulated=True to use the pure-Python SimulatedAeroPy instead of the DelsysAPI (see SimulatedBase.py).
+
+The .NET runtime (pythonnet/CoreCLR) and the DelsysAPI assembly load on first use, not on import: call
+preload_aeropy() to load them on a background thread while the start window is up; TrignoBase() waits for it.
 """
 import threading
 import time
-from pythonnet import load
 
 from Export.CsvWriter import CsvWriter
+from AeroPy.SensorMetadata import CollectionLayout, SensorMetadataCache
+from AeroPy.SimulatedBase import SimulatedAeroPy
+
+_aeropy = None              # Aero.AeroPy, once loaded
+_aeropy_error = None        # Why it could not be loaded
+_aeropy_lock = threading.Lock()
+_aeropy_thread = None
+
+
+def load_aeropy():
+    """
+    AeroPy class of the DelsysAPI. The first call starts the .NET runtime and loads the DelsysAPI (seconds), later
+    calls return the loaded class. Raises the load error when the DelsysAPI is not available.
+    """
+    global _aeropy, _aeropy_error
+    with _aeropy_lock:
+        if _aeropy is None and _aeropy_error is None:
+            try:
+                from pythonnet import load
+
+                load("coreclr")
+                import clr
+
+                clr.AddReference(r"resources\DelsysAPI")
+                clr.AddReference("System.Collections")
+
+                from Aero import AeroPy
+                _aeropy = AeroPy
+            except Exception as e:
+                # DelsysAPI is only available on Windows with pythonnet installed, the simulator still works without it
+                _aeropy_error = e
+    if _aeropy is None:
+        raise _aeropy_error
+    return _aeropy
+
+
+def _preload():
+    try:
+        load_aeropy()
+    except Exception:
+        pass    # Raised again by the TrignoBase() that needs it
+
+
+def preload_aeropy():
+    """Start loading the DelsysAPI on a background thread (once). Returns the thread"""
+    global _aeropy_thread
+    if _aeropy_thread is None:
+        _aeropy_thread = threading.Thread(target=_preload, name="AeroPyLoader", daemon=True)
+        _aeropy_thread.start()
+    return _aeropy_thread
 
-load("coreclr")
-import clr
-import csv
 
-clr.AddReference(r"resources\DelsysAPI")
-clr.AddReference("System.Collections")
+class OperationCancelled(Exception):
+    """Raised by Scan_Callback / prepareCollection when their cancel event is set"""
 
-from Aero import AeroPy
+
+def check_cancel(cancel):
+    """Raise OperationCancelled when the cancel event (or None) is set"""
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled()
+
+
+def report_progress(progress, message, done=0, total=0):
+    """Call progress(message, done, total) when a progress callback was given"""
+    if progress is not None:
+        progress(message, done, total)
+
+
+def aeropy_ready():
+    """True when TrignoBase() will not wait for the DelsysAPI to load (loaded, failed, or no preload running)"""
+    return _aeropy_thread is None or not _aeropy_thread.is_alive()
+
+
+import csv
 
 key = """MIIBKjCB4wYHKoZIzj0CATCB1wIBATAsBgcqhkjOPQEBAiEA/////wAAAAEAAAAAAAAAAAAAAAD///////////////8wWwQg/////wAAAAEAAAAAAAAAAAAAAAD///////////////wEIFrGNdiqOpPns+u9VXaYhrxlHQawzFOw9jvOPD4n0mBLAxUAxJ02CIbnBJNqZnjhE50mt4GffpAEIQNrF9Hy4SxCR/i85uVjpEDydwN9gS3rM6D0oTlF2JjClgIhAP////8AAAAA//////////+85vqtpxeehPO5ysL8YyVRAgEBA0IABGKabwf6WJt8O8a4lc4x6teFMBJ5vVhv8QFIjAmnpdcnkoxtTDwsHWVEZMesU+AxhToBk+tEBHYthYN7TbJQR1c="""
 
@@ -23,18 +91,35 @@ license = """<License>  <Id>d2f00e61-aaef-48e8-a528-bd26f557a676</Id>  <Type>Sta
 
 class TrignoBase():
     """
-    AeroPy reference imported above then instantiated in the constructor below
+    AeroPy class loaded by load_aeropy() then instantiated in the constructor below
     All references to TrigBase. call an AeroPy method (See AeroPy documentation for details)
     """
 
-    def __init__(self, collection_data_handler):
-        self.TrigBase = AeroPy()
+    def __init__(self, collection_data_handler, simulated=False, replay_file=None):
+        if simulated or replay_file:
+            self.TrigBase = SimulatedAeroPy(replay_file=replay_file)
+        else:
+            self.TrigBase = load_aeropy()()
+        self.simulated = simulated or replay_file is not None
         self.collection_data_handler = collection_data_handler
         self.channel_guids = []
         self.channelcount = 0
         self.pairnumber = 0
         self.csv_writer = CsvWriter()
 
+        # A failed sensor scan is retried scanRetries times, waiting scanBackoff seconds before the first retry and
+        # twice as long before each next one (up to scanBackoffMax)
+        self.scanRetries = 4
+        self.scanBackoff = 0.5
+        self.scanBackoffMax = 4.0
+
+        # Sensor/channel properties read through interop and the channel layout built from them, kept until the
+        # next scan or mode change (see SensorMetadata.py)
+        self.sensor_cache = SensorMetadataCache()
+        self.all_scanned_sensors = []
+        self.SensorCount = 0
+        self.canvasPending = False      # New channel layout, the plot canvas is set up on the next start
+
     # -- AeroPy Methods --
     def PipelineState_Callback(self):
         return self.TrigBase.GetPipelineState()
@@ -52,22 +137,52 @@ class TrignoBase():
     def CheckPairComponentAdded(self):
         return self.TrigBase.CheckPairComponentAdded()
 
-    def Scan_Callback(self):
-        """Callback to tell the base to scan for any available sensors"""
-        try:
-            f = self.TrigBase.ScanSensors().Result
-        except Exception as e:
-            print("Python demo attempt another scan...")
-            time.sleep(1)
-            self.Scan_Callback()
-
-        self.all_scanned_sensors = self.TrigBase.GetScannedSensorsFound()
+    def Scan_Callback(self, progress=None, cancel=None):
+        """
+        Callback to tell the base to scan for any available sensors. A failed scan is retried with exponential
+        backoff (scanRetries, scanBackoff) and the last error raised.
+
+        Parameters:
+        -----------
+        progress : callable
+            Called as progress(message, done, total) from the scanning thread
+        cancel : threading.Event
+            Set to stop the scan between attempts or sensors (raises OperationCancelled)
+        """
+        # The scan may hand out new sensor and channel objects: read every sensor again
+        self.sensor_cache.invalidate()
+        delay = self.scanBackoff
+        for attempt in range(self.scanRetries + 1):
+            check_cancel(cancel)
+            retry = " (retry " + str(attempt) + "/" + str(self.scanRetries) + ")" if attempt else ""
+            report_progress(progress, "Scanning" + retry)
+            try:
+                self.TrigBase.ScanSensors().Result
+                break
+            except Exception as e:
+                if attempt == self.scanRetries:
+                    raise
+                print("Scan failed (" + str(e) + "), retrying in " + str(delay) + " s...")
+                if cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+                delay = min(delay * 2, self.scanBackoffMax)
+
+        sensors = self.TrigBase.GetScannedSensorsFound()
+        count = len(sensors)
+        scanned = []
         print("Sensors Found:\n")
-        for sensor in self.all_scanned_sensors:
-            print("(" + str(sensor.PairNumber) + ") " +
-                sensor.FriendlyName + "\n" +
-                sensor.Configuration.ModeString + "\n")
-
+        for i, sensor in enumerate(sensors):
+            check_cancel(cancel)
+            summary = self.sensor_cache.summary(sensor)
+            scanned.append(summary)
+            print("(" + str(summary.PairNumber) + ") " +
+                summary.FriendlyName + "\n" +
+                summary.Configuration.ModeString + "\n")
+            report_progress(progress, "Reading sensors", i + 1, count)
+
+        self.all_scanned_sensors = scanned
         self.SensorCount = len(self.all_scanned_sensors)
         for i in range(self.SensorCount):
             self.TrigBase.SelectSensor(i)
@@ -77,134 +192,215 @@ class TrignoBase():
 
     def Start_Callback(self, start_trigger, stop_trigger):
         """Callback to start the data stream from Sensors"""
+        if self.prepareCollection(start_trigger, stop_trigger):
+            self.beginCollection()
+
+    def prepareCollection(self, start_trigger, stop_trigger, progress=None, cancel=None):
+        """
+        Configure the pipeline and the collection output: the slow, interop-bound part of Start_Callback, which can
+        run off the GUI thread (progress and cancel as in Scan_Callback). Returns True when configured
+        """
         self.start_trigger = start_trigger
         self.stop_trigger = stop_trigger
-
-        configured = self.ConfigureCollectionOutput()
-        if configured:
-            #(Optional) To get YT data output pass 'True' to Start method
-            self.TrigBase.Start(self.collection_data_handler.streamYTData)
-            self.collection_data_handler.threadManager(self.start_trigger, self.stop_trigger)
-
-    def ConfigureCollectionOutput(self):
+        return self.ConfigureCollectionOutput(progress, cancel)
+
+    def beginCollection(self):
+        """Start streaming a prepared collection. Sets up the plot canvas, so call it from the GUI thread"""
+        handler = self.collection_data_handler
+        if handler.EMGplot and self.canvasPending:
+            handler.EMGplot.initiateCanvas(None, None, self.plotCount, 1, 20000)
+        self.canvasPending = False
         if not self.start_trigger:
-            self.collection_data_handler.pauseFlag = False
-
+            handler.pauseFlag = False
+        # Streaming CSV export: rows are written in the background while collecting
+        handler.DataHandler.stream_writer = self.csv_writer.start_stream(
+            getattr(self, 'sensor_muscle_map', None), handler.DataHandler.clock)
+        #(Optional) To get YT data output pass 'True' to Start method
+        self.TrigBase.Start(handler.streamYTData)
+        handler.threadManager(self.start_trigger, self.stop_trigger)
+
+    def ConfigureCollectionOutput(self, progress=None, cancel=None):
+        check_cancel(cancel)
         self.collection_data_handler.DataHandler.packetCount = 0
-        self.collection_data_handler.DataHandler.allcollectiondata = []
+        self.collection_data_handler.DataHandler.allcollectiondata.reset()
+        self.collection_data_handler.DataHandler.allcollectiontimes.reset()
+        self.collection_data_handler.DataHandler.resetProcessing()
 
+        # Channel layout of the last configuration, valid until a rescan or mode change (and for the same YT setting)
+        layout = self.sensor_cache.layout
+        if layout is not None and layout.stream_yt != self.collection_data_handler.streamYTData:
+            layout = None
 
         # Pipeline Armed when TrigBase.Configure already called.
         # This if block allows for sequential data streams without reconfiguring the pipeline each time.
-        # Reset output data structure before starting data stream again
-        if self.TrigBase.GetPipelineState() == 'Armed':
+        # Reset output data structure before starting data stream again (cleardata also empties the CSV headers,
+        # they are restored from the layout)
+        state = self.TrigBase.GetPipelineState()
+        if state == 'Armed' and layout is not None:
             self.csv_writer.cleardata()
-            for i in range(len(self.channelobjects)):
-                self.collection_data_handler.DataHandler.allcollectiondata.append([])
+            layout.restore_headers(self.csv_writer)
             return True
 
 
         # Pipeline Connected when sensors have been scanned in sucessfully.
         # Configure output data using TrigBase.Configure and pass args if you are using a start and/or stop trigger
-        elif self.TrigBase.GetPipelineState() == 'Connected':
+        # (Armed without a layout: a previous configuration was cancelled while reading the channels)
+        elif state == 'Connected' or state == 'Armed':
             self.csv_writer.clearall()
             self.channelcount = 0
-            self.TrigBase.Configure(self.start_trigger, self.stop_trigger)
+            self.sensor_cache.layout = None
+            self.collection_data_handler.DataHandler.allcollectiondata.clear()
+            self.collection_data_handler.DataHandler.allcollectiontimes.clear()
+            if state == 'Connected':
+                report_progress(progress, "Configuring pipeline")
+                self.TrigBase.Configure(self.start_trigger, self.stop_trigger)
             configured = self.TrigBase.IsPipelineConfigured()
             if configured:
-                self.channelobjects = []
-                self.plotCount = 0
-                self.emgChannelsIdx = []
-                globalChannelIdx = 0
-                self.channel_guids = []
-
-                for i in range(self.SensorCount):
-
-                    selectedSensor = self.TrigBase.GetSensorObject(i)
-                    print("(" + str(selectedSensor.PairNumber) + ") " + str(selectedSensor.FriendlyName))
-
-                    # CSV Export Config
-                    self.csv_writer.appendSensorHeader(selectedSensor)
-
-                    if len(selectedSensor.TrignoChannels) > 0:
-                        print("--Channels")
-
-                        for channel in range(len(selectedSensor.TrignoChannels)):
-                            ch_object = selectedSensor.TrignoChannels[channel]
-                            if str(ch_object.Type) == "SkinCheck":
-                                continue
-
-                            ch_guid = ch_object.Id
-                            ch_type = str(ch_object.Type)
-
-                            get_all_channels = True
-                            if get_all_channels:
-                                self.channel_guids.append(ch_guid)
-                                globalChannelIdx += 1
-
-                                #CSV Export Config
-                                if not self.collection_data_handler.streamYTData:
-                                    self.csv_writer.appendChannelHeader(ch_object)
-                                    if channel > 0 & channel != len(selectedSensor.TrignoChannels):
-                                        self.csv_writer.appendSensorHeaderSeperator()
-                                else:
-                                    self.csv_writer.appendYTChannelHeader(ch_object)
-                                    if channel == 0:
-                                        self.csv_writer.appendSensorHeaderSeperator()
-                                    elif channel > 0 & channel != len(selectedSensor.TrignoChannels):
-                                        self.csv_writer.appendYTSensorHeaderSeperator()
-
-
-
-                            #NOTE: The self.channel_guids list is used to parse select channels during live data streaming in DataManager.py
-                            #      this example will add all available channels to this list (above)
-                            #      if you want to only parse certain channels then add only those channel guids to this list
-                            #      for example: if you only want the EMG channels during live data streaming (flip bool above to false):
-                            if not get_all_channels:
-                                if ch_type == 'EMG':
-                                    self.channel_guids.append(ch_guid)
-                                    self.csv_writer.h2_channels.append(
-                                        ch_object.Name + " (" + str(ch_object.SampleRate) + ")")
-                                    if channel > 0:
-                                        self.csv_writer.h1_sensors.append(",")
-                                    globalChannelIdx += 1
-
-
-                            sample_rate = round(selectedSensor.TrignoChannels[channel].SampleRate, 3)
-                            print("----" + selectedSensor.TrignoChannels[channel].Name + " (" + str(sample_rate) + " Hz) " + str(selectedSensor.TrignoChannels[channel].Id))
-                            self.channelcount += 1
-                            self.channelobjects.append(channel)
-                            self.collection_data_handler.DataHandler.allcollectiondata.append([])
-
-                            # NOTE: Plotting/Data Output: This demo does not plot non-EMG channel types such as
-                            # accelerometer, gyroscope, magnetometer, and others. However, the data from channels
-                            # that are excluded from plots are still available via output from PollData()
-
-                            # ---- Plot EMG Channels
-                            if ch_type == 'EMG':
-                                self.emgChannelsIdx.append(globalChannelIdx-1)
-                                self.plotCount += 1
-
-                            # ---- Exclude non-EMG channels from plots
-                            else:
-                                pass
-
-
-
-
-                if self.collection_data_handler.EMGplot:
-                    self.collection_data_handler.EMGplot.initiateCanvas(None, None, self.plotCount, 1, 20000)
-
+                if layout is not None:
+                    # Same sensors and modes as the last configuration: no sensor or channel is read again
+                    self.applyLayout(layout)
+                else:
+                    layout = self.readLayout(progress, cancel)
+                    self.canvasPending = True
+                self.sensor_cache.layout = layout
+                report_progress(progress, "Configured", self.SensorCount, self.SensorCount)
                 return True
         else:
             return False
 
+    def readLayout(self, progress=None, cancel=None):
+        """Walk the configured sensors and channels: storage, processing and CSV headers. Returns the layout"""
+        self.channelobjects = []
+        self.plotCount = 0
+        self.emgChannelsIdx = []
+        globalChannelIdx = 0
+        self.channel_guids = []
+        processing_channels = []
+
+        for i in range(self.SensorCount):
+            check_cancel(cancel)
+            report_progress(progress, "Configuring channels", i, self.SensorCount)
+
+            # Channel properties come from the sensor metadata cache when the sensor and mode are known
+            selectedSensor = self.sensor_cache.summary(self.TrigBase.GetSensorObject(i))
+            print("(" + str(selectedSensor.PairNumber) + ") " + str(selectedSensor.FriendlyName))
+
+            # CSV Export Config
+            self.csv_writer.appendSensorHeader(selectedSensor)
+
+            if len(selectedSensor.TrignoChannels) > 0:
+                print("--Channels")
+
+                for channel in range(len(selectedSensor.TrignoChannels)):
+                    ch_object = selectedSensor.TrignoChannels[channel]
+                    if str(ch_object.Type) == "SkinCheck":
+                        continue
+
+                    ch_guid = ch_object.Id
+                    ch_type = str(ch_object.Type)
+
+                    get_all_channels = True
+                    if get_all_channels:
+                        self.channel_guids.append(ch_guid)
+                        globalChannelIdx += 1
+
+                        #CSV Export Config
+                        if not self.collection_data_handler.streamYTData:
+                            self.csv_writer.appendChannelHeader(ch_object)
+                            if channel > 0 & channel != len(selectedSensor.TrignoChannels):
+                                self.csv_writer.appendSensorHeaderSeperator()
+                        else:
+                            self.csv_writer.appendYTChannelHeader(ch_object)
+                            if channel == 0:
+                                self.csv_writer.appendSensorHeaderSeperator()
+                            elif channel > 0 & channel != len(selectedSensor.TrignoChannels):
+                                self.csv_writer.appendYTSensorHeaderSeperator()
+
+
+
+                    #NOTE: The self.channel_guids list is used to parse select channels during live data streaming in DataManager.py
+                    #      this example will add all available channels to this list (above)
+                    #      if you want to only parse certain channels then add only those channel guids to this list
+                    #      for example: if you only want the EMG channels during live data streaming (flip bool above to false):
+                    if not get_all_channels:
+                        if ch_type == 'EMG':
+                            self.channel_guids.append(ch_guid)
+                            self.csv_writer.h2_channels.append(
+                                ch_object.Name + " (" + str(ch_object.SampleRate) + ")")
+                            if channel > 0:
+                                self.csv_writer.h1_sensors.append(",")
+                            globalChannelIdx += 1
+
+
+                    sample_rate = round(selectedSensor.TrignoChannels[channel].SampleRate, 3)
+                    print("----" + selectedSensor.TrignoChannels[channel].Name + " (" + str(sample_rate) + " Hz) " + str(selectedSensor.TrignoChannels[channel].Id))
+                    self.channelcount += 1
+                    self.channelobjects.append(channel)
+                    # Typed sample storage for this channel, chunks sized from the channel sample rate
+                    self.collection_data_handler.DataHandler.allcollectiondata.add_channel(ch_guid, ch_object.SampleRate)
+                    if self.collection_data_handler.streamYTData:
+                        self.collection_data_handler.DataHandler.allcollectiontimes.add_channel(ch_guid, ch_object.SampleRate)
+                    processing_channels.append((ch_guid, ch_object.SampleRate, ch_type))
+
+                    # NOTE: Plotting/Data Output: This demo does not plot non-EMG channel types such as
+                    # accelerometer, gyroscope, magnetometer, and others. However, the data from channels
+                    # that are excluded from plots are still available via output from PollData()
+
+                    # ---- Plot EMG Channels
+                    if ch_type == 'EMG':
+                        self.emgChannelsIdx.append(globalChannelIdx-1)
+                        self.plotCount += 1
+
+                    # ---- Exclude non-EMG channels from plots
+                    else:
+                        pass
+
+
+
+
+        # Live EMG processing (filter state and envelope storage) for the new channel layout
+        self.collection_data_handler.DataHandler.configureProcessing(processing_channels)
+        return CollectionLayout(self.collection_data_handler.streamYTData, processing_channels, self.emgChannelsIdx,
+                                self.csv_writer)
+
+    def applyLayout(self, layout):
+        """Set up storage, processing and CSV headers from a layout read before"""
+        data_handler = self.collection_data_handler.DataHandler
+        self.channel_guids = layout.channel_guids
+        self.channelcount = len(layout.channels)
+        self.emgChannelsIdx = list(layout.emg_indices)
+        self.plotCount = len(layout.emg_indices)
+        for ch_guid, sample_rate, _ in layout.channels:
+            data_handler.allcollectiondata.add_channel(ch_guid, sample_rate)
+            if layout.stream_yt:
+                data_handler.allcollectiontimes.add_channel(ch_guid, sample_rate)
+        data_handler.configureProcessing(layout.channels)
+        layout.restore_headers(self.csv_writer)
+
     def Stop_Callback(self):
         """Callback to stop the data stream"""
         self.collection_data_handler.pauseFlag = True
         self.TrigBase.Stop()
         print("Data Collection Complete")
-        self.csv_writer.data = self.collection_data_handler.DataHandler.allcollectiondata
+        acquisition_thread = getattr(self.collection_data_handler, 't1', None)
+        if acquisition_thread is not None and acquisition_thread.is_alive():
+            acquisition_thread.join(timeout=1.0)  # Let the last packet reach the streaming export
+        self.collection_data_handler.DataHandler.stream_writer = None
+        self.csv_writer.finish_stream()
+        storage = self.collection_data_handler.DataHandler.allcollectiondata
+        print("Session memory: " + str(round(storage.nbytes / 1e6, 2)) + " MB for " +
+              str(storage.memory_report()['total_samples']) + " samples")
+        if storage.session_directory is not None:
+            print("Session spilled: " + str(round(storage.disk_bytes / 1e6, 2)) + " MB in " + storage.session_directory)
+        self.csv_writer.data = storage.views()
+        self.csv_writer.clock = self.collection_data_handler.DataHandler.clock
+        detector = self.collection_data_handler.DataHandler.detector
+        if detector is not None:
+            detector.flush()
+            self.csv_writer.throws = list(detector.throws)
+            print("Throws detected: " + str(len(detector.throws)))
+        if self.collection_data_handler.streamYTData:
+            self.csv_writer.time_data = self.collection_data_handler.DataHandler.allcollectiontimes.views()
 
     # ---------------------------------------------------------------------------------
     # ---- Helper Functions
@@ -228,5 +424,9 @@ class TrignoBase():
         self.TrigBase.SetSampleMode(curSensor, setMode)
         mode = self.getCurMode(curSensor)
         sensor = self.TrigBase.GetSensorObject(curSensor)
+        # New channels: the next configuration walks this sensor again
+        self.sensor_cache.invalidate(int(sensor.PairNumber))
+        if curSensor < len(self.all_scanned_sensors):
+            self.all_scanned_sensors[curSensor] = self.sensor_cache.summary(sensor)
         if mode == setMode:
             print("(" + str(sensor.PairNumber) + ") " + str(sensor.FriendlyName) +" Mode Change Successful")
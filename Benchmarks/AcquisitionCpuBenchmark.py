@@ -0,0 +1,61 @@
+"""
+CPU-usage benchmark for the acquisition loop against a simulated base.
+
+Runs the DataKernel polling loop for a fixed wall-clock duration twice: once busy-spinning on CheckDataQueue()
+(the previous PlottingManagement.streaming behaviour) and once with the AdaptivePoller used by
+PlottingManagement.acquisitionLoop. Reports CPU time per wall second, packets received and the mean delay
+between a packet becoming available and being polled.
+
+Run from the project root:
+    python -m Benchmarks.AcquisitionCpuBenchmark [seconds] [sensors]
+"""
+import sys
+import threading
+import time
+
+from Benchmarks.BenchmarkSupport import HeadlessCollection
+from DataCollector.AcquisitionScheduler import AdaptivePoller
+
+
+def run(mode, seconds, sensors):
+    collection = HeadlessCollection(sensor_count=sensors, realtime=True)
+    collection.start()
+    kernel = collection.DataHandler
+    state = collection.collectionState
+    result = {}
+
+    def loop():
+        cpu_start = time.thread_time()
+        if mode == 'spin':
+            while not state.is_paused():
+                kernel.processData(collection.emg_plot)
+        else:
+            poller = AdaptivePoller()
+            while not state.is_paused():
+                if kernel.processData(collection.emg_plot):
+                    poller.reset()
+                else:
+                    poller.idle(state.paused)
+        result['cpu'] = time.thread_time() - cpu_start
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+    time.sleep(seconds)
+    collection.stop()
+    thread.join()
+    delay = collection.base.TrigBase.mean_poll_delay() * 1e3
+    return result['cpu'] / seconds, kernel.packetCount, delay
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"Simulated base: {sensors} EMG+ACC sensors, {seconds} s per run")
+    for mode, label in (('spin', 'busy-spin (before)'), ('adaptive', 'adaptive poll (after)')):
+        cpu, packets, delay = run(mode, seconds, sensors)
+        print(f"{label:24s} CPU: {cpu * 100:6.1f}% of one core   packets: {packets:6d}   "
+              f"mean poll delay: {delay:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Size and encode/decode speed of the compressed session archive against plain and gzip CSV.
+
+Loads a Trigno CSV (default data.csv), optionally repeated to N sensors, and stores its channels as:
+
+    CSV         CsvWriter.writeChannels export (time/value column pairs), read back with read_csv_channels
+    gzip CSV    the same CSV through gzip (level 6, the gzip tool default)
+    archive     SessionArchive.write_archive, read back with SessionArchive.channel and iter_blocks
+
+Reports size, compression ratio against the CSV, and encode/decode times, and checks that the archive decodes to
+the exact samples (bit for bit). The block codec is also checked bit for bit on special values: 1/32 g quantized
+ACC-like data with -0.0, NaN and inf samples, and subnormals.
+
+Run from the project root:
+    python -m Benchmarks.ArchiveBenchmark [csv file] [sensors]
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from AeroPy.SampleClock import SampleClock
+from Export.CsvWriter import CsvWriter
+from Export.SessionArchive import (CODEC_QUANTIZED, SessionArchive, decode_block, encode_block, iter_blocks,
+                                   write_archive)
+from Export.SessionFile import read_csv_channels
+
+
+def load(path, sensors):
+    """channel_info and sample arrays of the recording, its sensor repeated to `sensors` sensors"""
+    channel_info, values, _, _ = read_csv_channels(path)
+    infos, data = [], []
+    for copy in range(sensors):
+        for info, samples in zip(channel_info, values):
+            infos.append(dict(info, pair_number=copy + 1, sensor_name=f"Avanti Sensor {copy + 1}", mode=""))
+            data.append(np.roll(samples, int(len(samples) * copy / sensors)))
+    return infos, data
+
+
+def special_values(count=50000, seed=0):
+    """Blocks of special float values, name -> array"""
+    rng = np.random.default_rng(seed)
+    acc = np.rint(rng.normal(0.0, 8.0, count)) / 32.0
+    negative_zero = acc.copy()
+    negative_zero[rng.random(count) < 0.05] = -0.0
+    non_finite = negative_zero.copy()
+    non_finite[rng.integers(0, count, 20)] = np.nan
+    non_finite[rng.integers(0, count, 5)] = -np.inf
+    subnormal = rng.integers(-1000, 1000, count) * 5e-324
+    return {"ACC with -0.0": negative_zero, "ACC with -0.0, nan, inf": non_finite, "subnormals": subnormal,
+            "subnormals and -0.0": np.where(rng.random(count) < 0.1, -0.0, subnormal)}
+
+
+def check_special_values():
+    """(name, codec, bit-exact) of every special_values block through encode_block/decode_block"""
+    results = []
+    for name, values in special_values().items():
+        codec, width, quantum, payload = encode_block(values)
+        decoded = decode_block(codec, width, quantum, len(values), payload)
+        results.append((name, "quantized" if codec == CODEC_QUANTIZED else "xor",
+                        np.array_equal(decoded.view(np.uint64), values.view(np.uint64))))
+    return results
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.csv"
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    channel_info, data = load(path, sensors)
+    samples = sum(len(values) for values in data)
+    directory = tempfile.mkdtemp(prefix="archive_")
+    csv_file = os.path.join(directory, "session.csv")
+    gzip_file = csv_file + ".gz"
+    archive_file = os.path.join(directory, "session.tsz")
+
+    writer = CsvWriter.__new__(CsvWriter)     # Skip the constructor, it creates the default output directory
+    writer.data, writer.time_data, writer.h2_channels = data, [], []
+    writer.channel_info, writer.muscle_map = channel_info, {}
+    writer.clock = SampleClock(range(len(data)), [info['sample_rate'] for info in channel_info])
+    writer.clock.counts[:] = [len(values) for values in data]
+    _, csv_write = timed(writer.writeChannels, csv_file)
+    _, csv_read = timed(read_csv_channels, csv_file)
+
+    with open(csv_file, 'rb') as f:
+        text = f.read()
+    compressed, gzip_write = timed(gzip.compress, text, 6)
+    with open(gzip_file, 'wb') as f:
+        f.write(compressed)
+    _, gzip_read = timed(gzip.decompress, compressed)
+
+    _, archive_write = timed(write_archive, archive_file, data, channel_info)
+
+    def read_all():
+        with SessionArchive(archive_file) as archive:
+            return [np.array(archive.channel(i)) for i in range(len(archive))]
+
+    decoded, archive_read = timed(read_all)
+    _, stream_read = timed(lambda: sum(len(block) for _, _, block in iter_blocks(archive_file)))
+    exact = all(np.array_equal(d.view(np.uint64), np.asarray(v, dtype=np.float64).view(np.uint64))
+                for d, v in zip(decoded, data))
+
+    csv_size = os.path.getsize(csv_file)
+    print(f"{path}: {sensors} sensor(s), {len(data)} channels, {samples / 1e6:.2f} M samples "
+          f"(source file {os.path.getsize(path) / 1e6:.2f} MB)")
+    print(f"{'':10} {'size MB':>9} {'ratio':>7} {'encode ms':>10} {'decode ms':>10}")
+    rows = [("CSV", csv_size, csv_write, csv_read),
+            ("gzip CSV", len(compressed), csv_write + gzip_write, gzip_read + csv_read),
+            ("archive", os.path.getsize(archive_file), archive_write, archive_read)]
+    for name, size, encode, decode in rows:
+        print(f"{name:10} {size / 1e6:9.3f} {csv_size / size:6.1f}x {encode * 1e3:10.1f} {decode * 1e3:10.1f}")
+    print(f"archive streaming decode (iter_blocks) {stream_read * 1e3:.1f} ms, "
+          f"{samples / archive_read / 1e6:.0f} M samples/s decoded; lossless: {exact}")
+    for name, codec, bit_exact in check_special_values():
+        print(f"special values, {name:26} codec {codec:9} bit-exact: {bit_exact}")
+    for name in (csv_file, gzip_file, archive_file):
+        os.remove(name)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Throughput of Processing/BatchAnalysis.py on a synthetic session corpus.
+
+Builds a directory of export-layout session CSVs (MMDDYY_TraqID_FirstLast_sessiontype.csv) from a recording
+(default data.csv, which has throws), its sensor repeated to N sensors, then times:
+
+    serial      every session analyzed in this process (--workers 1)
+    pool        every session on a process pool of W workers
+    resume      a second run with nothing changed (manifest check only)
+    changed     a run after one session was rewritten (only that session is analyzed again)
+
+Run from the project root:
+    python -m Benchmarks.BatchAnalysisBenchmark [sessions] [sensors] [workers] [csv file]
+"""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+
+from AeroPy.SampleClock import SampleClock
+from Benchmarks.ArchiveBenchmark import load
+from Export.CsvWriter import CsvWriter
+from Processing.BatchAnalysis import BatchAnalysis
+
+ATHLETES = ["JohnSmith", "AlexGarcia", "SamLee", "ChrisJones"]
+SESSION_TYPES = ["mocap", "longform", "veloday", "recovery", "other"]
+
+
+def make_corpus(directory, sessions, sensors, path, muscles=()):
+    """Write `sessions` copies of the recording under session file names, sensor k labelled muscles[k] (cycled)"""
+    channel_info, data = load(path, sensors)
+    writer = CsvWriter.__new__(CsvWriter)     # Skip the constructor, it creates the default output directory
+    writer.data, writer.time_data, writer.h2_channels = data, [], []
+    writer.channel_info = channel_info
+    writer.muscle_map = {k + 1: muscles[k % len(muscles)] for k in range(sensors)} if muscles else {}
+    writer.clock = SampleClock(range(len(data)), [info['sample_rate'] for info in channel_info])
+    writer.clock.counts[:] = [len(values) for values in data]
+    first = os.path.join(directory, "session.csv")
+    writer.writeChannels(first)
+    names = []
+    for k in range(sessions):
+        name = (f"{k % 12 + 1:02d}{k % 28 + 1:02d}25_{1000 + k % len(ATHLETES)}_{ATHLETES[k % len(ATHLETES)]}_"
+                f"{SESSION_TYPES[k % len(SESSION_TYPES)]}.csv")
+        shutil.copy(first, os.path.join(directory, name))
+        names.append(name)
+    os.remove(first)
+    return names
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    path = sys.argv[4] if len(sys.argv) > 4 else "data.csv"
+    directory = tempfile.mkdtemp(prefix="batch_analysis_")
+    names = make_corpus(directory, sessions, sensors, path)
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in names) / 1e6
+    batch = BatchAnalysis(directory)
+
+    print(f"{sessions} sessions, {sensors} sensor(s) each, {size:.0f} MB ({os.cpu_count()} CPUs)")
+    print(f"{'':22} {'seconds':>8} {'sessions/s':>11} {'analyzed':>9} {'skipped':>8}")
+    runs = [("serial", 1, True, False), (f"pool, {workers} workers", workers, True, False),
+            ("resume, unchanged", workers, False, False), ("resume, 1 changed", workers, False, True)]
+    for name, count, rerun, touch in runs:
+        if touch:
+            changed = os.path.join(directory, names[0])
+            os.utime(changed, (os.path.getatime(changed), os.path.getmtime(changed) + 10))
+        batch.workers = count
+        result = batch.run(rerun=rerun)
+        rate = result['processed'] / result['seconds'] if result['processed'] else 0.0
+        print(f"{name:22} {result['seconds']:8.2f} {rate:11.2f} {result['processed']:9} {result['skipped']:8}")
+
+    with open(batch.output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    print(f"summary: {len(rows)} rows, {len(set(row['file'] for row in rows))} sessions, "
+          f"{len(set((row['file'], row['throw']) for row in rows))} throws")
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Headless collection harness shared by the benchmarks.
+
+HeadlessCollection stands in for PlottingManagement (no Qt, no plot) so TrignoBase and DataKernel run their real
+connect/scan/configure/start code against SimulatedAeroPy.
+"""
+import tempfile
+
+from AeroPy.DataManager import DataKernel
+from AeroPy.TrignoBase import TrignoBase
+from AeroPy.SimulatedBase import SimulatedAeroPy
+from DataCollector.AcquisitionScheduler import CollectionState
+from DataCollector.FrameQueue import FrameQueue
+
+
+class HeadlessCollection():
+    def __init__(self, sensor_count=2, realtime=True, replay_file=None, stream_yt=False, output_directory=None,
+                 **simulator_options):
+        self.EMGplot = None
+        self.streamYTData = stream_yt
+        self.collectionState = CollectionState(paused=True)
+        self.emg_plot = FrameQueue(capacity=10 ** 6)
+        self.base = TrignoBase(self, simulated=True)
+        self.base.TrigBase = SimulatedAeroPy(sensor_count=sensor_count, realtime=realtime, replay_file=replay_file,
+                                             **simulator_options)
+        self.base.csv_writer.output_directory = output_directory or tempfile.mkdtemp(prefix="trigno_benchmark_")
+        self.DataHandler = DataKernel(self.base)
+        self.base.DataHandler = self.DataHandler
+
+    @property
+    def pauseFlag(self):
+        return self.collectionState.is_paused()
+
+    @pauseFlag.setter
+    def pauseFlag(self, paused):
+        self.collectionState.set_paused(paused)
+
+    def threadManager(self, start_trigger, stop_trigger):
+        """Threads are driven by the benchmark itself"""
+        pass
+
+    def start(self):
+        """Connect, scan and start streaming through TrignoBase"""
+        self.base.Connect_Callback()
+        self.base.Scan_Callback()
+        self.base.Start_Callback(False, False)
+        return self.base
+
+    def stop(self):
+        self.base.Stop_Callback()
@@ -0,0 +1,120 @@
+"""
+Cross-session query time: opening every session file vs Export/SessionCatalog.py.
+
+Builds a corpus of session CSVs (see BatchAnalysisBenchmark.make_corpus, muscles assigned per sensor), backfills a
+catalog from it (serially and on a process pool), then answers "every mocap session of one athlete in 2025
+with FCR on sensor 1" and "every session with FCR on sensor 1" both by reading the session files and through the
+catalog. The same queries are then timed on a larger synthetic catalog (`catalog rows` sessions, copies of one
+indexed session with their muscles rotated).
+
+Run from the project root:
+    python -m Benchmarks.CatalogBenchmark [sessions] [sensors] [workers] [csv file] [catalog rows]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from Benchmarks.BatchAnalysisBenchmark import ATHLETES, SESSION_TYPES, make_corpus
+from Export.CsvLoader import _read_header
+from Export.SessionCatalog import SessionCatalog, parse_session_filename, read_session_record
+
+MUSCLES = ["FCR", "FCU", "PT", "ECR"]
+
+
+def scan_files(directory, athlete, session_type, date_from, date_to, muscle, pair_number):
+    """The query answered by opening the session files (file name fields first, then the sensor header rows).
+    None matches anything"""
+    matches = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".csv"):
+            continue
+        fields = parse_session_filename(name)
+        if athlete is not None and fields['athlete'] != athlete:
+            continue
+        if session_type is not None and fields['session_type'] != session_type:
+            continue
+        if date_from is not None and not date_from <= fields['date'] <= date_to:
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            channel_info = _read_header(f)[0]
+        if any(info.get('pair_number') == pair_number and info.get('sensor_name') == muscle for info in channel_info):
+            matches.append(name)
+    return matches
+
+
+def synthetic_catalog(filename, record, rows):
+    """Fill a catalog with `rows` copies of one session record under distinct paths, muscles rotated per copy"""
+    muscles = [channel['muscle'] for channel in record['channels']]
+    with SessionCatalog(filename) as catalog:
+        with catalog.connection:
+            for k in range(rows):
+                session = dict(record['session'], path=f"/synthetic/{k}/{record['session']['file']}",
+                               athlete=ATHLETES[k % len(ATHLETES)], session_type=SESSION_TYPES[k % len(SESSION_TYPES)])
+                channels = [dict(channel, muscle=muscles[(i + k) % len(muscles)])
+                            for i, channel in enumerate(record['channels'])]
+                catalog._add({'session': session, 'channels': channels})
+
+
+def time_find(catalog, query, repeats=100):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        found = catalog.find(*query)
+    return found, (time.perf_counter() - start) / repeats
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    path = sys.argv[4] if len(sys.argv) > 4 else "data.csv"
+    rows = int(sys.argv[5]) if len(sys.argv) > 5 else 5000
+    directory = tempfile.mkdtemp(prefix="catalog_")
+    make_corpus(directory, sessions, sensors, path, MUSCLES)
+    queries = [("athlete, type, dates, muscle", ("JohnSmith", "mocap", "2025-01-01", "2025-12-31", "FCR", 1)),
+               ("muscle only", (None, None, None, None, "FCR", 1))]
+
+    timings = []
+    for name, count, label in (("serial", 1, "serial"), (f"{workers} workers", workers, "pool")):
+        catalog_file = os.path.join(directory, f"catalog_{label}.sqlite")   # Each run starts from an empty catalog
+        with SessionCatalog(catalog_file) as catalog:
+            start = time.perf_counter()
+            result = catalog.backfill(directory, count)
+            timings.append((name, time.perf_counter() - start, result))
+    with SessionCatalog(catalog_file) as catalog:
+        start = time.perf_counter()
+        resumed = catalog.backfill(directory, workers)
+        resume_time = time.perf_counter() - start
+        results = []
+        for name, (athlete, session_type, date_from, date_to, muscle, pair_number) in queries:
+            start = time.perf_counter()
+            scanned = scan_files(directory, athlete, session_type, date_from, date_to, muscle, pair_number)
+            scan_time = time.perf_counter() - start
+            found, query_time = time_find(catalog, (athlete, None, session_type, date_from, date_to, muscle,
+                                                    pair_number))
+            results.append((name, scanned, scan_time, found, query_time))
+        record = read_session_record(catalog.find()[0]['path'])
+
+    large_file = os.path.join(directory, "catalog_large.sqlite")
+    synthetic_catalog(large_file, record, rows)
+    with SessionCatalog(large_file) as catalog:
+        large = [(name, *time_find(catalog, (athlete, None, session_type, date_from, date_to, muscle, pair_number),
+                                   10))
+                 for name, (athlete, session_type, date_from, date_to, muscle, pair_number) in queries]
+
+    print(f"{sessions} sessions, {sensors} sensors each ({os.cpu_count()} CPUs)")
+    for name, seconds, result in timings:
+        print(f"backfill {name:12} {seconds:7.2f} s, {result['indexed']} indexed")
+    print(f"backfill again (unchanged) {resume_time * 1e3:.1f} ms, {resumed['skipped']} skipped")
+    for name, scanned, scan_time, found, query_time in results:
+        print(f"query {name:30} file scan {scan_time * 1e3:7.1f} ms ({len(scanned)} sessions), "
+              f"catalog {query_time * 1e3:.2f} ms ({len(found)} sessions), "
+              f"same: {sorted(scanned) == sorted(session['file'] for session in found)}")
+    for name, found, query_time in large:
+        print(f"query {name:30} {rows} catalog rows {query_time * 1e3:7.2f} ms ({len(found)} sessions)")
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Collection start cost: DelsysAPI calls and property reads made by TrignoBase.ConfigureCollectionOutput, counted
+through a proxy around SimulatedAeroPy (every call and every property read on a returned sensor, configuration or
+channel object counts as one interop call), for:
+
+    scan                    Scan_Callback, every sensor read
+    first start             Connected pipeline: Configure, then every sensor and channel walked
+    repeated start/stop     Armed pipeline, layout restored from the metadata cache
+    start after mode change setSampleMode on the first sensor, then the next start (one sensor read again)
+    re-read every start     the same cycles with the metadata cache emptied before each start (no cache)
+
+Each start also checks the CSV headers and channel metadata against the first start's.
+
+Run from the project root:
+    python -m Benchmarks.ConfigureBenchmark [sensors] [cycles]
+"""
+import sys
+import time
+
+from Benchmarks.BenchmarkSupport import HeadlessCollection
+from AeroPy.SimulatedBase import SimulatedChannel, SimulatedSensor, _Configuration
+
+
+class InteropCounter():
+    """Counts method calls on the wrapped object and property reads on the sensor objects it returns"""
+
+    WRAPPED = (SimulatedSensor, SimulatedChannel, _Configuration)
+
+    def __init__(self, target, counter=None):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_counter', counter if counter is not None else [0])
+
+    @property
+    def count(self):
+        return self._counter[0]
+
+    def reset(self):
+        self._counter[0] = 0
+
+    def _wrap(self, value):
+        if isinstance(value, self.WRAPPED):
+            return InteropCounter(value, self._counter)
+        if isinstance(value, list) and value and isinstance(value[0], self.WRAPPED):
+            return [InteropCounter(item, self._counter) for item in value]
+        return value
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if callable(value):
+            def call(*args, **kwargs):
+                self._counter[0] += 1
+                return self._wrap(value(*args, **kwargs))
+            return call
+        self._counter[0] += 1
+        return self._wrap(value)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+def headers(csv_writer):
+    return (list(csv_writer.h1_sensors), list(csv_writer.h2_channels),
+            [{key: value for key, value in info.items() if key != 'guid'} for info in csv_writer.channel_info])
+
+
+def start_stop(collection, counter):
+    """One start (counted and timed) and stop. Returns (interop calls, seconds, headers at start)"""
+    counter.reset()
+    start = time.perf_counter()
+    collection.base.Start_Callback(False, False)
+    seconds = time.perf_counter() - start
+    calls = counter.count
+    started = headers(collection.base.csv_writer)
+    collection.stop()
+    return calls, seconds, started
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    collection = HeadlessCollection(sensor_count=sensors, realtime=False)
+    counter = InteropCounter(collection.base.TrigBase)
+    collection.base.TrigBase = counter
+    collection.base.Connect_Callback()
+
+    counter.reset()
+    start = time.perf_counter()
+    collection.base.Scan_Callback()
+    rows = [("scan", counter.count, time.perf_counter() - start, True)]
+    calls, seconds, expected = start_stop(collection, counter)
+    rows.append(("first start", calls, seconds, bool(expected[1])))
+
+    def cycle(name, before=None):
+        results = []
+        for _ in range(cycles):
+            if before is not None:
+                before()
+            results.append(start_stop(collection, counter))
+        rows.append((name, sum(r[0] for r in results) / cycles, sum(r[1] for r in results) / cycles,
+                     all(r[2] == expected for r in results)))
+
+    cycle("repeated start/stop")
+    mode = collection.base.getCurMode(0)
+    collection.base.setSampleMode(0, mode)
+    calls, seconds, started = start_stop(collection, counter)
+    rows.append(("start after mode change", calls, seconds, started == expected))
+    cycle("re-read every start", collection.base.sensor_cache.invalidate)
+
+    print(f"{sensors} sensors, {cycles} start/stop cycles")
+    print(f"{'':26} {'interop calls':>14} {'ms':>8}  headers correct")
+    for name, calls, seconds, correct in rows:
+        print(f"{name:26} {calls:14.0f} {seconds * 1e3:8.3f}  {correct}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark for the PollData/PollYTData -> NumPy conversion used by DataKernel.
+
+Compares the previous per-element path (object arrays, per-sample Item2 access, .tolist() into Python lists)
+against AeroPy.NetConversion. When pythonnet and the CoreCLR runtime are available the inputs are real .NET
+List<double> / List<(double, double)> objects, otherwise plain Python lists/tuples are used (fallback path only).
+
+Run from the project root:
+    python -m Benchmarks.ConversionBenchmark [samples_per_channel] [channels] [repeats]
+"""
+import sys
+import time
+
+import numpy as np
+
+from AeroPy.NetConversion import to_float64, to_time_value
+
+
+class _PyYT():
+    """(T, Y) pair with the same attribute names as a .NET ValueTuple"""
+    __slots__ = ('Item1', 'Item2')
+
+    def __init__(self, t, y):
+        self.Item1 = t
+        self.Item2 = y
+
+
+def make_inputs(samples, channels):
+    """Build per-channel Y and (T, Y) inputs, as .NET lists when possible"""
+    values = np.random.default_rng(0).normal(size=(channels, samples))
+    times = np.tile(np.arange(samples) / 2148.1481, (channels, 1))
+    try:
+        from pythonnet import load
+        load("coreclr")
+        import clr
+        clr.AddReference("System.Collections")
+        from System import Double, ValueTuple
+        from System.Collections.Generic import List
+        y_lists, yt_lists = [], []
+        for c in range(channels):
+            y_list = List[Double]()
+            yt_list = List[ValueTuple[Double, Double]]()
+            for t, y in zip(times[c].tolist(), values[c].tolist()):
+                y_list.Add(y)
+                yt_list.Add(ValueTuple[Double, Double](t, y))
+            y_lists.append(y_list)
+            yt_lists.append(yt_list)
+        return y_lists, yt_lists, ".NET List (pythonnet)"
+    except Exception:
+        y_lists = [values[c].tolist() for c in range(channels)]
+        yt_lists = [[_PyYT(t, y) for t, y in zip(times[c].tolist(), values[c].tolist())] for c in range(channels)]
+        return y_lists, yt_lists, "Python list (no CLR available)"
+
+
+def old_y(y_lists):
+    out = []
+    for chan in y_lists:
+        arr = np.asarray(chan, dtype='object')
+        stored = []
+        stored.extend(arr.tolist())
+        out.append(arr)
+    return out
+
+
+def new_y(y_lists):
+    return [to_float64(chan) for chan in y_lists]
+
+
+def old_yt(yt_lists):
+    out = []
+    for chan in yt_lists:
+        arr = np.asarray(chan, dtype='object')
+        stored = []
+        stored.extend(arr.tolist())
+        out.append(np.asarray([k.Item2 for k in arr], dtype='object'))
+    return out
+
+
+def new_yt(yt_lists):
+    return [to_time_value(chan) for chan in yt_lists]
+
+
+def measure(func, inputs, total_samples, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(inputs)
+        best = min(best, time.perf_counter() - start)
+    return total_samples / best
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    y_lists, yt_lists, source = make_inputs(samples, channels)
+    total = samples * channels
+
+    print(f"Input: {source}, {channels} channels x {samples} samples")
+    for label, old, new, inputs in (("PollData  (Y)   ", old_y, new_y, y_lists),
+                                    ("PollYTData (T,Y)", old_yt, new_yt, yt_lists)):
+        before = measure(old, inputs, total, repeats)
+        after = measure(new, inputs, total, repeats)
+        print(f"{label}  before: {before / 1e6:8.2f} M samples/s   after: {after / 1e6:8.2f} M samples/s   "
+              f"speedup: {after / before:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
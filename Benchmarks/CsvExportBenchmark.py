@@ -0,0 +1,99 @@
+"""
+CSV export time of a multi-sensor session.
+
+Builds N simulated sensors in the default Avanti mode (EMG 1 + ACC X/Y/Z) with `minutes` of data and exports them
+with a time/value column pair per channel:
+
+    csv.writer rows    the previous approach: per-channel Python lists padded to a common length, zip(*) into
+                       rows, csv.writer.writerows (float repr per value)
+    CsvWriter          CsvWriter.writeChannels: chunked vectorized formatting (Export/CsvFormatter.py)
+
+Reports both times, the time extrapolated to a 20 minute session, and checks that the exported values parse back
+to the session data (within one unit of the last decimal written: 1e-7 s for times, 1e-9 for values).
+
+Run from the project root:
+    python -m Benchmarks.CsvExportBenchmark [sensors] [minutes]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from AeroPy.SampleClock import SampleClock
+from AeroPy.SimulatedBase import DEFAULT_MODE, SAMPLE_MODES
+from Export.CsvWriter import CsvWriter
+from Export.SessionFile import read_csv_channels
+
+
+def make_session(sensors, minutes):
+    """channel_info, data and clock of a session of `sensors` sensors"""
+    rng = np.random.default_rng(0)
+    channel_info, data = [], []
+    for pair_number in range(1, sensors + 1):
+        for name, channel_type, rate in SAMPLE_MODES[DEFAULT_MODE]:
+            channel_info.append({'pair_number': pair_number, 'sensor_name': f"Avanti Sensor {pair_number}",
+                                 'mode': DEFAULT_MODE, 'name': name, 'type': channel_type, 'sample_rate': rate})
+            scale = 0.05 if channel_type == "EMG" else 1.0
+            data.append(rng.normal(scale=scale, size=int(minutes * 60 * rate)))
+    clock = SampleClock(range(len(data)), [info['sample_rate'] for info in channel_info])
+    clock.counts[:] = [len(values) for values in data]
+    return channel_info, data, clock
+
+
+def export_rows(filename, channel_info, data):
+    """Previous export: padded Python lists transposed with zip(*) and written by csv.writer"""
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        channels = []
+        for info, values in zip(channel_info, data):
+            channels.append(np.round(np.arange(len(values)) / info['sample_rate'], 7).tolist())
+            channels.append(values.tolist())
+        max_length = max(len(channel) for channel in channels)
+        padded_data = [channel + [None] * (max_length - len(channel)) for channel in channels]
+        writer.writerows(zip(*padded_data))
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    channel_info, data, clock = make_session(sensors, minutes)
+    values = sum(len(v) for v in data)
+    print(f"{sensors} sensors, {len(data)} channels, {minutes} min: {values / 1e6:.1f} M samples "
+          f"({2 * values / 1e6:.1f} M CSV fields with the time columns)")
+
+    directory = tempfile.mkdtemp(prefix="csv_export_")
+    before_file = os.path.join(directory, "rows.csv")
+    after_file = os.path.join(directory, "formatted.csv")
+
+    start = time.perf_counter()
+    export_rows(before_file, channel_info, data)
+    before = time.perf_counter() - start
+
+    writer = CsvWriter.__new__(CsvWriter)     # Skip the constructor, it creates the default output directory
+    writer.data, writer.time_data, writer.h2_channels = data, [], []
+    writer.channel_info, writer.clock, writer.muscle_map = channel_info, clock, {}
+    start = time.perf_counter()
+    writer.writeChannels(after_file)
+    after = time.perf_counter() - start
+
+    per_20 = 20.0 / minutes
+    print(f"csv.writer rows (before)  {before:7.2f} s   {os.path.getsize(before_file) / 1e6:7.1f} MB   "
+          f"~{before * per_20:6.1f} s for 20 min")
+    print(f"CsvWriter (after)         {after:7.2f} s   {os.path.getsize(after_file) / 1e6:7.1f} MB   "
+          f"~{after * per_20:6.1f} s for 20 min   ({before / after:.1f}x)")
+
+    _, read_values, read_times, _ = read_csv_channels(after_file)
+    value_error = max(float(np.abs(r - v).max()) for r, v in zip(read_values, data))
+    time_error = max(float(np.abs(t - clock.times(k)).max()) for k, t in enumerate(read_times))
+    print(f"read back: max value error {value_error:.1e}, max time error {time_error:.1e}, "
+          f"ok: {value_error < 1e-9 and time_error < 1e-7}")
+    for name in (before_file, after_file):
+        os.remove(name)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+CSV load time: csv.reader loops vs Export/CsvLoader.py.
+
+    csv.reader      the previous readers (SessionFile.read_csv_channels, SimulatedBase.read_trigno_csv): a Python
+                    loop over rows and fields, float() per value
+    load_csv        chunked vectorized parsing
+
+Loads data.csv (Discover layout) and an export-layout CSV of N simulated sensors, checks that both readers return
+the same samples bit for bit, then loads a directory of copies serially and with load_directory on a process
+pool.
+
+Run from the project root:
+    python -m Benchmarks.CsvLoadBenchmark [sensors] [minutes] [files] [workers]
+"""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from Benchmarks.CsvExportBenchmark import make_session
+from Export.CsvLoader import load_csv, load_directory
+from Export.CsvWriter import CsvWriter
+
+
+def csv_reader_load(filename):
+    """Samples of every column, as the previous readers collected them"""
+    with open(filename, newline='') as f:
+        rows = csv.reader(f)
+        first = next(rows)
+        header_rows = 7 if first and first[0] == "Application:" else 2
+        for _ in range(header_rows - 2):
+            next(rows)
+        name_row = next(rows)
+        columns = [[] for _ in name_row]
+        for row in rows:
+            for i, value in enumerate(row[:len(columns)]):
+                if value != '':
+                    columns[i].append(float(value))
+    return [np.asarray(column, dtype=np.float64) for column in columns]
+
+
+def loaded_columns(result):
+    """Columns of a load_csv result in file order"""
+    _, values, times, _ = result
+    if times is None:
+        return values
+    return [column for pair in zip(times, values) for column in pair]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    minutes = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    files = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+    directory = tempfile.mkdtemp(prefix="csv_load_")
+    export_file = os.path.join(directory, "export.csv")
+    channel_info, data, clock = make_session(sensors, minutes)
+    writer = CsvWriter.__new__(CsvWriter)     # Skip the constructor, it creates the default output directory
+    writer.data, writer.time_data, writer.h2_channels = data, [], []
+    writer.channel_info, writer.clock, writer.muscle_map = channel_info, clock, {}
+    writer.writeChannels(export_file)
+
+    print(f"{'':34} {'MB':>7} {'csv.reader s':>13} {'load_csv s':>11} {'speedup':>8}  identical")
+    for name, path in (("data.csv (Discover layout)", "data.csv"),
+                       (f"export, {sensors} sensors, {minutes} min", export_file)):
+        before, before_time = timed(csv_reader_load, path)
+        after, after_time = timed(load_csv, path)
+        after = loaded_columns(after)
+        same = len(before) == len(after) and all(np.array_equal(a.view(np.uint64), b.view(np.uint64))
+                                                 for a, b in zip(before, after))
+        print(f"{name:34} {os.path.getsize(path) / 1e6:7.1f} {before_time:13.3f} {after_time:11.3f} "
+              f"{before_time / after_time:7.1f}x  {same}")
+
+    batch = os.path.join(directory, "batch")
+    os.makedirs(batch)
+    for k in range(files):
+        shutil.copy(export_file, os.path.join(batch, f"session_{k:03d}.csv"))
+    size = os.path.getsize(export_file) * files / 1e6
+    _, serial = timed(load_directory, batch, "*.csv", 1)
+    loaded, parallel = timed(load_directory, batch, "*.csv", workers)
+    print(f"batch of {files} files ({size:.0f} MB): serial {serial:.2f} s ({size / serial:.0f} MB/s), "
+          f"{workers} workers {parallel:.2f} s ({size / parallel:.0f} MB/s), {len(loaded)} loaded "
+          f"({os.cpu_count()} CPUs)")
+    shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Latency added per packet by the streaming EMG processor.
+
+Feeds packets of N EMG sensors (13.5 ms packets, sensors alternating between the 1926 Hz and 1259 Hz EMG modes)
+through EmgProcessor.process and reports mean / p99 / max time per packet for the RMS and linear envelopes,
+against the 13.5 ms packet period.
+
+Run from the project root:
+    python -m Benchmarks.EmgProcessingBenchmark [sensors] [packets]
+"""
+import sys
+import time
+
+import numpy as np
+
+from AeroPy.SimulatedBase import PACKET_SECONDS
+from Processing.EmgProcessor import EmgProcessor
+
+RATES = (1925.926, 1259.2593)
+
+
+def run(envelope, sensors, packets):
+    rng = np.random.default_rng(0)
+    channels = [(f"emg-{i}", RATES[i % len(RATES)], 'EMG') for i in range(sensors)]
+    processor = EmgProcessor(envelope=envelope)
+    processor.configure(channels)
+    lengths = [int(round(rate * PACKET_SECONDS)) for _, rate, _ in channels]
+    data = [rng.standard_normal((packets, n)) * 0.05 for n in lengths]
+
+    timings = np.empty(packets)
+    for p in range(packets):
+        packet = [data[c][p] for c in range(sensors)]
+        start = time.perf_counter()
+        processor.process(packet)
+        timings[p] = time.perf_counter() - start
+    return timings * 1e3
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    packets = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    print(f"{sensors} EMG channels, {packets} packets, packet period {PACKET_SECONDS * 1e3:.1f} ms")
+    for envelope in ('rms', 'linear'):
+        timings = run(envelope, sensors, packets)
+        print(f"{envelope:7s} envelope  mean {timings.mean():6.3f} ms   p99 {np.percentile(timings, 99):6.3f} ms   "
+              f"max {timings.max():6.3f} ms   ({timings.mean() / (PACKET_SECONDS * 1e3) * 100:.1f}% of the period)")
+
+
+if __name__ == '__main__':
+    main()
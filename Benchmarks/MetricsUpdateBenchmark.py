@@ -0,0 +1,86 @@
+"""
+Acquisition loop iterations/sec with metric labels updated on every packet vs through MetricsPublisher.
+
+The simulated base runs as fast as possible (realtime=False) so the loop is CPU bound:
+
+    per-packet setText   the previous PlottingManagement.updatemetrics: QLabel.setText from the acquisition thread
+                         after every packet
+    MetricsPublisher     the loop only updates counters, a GUI-thread QTimer refreshes the labels at 10 Hz
+
+Needs PySide6; runs with the offscreen Qt platform.
+
+Run from the project root:
+    python -m Benchmarks.MetricsUpdateBenchmark [seconds] [sensors]
+"""
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+from Benchmarks.BenchmarkSupport import HeadlessCollection
+from DataCollector.CollectionMetricsManagement import CollectionMetricsManagement
+from DataCollector.FrameQueue import FrameQueue
+from DataCollector.MetricsPublisher import MetricsPublisher
+
+
+def run(app, mode, seconds, sensors):
+    metrics = CollectionMetricsManagement()
+    collection = HeadlessCollection(sensor_count=sensors, realtime=False)
+    queue = collection.emg_plot = FrameQueue(64)
+    collection.base.csv_writer.streaming_export = False   # Keep the CSV thread out of the measurement
+    collection.start()
+    kernel = collection.DataHandler
+    state = collection.collectionState
+    iterations = [0]
+
+    def collect():
+        return {'framescollected': kernel.packetCount, 'queuedepth': queue.depth,
+                'droppedframes': queue.dropped + queue.coalesced}
+
+    def loop():
+        while not state.is_paused():
+            kernel.processData(queue)
+            queue.pop()
+            iterations[0] += 1
+            if mode == 'direct':
+                metrics.framescollected.setText(str(kernel.packetCount))
+                metrics.queuedepth.setText(str(queue.depth))
+                metrics.droppedframes.setText(str(queue.dropped + queue.coalesced))
+
+    publisher = None
+    if mode == 'publisher':
+        publisher = MetricsPublisher(collect, 10.0)
+        publisher.updated.connect(metrics.applymetrics)
+        publisher.start()
+
+    thread = threading.Thread(target=loop)
+    start = time.perf_counter()
+    thread.start()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec()
+    collection.stop()
+    thread.join()
+    elapsed = time.perf_counter() - start
+    if publisher is not None:
+        publisher.stop()
+    return iterations[0] / elapsed
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    print(f"{sensors} simulated EMG+ACC sensors (not real time), {seconds} s per run")
+    before = run(app, 'direct', seconds, sensors)
+    after = run(app, 'publisher', seconds, sensors)
+    print(f"per-packet setText (before)  {before:10.0f} iterations/s")
+    print(f"MetricsPublisher 10 Hz (after) {after:8.0f} iterations/s   ({after / before:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
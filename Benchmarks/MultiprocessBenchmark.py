@@ -0,0 +1,145 @@
+"""
+Throughput and end-to-end latency of the threaded and the multiprocess acquisition modes.
+
+Both modes run N simulated EMG+ACC sensors with EMG processing for a fixed time while a GUI-side thread does
+pure-Python busy work (standing in for Qt and plot preparation competing for the GIL):
+
+    thread        acquisition thread -> FrameQueue -> plot thread (resample_frame), all in this process
+    multiprocess  acquisition process (polling, EMG processing, resampling) -> SharedFrameRing -> plot thread
+
+Latency is measured from the packet being polled from the base to the plot thread having a plot-ready frame.
+
+Run from the project root:
+    python -m Benchmarks.MultiprocessBenchmark [seconds] [sensors] [gui load 0-1]
+"""
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from Benchmarks.BenchmarkSupport import HeadlessCollection
+from DataCollector.AcquisitionProcess import AcquisitionProcess, RemoteBase
+from DataCollector.AcquisitionScheduler import AdaptivePoller, CollectionState
+from DataCollector.FrameQueue import FrameQueue
+from Plotter.Resampler import resample_frame
+from Processing.EmgProcessor import EmgProcessor
+
+
+class StampedFrameQueue(FrameQueue):
+    """FrameQueue recording the time each packet was pushed (no drops at this capacity)"""
+
+    def __init__(self):
+        FrameQueue.__init__(self, capacity=10 ** 6)
+        self.stamps = deque()
+
+    def push(self, channel_arrays, polled=None):
+        self.stamps.append(time.perf_counter() if polled is None else polled)
+        FrameQueue.push(self, channel_arrays, polled)
+
+
+def gui_load(stop, load):
+    """Busy Python work for `load` of every 10 ms"""
+    while not stop.is_set():
+        end = time.perf_counter() + 0.01 * load
+        while time.perf_counter() < end:
+            sum(i * i for i in range(200))
+        time.sleep(0.01 * (1 - load))
+
+
+def run_threaded(seconds, sensors, load):
+    collection = HeadlessCollection(sensor_count=sensors)
+    collection.DataHandler.processor = EmgProcessor()
+    collection.emg_plot = queue = StampedFrameQueue()
+    collection.start()
+    state = collection.collectionState
+    latencies = []
+
+    def acquisition():
+        poller = AdaptivePoller()
+        while not state.is_paused():
+            if collection.DataHandler.processData(queue):
+                poller.reset()
+            else:
+                poller.idle(state.paused)
+
+    def plot():
+        while not state.is_paused():
+            if queue.wait(2, 0.005):
+                frame = queue.pop()
+                stamp = queue.stamps.popleft()
+                emg = collection.base.emgChannelsIdx
+                next_frame = queue.peek()
+                resample_frame(frame.channels(emg), [next_frame.channel(i)[0] for i in emg])
+                latencies.append(time.perf_counter() - stamp)
+
+    return _measure(seconds, load, [acquisition, plot], collection.stop, latencies, lambda: queue.dropped)
+
+
+def run_multiprocess(seconds, sensors, load):
+    acquisition = AcquisitionProcess(simulated=True, simulator_options={'sensor_count': sensors},
+                                     output_directory=tempfile.mkdtemp(prefix="trigno_benchmark_"))
+    ring = acquisition.ring
+    latencies = []
+
+    class Handler():
+        EMGplot = None
+        emg_plot = ring
+        collectionState = CollectionState(paused=True)
+
+        def threadManager(self, start_trigger, stop_trigger):
+            pass
+
+        pauseFlag = property(lambda self: self.collectionState.is_paused(),
+                             lambda self, paused: self.collectionState.set_paused(paused))
+
+    handler = Handler()
+    base = RemoteBase(acquisition, handler)
+    base.Connect_Callback()
+    base.Scan_Callback()
+    base.Start_Callback(False, False)
+
+    def plot():
+        while not handler.pauseFlag:
+            if ring.wait(1, 0.005):
+                frame = ring.pop()
+                frame.data.reshape(len(frame), -1)
+                latencies.append(time.perf_counter() - ring.last_stamp)
+
+    try:
+        return _measure(seconds, load, [plot], base.Stop_Callback, latencies, lambda: ring.dropped)
+    finally:
+        acquisition.close()
+
+
+def _measure(seconds, load, targets, stop_collection, latencies, dropped):
+    stop = threading.Event()
+    threads = [threading.Thread(target=target) for target in targets]
+    if load > 0:
+        threads.append(threading.Thread(target=gui_load, args=(stop, load)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    stop_collection()
+    for thread in threads:
+        thread.join()
+    latency = np.asarray(latencies) * 1e3
+    return len(latency) / seconds, np.percentile(latency, 50), np.percentile(latency, 99), dropped()
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    load = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    print(f"{sensors} simulated EMG+ACC sensors, {seconds} s per mode, GUI-side busy load {load * 100:.0f}%")
+    for label, run in (('thread', run_threaded), ('multiprocess', run_multiprocess)):
+        rate, p50, p99, dropped = run(seconds, sensors, load)
+        print(f"{label:13s} {rate:7.1f} frames/s   latency p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   "
+              f"dropped {dropped}")
+
+
+if __name__ == '__main__':
+    main()
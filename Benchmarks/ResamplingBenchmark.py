@@ -0,0 +1,86 @@
+"""
+Per-frame cost of bringing a multi-rate EMG frame to a common sample grid for the live plot.
+
+Builds frames for N sensors with the packet sizes the base delivers when sensors run in different modes (EMG raw
+at 2148 Hz, EMG+ACC at 1926 Hz, EMG at 1259 Hz) and times the previous per-channel loop in
+GenericPlot.plot_new_data (index vectors, one np.linspace per gap, random deletion for long channels) against
+Plotter.Resampler.resample_frame.
+
+Run from the project root:
+    python -m Benchmarks.ResamplingBenchmark [sensors] [frames]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from Plotter.Resampler import resample_frame
+
+PACKET_SAMPLES = (29, 26, 17)  # EMG samples per 13.5 ms packet at 2148, 1926 and 1259 Hz
+
+
+def loop_resample(data_frame, next_val):
+    """The previous GenericPlot.plot_new_data resampling stage"""
+    emgLen = max(len(x) for x in data_frame)
+    for i in range(len(data_frame)):
+        if len(data_frame[i]) < emgLen:
+            indexVector = []
+            for j in range(len(data_frame[i])):
+                indexVector.append(emgLen / len(data_frame[i]) * j)
+            quantIndexVector = []
+            for j in range(len(indexVector)):
+                quantIndexVector.append(round(indexVector[j]))
+            quantData = [None] * emgLen
+            dataInd = 0
+            for j in quantIndexVector:
+                quantData[j] = data_frame[i][dataInd]
+                dataInd += 1
+            for j in range(len(quantIndexVector)):
+                if j == len(quantIndexVector) - 1:
+                    arrToInsert = np.linspace(quantData[quantIndexVector[j]], next_val[i],
+                                              len(quantData) - quantIndexVector[j], endpoint=True)
+                    quantData[quantIndexVector[j]:] = arrToInsert
+                else:
+                    arrToInsert = np.linspace(quantData[quantIndexVector[j]], quantData[quantIndexVector[j + 1]],
+                                              quantIndexVector[j + 1] - quantIndexVector[j], endpoint=False)
+                    quantData[quantIndexVector[j]:quantIndexVector[j + 1]] = arrToInsert
+            data_frame[i] = quantData
+        elif len(data_frame[i]) > emgLen:
+            while len(data_frame[i]) != emgLen:
+                randIndex = random.randint(1, len(data_frame[i]) - 2)
+                data_frame[i] = np.delete(data_frame[i], randIndex)
+    return np.asarray(data_frame, dtype='object')
+
+
+def make_frames(sensors, count, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = [PACKET_SAMPLES[i % len(PACKET_SAMPLES)] for i in range(sensors)]
+    return [([rng.standard_normal(n).astype(np.float32) for n in lengths],
+             [float(v) for v in rng.standard_normal(sensors)]) for _ in range(count)]
+
+
+def time_per_frame(resample, frames):
+    start = time.perf_counter()
+    for data_frame, next_val in frames:
+        resample(list(data_frame), next_val)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    frames = make_frames(sensors, count)
+    print(f"{sensors} EMG channels, packet lengths {sorted(set(len(c) for c in frames[0][0]))}, {count} frames")
+    before = time_per_frame(loop_resample, frames)
+    after = time_per_frame(resample_frame, frames)
+    print(f"per-channel loop (before)  {before * 1e6:8.1f} us/frame")
+    print(f"resample_frame (after)     {after * 1e6:8.1f} us/frame   ({before / after:.1f}x)")
+
+    data_frame, next_val = frames[0]
+    print("deterministic:", np.array_equal(resample_frame(list(data_frame), next_val),
+                                           resample_frame(list(data_frame), next_val)))
+
+
+if __name__ == '__main__':
+    main()
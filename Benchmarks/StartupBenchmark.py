@@ -0,0 +1,86 @@
+"""
+Application startup: import time of the modules loaded before the start window appears, and the loads deferred
+until they are needed.
+
+    startup imports     each module is imported in a fresh interpreter with -X importtime; reports the total, the
+                        heaviest packages it pulled in, and whether vispy, pythonnet/clr or scipy were among them
+                        (none of them should be: they load on Connect / with the first plot panel / on the first
+                        EMG filter design)
+    deferred loads      load_aeropy() (.NET runtime + DelsysAPI), the first EmgProcessor.configure() (scipy.signal)
+                        and Plotter.GenericPlot (vispy), each timed in a fresh interpreter
+
+Modules whose dependencies are not installed (PySide6, vispy, pythonnet outside Windows) are reported as such.
+
+Run from the project root:
+    python -m Benchmarks.StartupBenchmark [repeats]
+"""
+import json
+import os
+import subprocess
+import sys
+
+STARTUP_MODULES = ["UIControls.LandingScreenController", "DataCollector.CollectDataController", "AeroPy.TrignoBase",
+                   "Processing.EmgProcessor", "Export.CsvWriter"]
+DEFERRED = ["vispy", "pythonnet", "clr", "scipy"]
+
+DEFERRED_LOADS = {
+    "load_aeropy() (.NET runtime, DelsysAPI)": "from AeroPy.TrignoBase import load_aeropy\nload_aeropy()",
+    "EmgProcessor.configure() (scipy.signal)": "from Processing.EmgProcessor import EmgProcessor\n"
+                                               "EmgProcessor().configure([('a', 1925.926, 'EMG')])",
+    "Plotter.GenericPlot (vispy)": "import Plotter.GenericPlot",
+}
+
+_REPORT = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    exec(sys.argv[1])
+    error = None
+except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+print(json.dumps({'seconds': time.perf_counter() - start, 'error': error,
+                  'loaded': [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def run(code, importtime=False):
+    """Run code in a fresh interpreter. Returns (report dict, -X importtime lines)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _REPORT, code] + DEFERRED
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd())
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report, [line for line in result.stderr.splitlines() if line.startswith("import time:")]
+
+
+def heaviest(lines, count=5):
+    """Third-party/standard packages of -X importtime output with the largest cumulative time (seconds)"""
+    packages = {}
+    for line in lines[1:]:
+        _, cumulative, name = line[len("import time:"):].split("|")
+        root = name.strip().split(".")[0]
+        if not os.path.isdir(root):     # Project packages include everything they import
+            packages[root] = max(packages.get(root, 0.0), int(cumulative) / 1e6)
+    return sorted(packages.items(), key=lambda item: -item[1])[:count]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'startup import':38} {'seconds':>8}  deferred modules loaded / heaviest packages")
+    for module in STARTUP_MODULES:
+        reports = [run(f"import {module}") for _ in range(repeats)]
+        report, lines = run(f"import {module}", importtime=True)
+        if report['error']:
+            print(f"{module:38} {'-':>8}  not importable here ({report['error']})")
+            continue
+        seconds = min(r['seconds'] for r, _ in reports)
+        packages = ", ".join(f"{name} {t:.2f}" for name, t in heaviest(lines))
+        print(f"{module:38} {seconds:8.3f}  {report['loaded'] or 'none'} / {packages}")
+
+    print(f"\n{'deferred load':38} {'seconds':>8}")
+    for name, code in DEFERRED_LOADS.items():
+        report = min((run(code)[0] for _ in range(repeats)), key=lambda r: r['seconds'])
+        status = f"  not available here ({report['error']})" if report['error'] else ""
+        print(f"{name:38} {report['seconds']:8.3f}{status}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-packet cost of the throw detector on a recorded session.
+
+Replays a Trigno CSV (default data.csv) in 13.5 ms packets through EmgProcessor + ThrowDetector, as DataKernel
+does during collection, with the recorded sensors repeated to N sensors (each copy shifted in time). Reports the
+time per packet of the detector alone and of processor + detector against the packet period, the throws found,
+and checks that packet-by-packet detection matches detecting on the whole recording at once.
+
+Dropout case (2+ sensors): the last sensor stops sending after a third of the packets. Reports the detection frames
+evaluated against the run without dropout and the largest number of samples carried over between packets (both
+should stay bounded: the silent sensor is zero padded after ThrowDetector.stall seconds).
+
+Run from the project root:
+    python -m Benchmarks.ThrowDetectionBenchmark [csv file] [sensors]
+"""
+import sys
+import time
+
+import numpy as np
+
+from AeroPy.SimulatedBase import PACKET_SECONDS, read_trigno_csv
+from Processing.EmgProcessor import EmgProcessor
+from Processing.ThrowDetector import ThrowDetector
+
+
+def load(path, sensors):
+    """Channels [(guid, rate, type)] and sample arrays of the recording, repeated to `sensors` sensors"""
+    recorded = read_trigno_csv(path)
+    channels, data = [], []
+    for copy in range(sensors):
+        label, sensor_channels = recorded[copy % len(recorded)]
+        for name, rate, samples in sensor_channels:
+            samples = np.asarray(samples)
+            shift = int(len(samples) * copy / sensors)
+            channels.append((f"{copy}:{label}:{name}", rate, name.split()[0].upper()))
+            data.append(np.roll(samples, shift))
+    return channels, data
+
+
+def packets(channels, data):
+    duration = min(len(samples) / rate for samples, (_, rate, _) in zip(data, channels))
+    for p in range(int(duration / PACKET_SECONDS)):
+        yield [samples[int(round(p * PACKET_SECONDS * rate)):int(round((p + 1) * PACKET_SECONDS * rate))]
+               for samples, (_, rate, _) in zip(data, channels)]
+
+
+def run(channels, data):
+    processor = EmgProcessor()
+    processor.configure(channels)
+    detector = ThrowDetector()
+    detector.configure(channels, list(zip(processor.channel_guids, processor.channel_rates)))
+    detect_times, total_times = [], []
+    for packet in packets(channels, data):
+        start = time.perf_counter()
+        envelopes = processor.process(packet)
+        detected = time.perf_counter()
+        detector.process(packet, envelopes)
+        end = time.perf_counter()
+        detect_times.append(end - detected)
+        total_times.append(end - start)
+    detector.flush()
+    return np.asarray(detect_times) * 1e3, np.asarray(total_times) * 1e3, detector.throws
+
+
+def run_dropout(channels, data, sensors):
+    """Packet by packet with the last sensor silent after a third of the packets.
+    Returns (frames evaluated, largest carry in samples, mean ms per packet)"""
+    processor = EmgProcessor()
+    processor.configure(channels)
+    detector = ThrowDetector()
+    detector.configure(channels, list(zip(processor.channel_guids, processor.channel_rates)))
+    silent = [k for k, (guid, _, _) in enumerate(channels) if guid.startswith(f"{sensors - 1}:")]
+    all_packets = list(packets(channels, data))
+    largest, times = 0, []
+    for p, packet in enumerate(all_packets):
+        if p >= len(all_packets) // 3:
+            packet = [np.zeros(0) if k in silent else samples for k, samples in enumerate(packet)]
+        start = time.perf_counter()
+        detector.process(packet, processor.process(packet))
+        times.append(time.perf_counter() - start)
+        largest = max([largest] + [len(carry) for rows, _ in detector.acc_groups + detector.emg_groups
+                                   for carry in rows.carry])
+    return detector.frames, largest, np.mean(times) * 1e3
+
+
+def run_block(channels, data):
+    """Whole recording in one call"""
+    processor = EmgProcessor()
+    processor.configure(channels)
+    detector = ThrowDetector()
+    detector.configure(channels, list(zip(processor.channel_guids, processor.channel_rates)))
+    lengths = [int(round(int(min(len(s) / r for s, (_, r, _) in zip(data, channels)) / PACKET_SECONDS)
+                         * PACKET_SECONDS * rate)) for _, rate, _ in channels]
+    block = [samples[:n] for samples, n in zip(data, lengths)]
+    start = time.perf_counter()
+    detector.process(block, processor.process(block))
+    detector.flush()
+    return (time.perf_counter() - start) * 1e3, detector.throws
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.csv"
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    channels, data = load(path, sensors)
+    detect, total, throws = run(channels, data)
+    block_ms, block_throws = run_block(channels, data)
+    period = PACKET_SECONDS * 1e3
+    print(f"{path}: {sensors} sensor(s), {len(channels)} channels, {len(detect)} packets of {period:.1f} ms")
+    print(f"detector             mean {detect.mean():6.3f} ms   p99 {np.percentile(detect, 99):6.3f} ms   "
+          f"max {detect.max():6.3f} ms   ({detect.mean() / period * 100:.1f}% of the period)")
+    print(f"processor + detector mean {total.mean():6.3f} ms   p99 {np.percentile(total, 99):6.3f} ms   "
+          f"max {total.max():6.3f} ms   ({total.mean() / period * 100:.1f}% of the period)")
+    print(f"whole recording in one call: {block_ms:.1f} ms")
+    for throw in throws:
+        print(f"  throw {throw['throw']:3d}  {throw['onset_time']:8.3f} - {throw['end_time']:8.3f} s   "
+              f"peak ACC {throw['peak_acc']:5.2f} g   peak EMG envelope {throw['peak_emg']:5.2f}")
+    same = [t['onset_samples'] for t in throws] == [t['onset_samples'] for t in block_throws]
+    print(f"{len(throws)} throws, packet-by-packet matches whole recording: {same}")
+    if sensors > 1:
+        full_frames = run_dropout(channels, data, sensors + 1)[0]     # No sensor with that index: no dropout
+        frames, largest, mean_ms = run_dropout(channels, data, sensors)
+        print(f"dropout of sensor {sensors} after a third of the packets: {frames} of {full_frames} frames evaluated, "
+              f"largest carry {largest} samples, processor + detector mean {mean_ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
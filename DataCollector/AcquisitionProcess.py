@@ -0,0 +1,369 @@
+"""
+Multiprocess acquisition mode.
+
+The Trigno base, the DataKernel polling loop, EMG processing and plot resampling run in a separate process, so
+Python work in the GUI process (plot preparation, Qt) cannot add jitter to acquisition and vice versa.
+
+    GUI process                                     acquisition process (acquisition_main)
+    PlottingManagement(multiprocess=True)           TrignoBase + DataKernel + EmgProcessor
+      base = RemoteBase  ---- control Pipe ---->      connect / scan / start / stop / trigger state / export
+      emg_plot = SharedFrameRing  <-- shared_memory --  resampled EMG plot rows, one frame per packet
+
+The acquisition process owns the base: it connects, scans and configures it, records the session and writes the
+exports. RemoteBase mirrors the TrignoBase methods the GUI uses and forwards them over the pipe; sensors come back as
+picklable SensorSummary objects.
+"""
+import atexit
+import multiprocessing
+import threading
+import time
+
+from AeroPy.DataManager import DataKernel
+from AeroPy.SampleClock import PlotAligner
+from AeroPy.SensorMetadata import SensorSummary
+from AeroPy.SimulatedBase import SimulatedAeroPy
+from AeroPy.TrignoBase import TrignoBase, check_cancel, report_progress
+from DataCollector.AcquisitionScheduler import AdaptivePoller, CollectionState
+from DataCollector.SharedFrameRing import SharedFrameRing
+from Plotter.Resampler import resample_frame
+from Processing.EmgProcessor import EmgProcessor
+from Processing.ThrowDetector import ThrowDetector
+
+# Methods the GUI process may call on the remote TrignoBase, TrigBase (AeroPy) and CsvWriter
+BASE_CALLS = ('PipelineState_Callback', 'Connect_Callback', 'Pair_Callback', 'CheckPairStatus',
+              'CheckPairComponentAdded', 'Scan_Callback', 'Stop_Callback', 'getSampleModes', 'getCurMode',
+              'setSampleMode')
+TRIGBASE_CALLS = ('GetScannedSensorsFound', 'IsWaitingForStartTrigger', 'IsWaitingForStopTrigger', 'CancelPair')
+CSV_WRITER_CALLS = ('set_custom_filename', 'set_muscle_map', 'set_muscle_names', 'exportCSV', 'exportYTCSV',
+                    'exportSession', 'exportArchive', 'exportThrowIndex', 'catalogSession', 'finish_stream')
+
+
+def _portable(value):
+    """Convert a result to something that can be sent through the pipe (.NET objects are not picklable)"""
+    if value is None or isinstance(value, (bool, int, float, str, dict)):
+        return value
+    if hasattr(value, 'PairNumber') and hasattr(value, 'TrignoChannels'):
+        return SensorSummary(value, portable=True)
+    if isinstance(value, (list, tuple)) or hasattr(value, 'Count'):
+        return [_portable(item) for item in value]
+    return str(value)
+
+
+# -----------------------------------------------------------------------
+# ---- Acquisition process
+
+class _PlotSink():
+    """DataKernel output queue in the acquisition process: resamples each packet's EMG rows for the plot and
+    pushes them into the shared ring. A packet is sent when the next one arrives (its first samples are the
+    interpolation targets), the same one packet delay as the threaded plot loop."""
+
+    def __init__(self, ring, collection):
+        self.ring = ring
+        self.collection = collection
+        self.aligner = None
+        self.pending = None
+        self.pending_stamp = None
+
+    def push(self, channel_arrays, polled=None):
+        stamp = time.perf_counter() if polled is None else polled
+        emg_idx = self.collection.base.emgChannelsIdx
+        if not emg_idx:
+            return
+        if self.aligner is None:
+            # Cut packets at the time every EMG channel has reached (see SampleClock.PlotAligner)
+            self.aligner = PlotAligner(self.collection.DataHandler.clock.rates[emg_idx])
+        rows = [channel_arrays[i] for i in emg_idx]
+        if self.pending is not None and len(self.pending[0]) > 0:
+            next_val = self.aligner.next_values(rows, self.pending)
+            self.ring.push(resample_frame(self.pending, next_val), self.pending_stamp)
+        self.pending = self.aligner.push(rows)
+        self.pending_stamp = stamp
+
+    def reset(self):
+        self.aligner = None
+        self.pending = None
+
+    def wake(self):
+        pass
+
+
+class _AcquisitionCollection():
+    """Stands in for PlottingManagement inside the acquisition process (no Qt, no plot)"""
+
+    def __init__(self, ring, simulated, replay_file, stream_yt, simulator_options, output_directory,
+                 storage_options=None):
+        self.EMGplot = None
+        self.streamYTData = stream_yt
+        self.collectionState = CollectionState(paused=True)
+        self.emg_plot = _PlotSink(ring, self)
+        self.base = TrignoBase(self, simulated, replay_file)
+        if output_directory:
+            self.base.csv_writer.output_directory = output_directory
+        if simulator_options:
+            self.base.TrigBase = SimulatedAeroPy(replay_file=replay_file, **simulator_options)
+        self.DataHandler = DataKernel(self.base)
+        self.DataHandler.processor = EmgProcessor()
+        self.DataHandler.detector = ThrowDetector()
+        if storage_options:
+            self.DataHandler.setStorage(**storage_options)
+        self.base.DataHandler = self.DataHandler
+        self.pollMinPeriod = 0.0005
+        self.pollMaxPeriod = 0.005
+        self.pollBackoff = 2.0
+        self.t1 = None
+
+    @property
+    def pauseFlag(self):
+        return self.collectionState.is_paused()
+
+    @pauseFlag.setter
+    def pauseFlag(self, paused):
+        self.collectionState.set_paused(paused)
+
+    def newPoller(self):
+        return AdaptivePoller(self.pollMinPeriod, self.pollMaxPeriod, self.pollBackoff)
+
+    def threadManager(self, start_trigger, stop_trigger):
+        self.emg_plot.reset()
+        process = self.DataHandler.processYTData if self.streamYTData else self.DataHandler.processData
+        self.t1 = threading.Thread(target=self.acquisitionLoop, args=(process,), daemon=True)
+        self.t1.start()
+        if start_trigger:
+            threading.Thread(target=self.waiting_for_start_trigger, daemon=True).start()
+        if stop_trigger:
+            threading.Thread(target=self.waiting_for_stop_trigger, daemon=True).start()
+
+    def acquisitionLoop(self, process):
+        self.collectionState.collecting.wait()
+        poller = self.newPoller()
+        while self.pauseFlag is False:
+            if process(self.emg_plot):
+                poller.reset()
+            else:
+                poller.idle(self.collectionState.paused)
+
+    def waiting_for_start_trigger(self):
+        self.newPoller().wait_while(self.base.TrigBase.IsWaitingForStartTrigger)
+        self.pauseFlag = False
+
+    def waiting_for_stop_trigger(self):
+        poller = self.newPoller()
+        poller.wait_while(self.base.TrigBase.IsWaitingForStartTrigger)
+        poller.wait_while(self.base.TrigBase.IsWaitingForStopTrigger)
+        self.pauseFlag = True
+        self.DataHandler.processData(self.emg_plot)
+        self.DataHandler.stream_writer = None
+        self.base.csv_writer.finish_stream()
+
+
+def acquisition_main(connection, ring_spec, simulated=False, replay_file=None, stream_yt=False,
+                     simulator_options=None, output_directory=None, storage_options=None):
+    """Entry point of the acquisition process: serve control commands until 'shutdown'"""
+    ring = SharedFrameRing(**ring_spec)
+    collection = _AcquisitionCollection(ring, simulated, replay_file, stream_yt, simulator_options, output_directory,
+                                        storage_options)
+    base = collection.base
+    while True:
+        command, args = connection.recv()
+        if command == 'shutdown':
+            break
+        try:
+            if command == 'call' and args[0] in BASE_CALLS:
+                if args[0] == 'Pair_Callback':   # Blocks until paired, the GUI polls CheckPairStatus meanwhile
+                    threading.Thread(target=base.Pair_Callback, daemon=True).start()
+                    result = None
+                else:
+                    result = getattr(base, args[0])(*args[1])
+            elif command == 'trigbase' and args[0] in TRIGBASE_CALLS:
+                result = getattr(base.TrigBase, args[0])(*args[1])
+            elif command == 'csv_writer' and args[0] in CSV_WRITER_CALLS:
+                result = getattr(base.csv_writer, args[0])(*args[1], **args[2])
+            elif command == 'set':
+                setattr(base, args[0], args[1])
+                result = None
+            elif command == 'prepare':
+                result = {'configured': bool(base.prepareCollection(*args)),
+                          'emgChannelsIdx': list(getattr(base, 'emgChannelsIdx', [])),
+                          'channel_guids': [str(guid) for guid in base.channel_guids],
+                          'channelcount': base.channelcount, 'plotCount': getattr(base, 'plotCount', 0)}
+            elif command == 'begin':
+                base.beginCollection()
+                result = None
+            elif command == 'stats':
+                result = {'packetCount': collection.DataHandler.packetCount,
+                          'sampleCount': collection.DataHandler.sampleCount}
+            else:
+                raise ValueError("Unknown command: " + str(command) + " " + str(args[:1]))
+            connection.send(('ok', _portable(result)))
+        except Exception as e:
+            connection.send(('error', repr(e)))
+    collection.pauseFlag = True
+    ring.close()
+
+
+# -----------------------------------------------------------------------
+# ---- GUI process side
+
+class AcquisitionProcess():
+    """
+    Starts the acquisition process and owns the shared ring and the control pipe. storage_options are the
+    DataKernel.setStorage keyword arguments of the session storage in the acquisition process (None: in memory)
+    """
+
+    def __init__(self, simulated=False, replay_file=None, stream_yt=False, simulator_options=None,
+                 output_directory=None, ring_capacity=256, max_channels=64, slot_samples=8192, storage_options=None):
+        self.simulated = simulated or replay_file is not None     # As TrignoBase.simulated
+        self.ring = SharedFrameRing(ring_capacity, max_channels, slot_samples)
+        context = multiprocessing.get_context('spawn')   # No fork of a process running Qt threads
+        self.connection, child_connection = context.Pipe()
+        self._lock = threading.Lock()
+        self.process = context.Process(target=acquisition_main, daemon=True,
+                                       args=(child_connection, self.ring.spec(), simulated, replay_file, stream_yt,
+                                             simulator_options, output_directory, storage_options))
+        self.process.start()
+        atexit.register(self.close)
+
+    def request(self, command, *args):
+        """Send a control command and wait for its result. Safe to call from several threads"""
+        with self._lock:
+            self.connection.send((command, args))
+            status, result = self.connection.recv()
+        if status == 'error':
+            raise RuntimeError("Acquisition process: " + result)
+        return result
+
+    def call(self, method, *args):
+        return self.request('call', method, args)
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.is_alive():
+                with self._lock:
+                    self.connection.send(('shutdown', ()))
+                self.process.join(timeout=5)
+        finally:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+            self.ring.close()
+
+
+class _RemoteTrigBase():
+    def __init__(self, acquisition):
+        self.acquisition = acquisition
+
+    def GetScannedSensorsFound(self):
+        return self.acquisition.request('trigbase', 'GetScannedSensorsFound', ())
+
+    def IsWaitingForStartTrigger(self):
+        return self.acquisition.request('trigbase', 'IsWaitingForStartTrigger', ())
+
+    def IsWaitingForStopTrigger(self):
+        return self.acquisition.request('trigbase', 'IsWaitingForStopTrigger', ())
+
+    def CancelPair(self):
+        return self.acquisition.request('trigbase', 'CancelPair', ())
+
+
+class _RemoteCsvWriter():
+    """The session is recorded in the acquisition process, so exports run there"""
+
+    def __init__(self, acquisition):
+        self.acquisition = acquisition
+        self.export_session_file = True
+        self.export_archive = False
+        self.export_throw_index = True
+        self.export_catalog = True
+
+    def __getattr__(self, name):
+        if name not in CSV_WRITER_CALLS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.acquisition.request('csv_writer', name, args, kwargs)
+
+
+class RemoteBase():
+    """TrignoBase interface of a base owned by the acquisition process"""
+
+    def __init__(self, acquisition, collection_data_handler):
+        self.acquisition = acquisition
+        self.collection_data_handler = collection_data_handler
+        self.TrigBase = _RemoteTrigBase(acquisition)
+        self.csv_writer = _RemoteCsvWriter(acquisition)
+        self.simulated = acquisition.simulated
+        self.channelcount = 0
+        self.emgChannelsIdx = []
+        self.channel_guids = []
+        self.plotCount = 0
+        self.pair_number = 0
+
+    def PipelineState_Callback(self):
+        return self.acquisition.call('PipelineState_Callback')
+
+    def Connect_Callback(self):
+        return self.acquisition.call('Connect_Callback')
+
+    def Pair_Callback(self):
+        self.acquisition.request('set', 'pair_number', self.pair_number)
+        return self.acquisition.call('Pair_Callback')
+
+    def CheckPairStatus(self):
+        return self.acquisition.call('CheckPairStatus')
+
+    def CheckPairComponentAdded(self):
+        return self.acquisition.call('CheckPairComponentAdded')
+
+    def Scan_Callback(self, progress=None, cancel=None):
+        """Scan in the acquisition process (retries happen there); progress and cancel only act around the call"""
+        check_cancel(cancel)
+        report_progress(progress, "Scanning")
+        sensors = self.acquisition.call('Scan_Callback')
+        report_progress(progress, "Reading sensors", len(sensors), len(sensors))
+        return sensors
+
+    def Start_Callback(self, start_trigger, stop_trigger):
+        if self.prepareCollection(start_trigger, stop_trigger):
+            self.beginCollection()
+
+    def prepareCollection(self, start_trigger, stop_trigger, progress=None, cancel=None):
+        """Configure the collection in the acquisition process. Returns True when configured"""
+        check_cancel(cancel)
+        report_progress(progress, "Configuring pipeline")
+        self.collection_data_handler.emg_plot.clear()
+        self.acquisition.request('set', 'sensor_muscle_map', dict(getattr(self, 'sensor_muscle_map', {})))
+        layout = self.acquisition.request('prepare', start_trigger, stop_trigger)
+        self.start_trigger = start_trigger
+        self.stop_trigger = stop_trigger
+        if not layout['configured']:
+            return False
+        self.emgChannelsIdx = layout['emgChannelsIdx']
+        self.channel_guids = layout['channel_guids']
+        self.channelcount = layout['channelcount']
+        self.plotCount = layout['plotCount']
+        report_progress(progress, "Configured", 1, 1)
+        return True
+
+    def beginCollection(self):
+        """Start the prepared collection: streaming in the acquisition process, plot canvas and GUI-side threads
+        here (GUI thread)"""
+        handler = self.collection_data_handler
+        self.acquisition.request('begin')
+        if handler.EMGplot:
+            handler.EMGplot.initiateCanvas(None, None, self.plotCount, 1, 20000)
+        if not self.start_trigger:
+            handler.pauseFlag = False
+        handler.threadManager(self.start_trigger, self.stop_trigger)
+
+    def Stop_Callback(self):
+        self.collection_data_handler.pauseFlag = True
+        self.acquisition.call('Stop_Callback')
+
+    def getSampleModes(self, sensorIdx):
+        return self.acquisition.call('getSampleModes', sensorIdx)
+
+    def getCurMode(self, sensorIdx):
+        return self.acquisition.call('getCurMode', sensorIdx)
+
+    def setSampleMode(self, curSensor, setMode):
+        return self.acquisition.call('setSampleMode', curSensor, setMode)
@@ -0,0 +1,76 @@
+"""
+Scheduling helpers for the acquisition threads in CollectDataController.py.
+
+The DelsysAPI only offers polling (CheckDataQueue(), IsWaitingForStartTrigger(), ...), so the threads cannot block
+on the base itself. Instead of spinning on those calls they sleep between polls with an adaptive period: the period
+resets to min_period whenever a poll finds data and backs off geometrically up to max_period while the base is idle.
+Sleeps are done by waiting on a threading.Event, so a state change (pause, stop, trigger) wakes the thread at once.
+"""
+import threading
+import time
+
+
+class AdaptivePoller():
+    def __init__(self, min_period=0.0005, max_period=0.005, backoff=2.0):
+        self.min_period = float(min_period)
+        self.max_period = float(max_period)
+        self.backoff = float(backoff)
+        self.period = self.min_period
+        self.polls = 0
+        self.idle_polls = 0
+
+    def reset(self):
+        """Call after a poll that returned data"""
+        self.polls += 1
+        self.period = self.min_period
+
+    def idle(self, wake_event=None):
+        """Call after a poll that returned nothing. Sleeps for the current period (or until wake_event is set),
+        then backs off. Returns True if woken by wake_event"""
+        self.polls += 1
+        self.idle_polls += 1
+        if wake_event is not None:
+            woken = wake_event.wait(self.period)
+        else:
+            time.sleep(self.period)
+            woken = False
+        self.period = min(self.max_period, self.period * self.backoff)
+        return woken
+
+    def wait_while(self, condition, wake_event=None):
+        """Poll condition() until it returns False. Returns False early if wake_event is set"""
+        self.period = self.min_period
+        while condition():
+            if self.idle(wake_event):
+                return False
+        return True
+
+
+class CollectionState():
+    """Pause/collect state shared by the acquisition, plot and trigger threads.
+
+    collecting is set while data should be streamed, paused is its complement, so threads can block on whichever
+    transition they are waiting for instead of spinning on a flag."""
+
+    def __init__(self, paused=True):
+        self.collecting = threading.Event()
+        self.paused = threading.Event()
+        self._listeners = []
+        self.set_paused(paused)
+
+    def set_paused(self, paused):
+        if paused:
+            self.collecting.clear()
+            self.paused.set()
+        else:
+            self.paused.clear()
+            self.collecting.set()
+        for listener in self._listeners:
+            listener()
+
+    def is_paused(self):
+        return self.paused.is_set()
+
+    def add_listener(self, callback):
+        """callback() is run on every state change, e.g. to wake a thread blocked on a queue"""
+        self._listeners.append(callback)
@@ -0,0 +1,67 @@
+"""
+Background tasks for the slow base operations (sensor scan, collection configuration).
+
+BaseTask runs a TrignoBase method on a worker thread so the GUI stays responsive while the DelsysAPI works. The
+method is called with progress and cancel keyword arguments (see TrignoBase.Scan_Callback / prepareCollection):
+progress reports arrive through the `progress` signal, the outcome through `finished`, `failed` or `cancelled`.
+The task object lives on the GUI thread, so its signals are delivered there (queued) and slots may update widgets.
+
+`future` is a concurrent.futures.Future of the result, for callers that want to wait on the task
+(future.result(timeout)) or await it (asyncio.wrap_future(task.future)).
+
+Use Example:
+task = BaseTask(base.Scan_Callback, parent=window)
+task.progress.connect(window.task_progress)
+task.finished.connect(window.scan_finished)
+task.start()
+...
+task.cancel()   # Stops at the next retry or sensor, emits cancelled
+"""
+import threading
+from concurrent.futures import Future
+
+from PySide6.QtCore import QObject, Signal
+
+from AeroPy.TrignoBase import OperationCancelled
+
+
+class BaseTask(QObject):
+    progress = Signal(str, int, int)    # message, done, total (total 0 when unknown)
+    finished = Signal(object)           # result of the method
+    failed = Signal(str)                # error message
+    cancelled = Signal()
+
+    def __init__(self, function, *args, parent=None):
+        QObject.__init__(self, parent)
+        self.function = function
+        self.args = args
+        self.cancel_event = threading.Event()
+        self.future = Future()
+        self.thread = None
+
+    def start(self):
+        self.future.set_running_or_notify_cancel()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Ask the method to stop at its next cancellation point"""
+        self.cancel_event.set()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        try:
+            result = self.function(*self.args, progress=self.progress.emit, cancel=self.cancel_event)
+        except OperationCancelled as e:
+            self.future.set_exception(e)
+            self.cancelled.emit()
+        except Exception as e:
+            print("Base task error: " + repr(e))
+            self.future.set_exception(e)
+            self.failed.emit(str(e))
+        else:
+            self.future.set_result(result)
+            self.finished.emit(result)
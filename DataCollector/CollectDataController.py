@@ -3,80 +3,206 @@ Controller class for the Data Collector GUI
 This is the controller for the GUI that lets you connect to a base, scan via rf for sensors, and stream data from them in real time.
 """
 
-from collections import deque
+import threading
+import time
 
-from Plotter.GenericPlot import *
-from AeroPy.TrignoBase import *
+from AeroPy.TrignoBase import TrignoBase
 from AeroPy.DataManager import *
-
-clr.AddReference("System.Collections")
-
-app.use_app('PySide6')
+from AeroPy.SampleClock import PlotAligner
+from DataCollector.FrameQueue import FrameQueue
+from DataCollector.AcquisitionScheduler import AdaptivePoller, CollectionState
+from DataCollector.AcquisitionProcess import AcquisitionProcess, RemoteBase
+from DataCollector.Instrumentation import PipelineInstrumentation
+from DataCollector.MetricsPublisher import MetricsPublisher
+from Processing.EmgProcessor import EmgProcessor
+from Processing.ThrowDetector import ThrowDetector
 
 
 class PlottingManagement():
-    def __init__(self, collect_data_window, metrics, emgplot=None):
-        self.base = TrignoBase(self)
+    def __init__(self, collect_data_window, metrics, emgplot=None, simulated=False, replay_file=None,
+                 multiprocess=False, spill_directory=None):
+        self.streamYTData = False # set to True to stream data in (T, Y) format (T = time stamp in seconds Y = sample value)
+
+        # spill_directory keeps only the newest storageMemoryChunks chunks (storageChunkSeconds each) of every
+        # channel in memory for long sessions, older samples go to memory-mapped files in a session directory there.
+        # storageFsync: 'never', 'chunk' (after every chunk written) or 'close'
+        self.spillDirectory = spill_directory
+        self.storageChunkSeconds = 10.0
+        self.storageMemoryChunks = 2
+        self.storageFsync = 'chunk'
+        storage_options = dict(spill_directory=self.spillDirectory, chunk_seconds=self.storageChunkSeconds,
+                               memory_chunks=self.storageMemoryChunks, fsync=self.storageFsync)
+
+        # multiprocess=True runs the base, polling, EMG processing and plot resampling in a separate process
+        # (see AcquisitionProcess.py); plot frames arrive through a shared memory ring. The session is recorded
+        # there, so the storage options go to that process
+        self.multiprocess = multiprocess
+        if multiprocess:
+            self.acquisition = AcquisitionProcess(simulated, replay_file, self.streamYTData,
+                                                  storage_options=storage_options)
+            self.base = RemoteBase(self.acquisition, self)
+        else:
+            self.acquisition = None
+            self.base = TrignoBase(self, simulated, replay_file)  # simulated/replay_file select SimulatedAeroPy
         self.collect_data_window = collect_data_window
         self.EMGplot = emgplot
         self.metrics = metrics
         self.packetCount = 0  # Number of packets received from base
+
+        # Acquisition -> plot frame queue. When plotting falls behind, 'drop_oldest' discards the oldest packet and
+        # 'coalesce' merges new packets into the newest queued one
+        self.frameQueueCapacity = 64
+        self.frameQueueOverflow = 'drop_oldest'
+        self.emg_plot = self.acquisition.ring if multiprocess else FrameQueue(self.frameQueueCapacity,
+                                                                              self.frameQueueOverflow)
+
+        self.collectionState = CollectionState(paused=True)  # Events behind pauseFlag, threads block on these
+        self.collectionState.add_listener(lambda: self.emg_plot.wake())
         self.pauseFlag = True  # Flag to start/stop collection and plotting
         self.DataHandler = DataKernel(self.base)  # Data handler for receiving data from base
         self.base.DataHandler = self.DataHandler
+        if not multiprocess:
+            # Live EMG bandpass/notch, rectification and RMS envelope, stored in DataHandler.allenvelopedata
+            # (set to None to disable)
+            self.DataHandler.processor = EmgProcessor()
+            # Throw onsets/ends from the ACC magnitude and EMG envelope, exported as a per-throw index next to the
+            # CSV (set to None to disable)
+            self.DataHandler.detector = ThrowDetector()
+            self.DataHandler.setStorage(**storage_options)
+
+        # Packet timestamps from poll to draw and samples/sec per channel, shown in the instrumentation panel
+        self.instrumentation = PipelineInstrumentation()
+        self.instrumentationRefreshPeriod = 0.5  # seconds between instrumentation panel refreshes
+        self._lastInstrumentationRefresh = 0.0
+        self.DataHandler.instrumentation = self.instrumentation
+        if self.EMGplot:
+            self.EMGplot.instrumentation = self.instrumentation
+
+        # Metric labels are refreshed from the GUI thread at metricsRefreshRate (Hz), the acquisition and plot
+        # threads only update counters
+        self.metricsRefreshRate = 10.0
+        self.metricsPublisher = MetricsPublisher(self.collectmetrics, self.metricsRefreshRate)
+        self.metricsPublisher.updated.connect(self.metrics.applymetrics)
+        self.metricsPublisher.start()
         self.outData = [[0]]
         self.Index = None
         self.newTransform = None
 
-        self.streamYTData = False # set to True to stream data in (T, Y) format (T = time stamp in seconds Y = sample value)
+        # Polling of TrigBase.CheckDataQueue() and the trigger state: the period starts at pollMinPeriod after data
+        # arrives and backs off by pollBackoff up to pollMaxPeriod (seconds) while the queue is empty
+        self.pollMinPeriod = 0.0005
+        self.pollMaxPeriod = 0.005
+        self.pollBackoff = 2.0
+
+    @property
+    def pauseFlag(self):
+        return self.collectionState.is_paused()
+
+    @pauseFlag.setter
+    def pauseFlag(self, paused):
+        self.collectionState.set_paused(paused)
+
+    def newPoller(self):
+        return AdaptivePoller(self.pollMinPeriod, self.pollMaxPeriod, self.pollBackoff)
 
     def streaming(self):
         """This is the data processing thread"""
-        self.emg_queue = deque()
-        while self.pauseFlag is True:
-            continue
-        while self.pauseFlag is False:
-            self.DataHandler.processData(self.emg_plot)
-            self.updatemetrics()
+        self.acquisitionLoop(self.DataHandler.processData)
 
     def streamingYT(self):
         """This is the data processing thread"""
-        self.emg_queue = deque()
-        while self.pauseFlag is True:
-            continue
+        self.acquisitionLoop(self.DataHandler.processYTData)
+
+    def acquisitionLoop(self, process):
+        """Waits for collection to start, then polls the base until paused. Idle polls back off instead of spinning"""
+        self.collectionState.collecting.wait()
+        poller = self.newPoller()
         while self.pauseFlag is False:
-            self.DataHandler.processYTData(self.emg_plot)
-            self.updatemetrics()
+            if process(self.emg_plot):
+                poller.reset()
+            else:
+                poller.idle(self.collectionState.paused)
 
     def vispyPlot(self):
         """Plot Thread - Only Plotting EMG Channels"""
+        if self.multiprocess:
+            self.sharedPlot()
+            return
+        # Packets are cut at the time every EMG channel has reached (session clock), so each plot frame spans the
+        # same time on every row
+        aligner = PlotAligner(self.DataHandler.clock.rates[self.base.emgChannelsIdx])
         while self.pauseFlag is False:
-            if len(self.emg_plot) >= 2:
-                incData = self.emg_plot.popleft()  # Data at time T-1
+            if self.emg_plot.wait(2, self.pollMaxPeriod):
+                incFrame = self.emg_plot.pop()  # Data at time T-1
+                dequeued = time.perf_counter()
+                self.instrumentation.record('queue', dequeued - incFrame.enqueued)
                 try:
-                    self.outData = list(np.asarray(incData, dtype='object')[tuple([self.base.emgChannelsIdx])])
+                    self.outData = aligner.push(incFrame.channels(self.base.emgChannelsIdx))
                 except IndexError:
                     print("Index Error Occurred: vispyPlot()")
                 if self.base.emgChannelsIdx and len(self.outData[0]) > 0:
                     try:
-                        self.EMGplot.plot_new_data(self.outData,
-                                                   [self.emg_plot[0][i][0] for i in self.base.emgChannelsIdx])
+                        nextFrame = self.emg_plot.peek()  # Data at time T
+                        self.EMGplot.plot_new_data(self.outData, aligner.next_values(
+                            nextFrame.channels(self.base.emgChannelsIdx), self.outData))
+                        self.instrumentation.record('upload', time.perf_counter() - dequeued)
+                        self.EMGplot.mark_uploaded(incFrame.polled)
                     except IndexError:
                         print("Index Error Occurred: vispyPlot()")
 
-    def updatemetrics(self):
-        self.metrics.framescollected.setText(str(self.DataHandler.packetCount))
+    def sharedPlot(self):
+        """Plot Thread in multiprocess mode - frames are EMG rows already resampled by the acquisition process"""
+        while self.pauseFlag is False:
+            if self.emg_plot.wait(1, self.pollMaxPeriod):
+                frame = self.emg_plot.pop()
+                dequeued = time.perf_counter()
+                self.instrumentation.record('queue', dequeued - self.emg_plot.last_stamp)  # Includes processing
+                self.DataHandler.packetCount = self.emg_plot.pushed
+                if len(frame) > 0 and frame.lengths[0] > 0:
+                    self.EMGplot.plot_frame(frame.data.reshape(len(frame), -1))
+                    self.instrumentation.record('upload', time.perf_counter() - dequeued)
+                    self.EMGplot.mark_uploaded(self.emg_plot.last_stamp)
+
+    def collectmetrics(self):
+        """Read the collection counters into a dict for CollectionMetricsManagement.applymetrics (GUI thread)"""
+        emg_plot = self.emg_plot
+        metrics = {'framescollected': self.DataHandler.packetCount,
+                   'queuedepth': emg_plot.depth,
+                   'droppedframes': emg_plot.dropped + emg_plot.coalesced}
+        if self.EMGplot:
+            metrics.update(self.EMGplot.plot_metrics())
+        now = time.perf_counter()
+        if now - self._lastInstrumentationRefresh >= self.instrumentationRefreshPeriod:
+            self._lastInstrumentationRefresh = now
+            metrics['latency'] = self.instrumentation.latency_summary()
+            metrics['sample_rates'] = self.instrumentation.sample_rates()
+        return metrics
+
+    def exportinstrumentation(self, filename):
+        """Write the instrumentation statistics to a JSON file"""
+        return self.instrumentation.export_json(filename, self.emg_plot, self.base.channel_guids)
 
     def resetmetrics(self):
         self.metrics.framescollected.setText("0")
+        self.metrics.queuedepth.setText("0")
+        self.metrics.droppedframes.setText("0")
+        self.metrics.plotupload.setText("0")
+        self.metrics.frametime.setText("0")
         self.metrics.totalchannels.setText(str(self.base.channelcount))
+        self.instrumentation.reset(self.base.channelcount)
+        self.metrics.updateinstrumentation(self.instrumentation.latency_summary(), [])
 
     def threadManager(self, start_trigger, stop_trigger):
         """Handles the threads for the DataCollector gui"""
-        self.emg_plot = deque()
+        if not self.multiprocess:
+            self.emg_plot = FrameQueue(self.frameQueueCapacity, self.frameQueueOverflow)
+
+        # Multiprocess mode: acquisition runs in the acquisition process, only plot and trigger threads here
+        if self.multiprocess:
+            self.t1 = None
 
         # Start standard data stream (only channel data, no time values)
-        if not self.streamYTData:
+        elif not self.streamYTData:
             self.t1 = threading.Thread(target=self.streaming)
             self.t1.start()
 
@@ -99,21 +225,23 @@ class PlottingManagement():
             self.t4.start()
 
     def waiting_for_start_trigger(self):
-        while self.base.TrigBase.IsWaitingForStartTrigger():
-            continue
+        self.newPoller().wait_while(self.base.TrigBase.IsWaitingForStartTrigger)
         self.pauseFlag = False
         if self.EMGplot:
             self.t2.start()
         print("Trigger Start - Collection Started")
 
     def waiting_for_stop_trigger(self):
-        while self.base.TrigBase.IsWaitingForStartTrigger():
-            continue
-        while self.base.TrigBase.IsWaitingForStopTrigger():
-            continue
+        poller = self.newPoller()
+        poller.wait_while(self.base.TrigBase.IsWaitingForStartTrigger)
+        poller.wait_while(self.base.TrigBase.IsWaitingForStopTrigger)
         self.pauseFlag = True
         self.metrics.pipelinestatelabel.setText(self.base.PipelineState_Callback())
         self.collect_data_window.exportcsv_button.setEnabled(True)
         self.collect_data_window.exportcsv_button.setStyleSheet("color : white")
         print("Trigger Stop - Data Collection Complete")
+        if self.multiprocess:
+            return  # The acquisition process finishes its own stream on the stop trigger
         self.DataHandler.processData(self.emg_plot)
+        self.DataHandler.stream_writer = None
+        self.base.csv_writer.finish_stream()
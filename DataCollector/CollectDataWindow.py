@@ -14,7 +14,7 @@ import tkinter as tkf
 from tkinter import filedialog
 
 from DataCollector.CollectionMetricsManagement import CollectionMetricsManagement
-from Plotter import GenericPlot as gp
+from DataCollector.BaseTask import BaseTask
 from DataCollector.FilenameGeneratorDialog import FilenameGeneratorDialog
 
 
@@ -32,8 +32,8 @@ class CollectDataWindow(QWidget):
         self.grid = QGridLayout(self)
 
         self.MetricsConnector = CollectionMetricsManagement()
-        self.collectionLabelPanel.setFixedHeight(275)
-        self.MetricsConnector.collectionmetrics.setFixedHeight(275)
+        self.collectionLabelPanel.setFixedHeight(455)
+        self.MetricsConnector.collectionmetrics.setFixedHeight(455)
 
         self.metricspanel = QWidget()
         self.metricspane = QHBoxLayout()
@@ -44,12 +44,17 @@ class CollectDataWindow(QWidget):
         self.metricspanel.setFixedWidth(400)
         self.grid.addWidget(self.buttonPanel, 0, 0)
         self.grid.addWidget(self.metricspanel, 0, 1)
+        self.grid.addWidget(self.MetricsConnector.instrumentationmetrics, 1, 1)
+        self.MetricsConnector.exportstats_button.clicked.connect(self.exportstats_callback)
 
         self.setStyleSheet("background-color:#3d4c51;")
         self.setLayout(self.grid)
         self.setWindowTitle("Collect Data GUI")
         self.pairing = False
         self.selectedSensor = None
+        # Scan and collection configuration run in the background (see BaseTask.py)
+        self.scanTask = None
+        self.startTask = None
 
     def AddPlotPanel(self):
         self.plotPanel = self.Plotter()
@@ -176,6 +181,10 @@ class CollectDataWindow(QWidget):
         widget = QWidget()
         widget.setLayout(QVBoxLayout())
 
+        # vispy and its OpenGL backend load with the first plot panel, so startup does not wait for them
+        from Plotter import GenericPlot as gp
+        gp.app.use_app('PySide6')
+
         plot_mode = 'windowed'  # Select between 'scrolling' and 'windowed'
         pc = gp.GenericPlot(plot_mode)
         pc.native.objectName = 'vispyCanvas'
@@ -214,6 +223,26 @@ class CollectDataWindow(QWidget):
         framescollectedlabel.setStyleSheet("color:white")
         collectionlabelsLayout.addWidget(framescollectedlabel)
 
+        queuedepthlabel = QLabel('Plot Queue Depth:', self)
+        queuedepthlabel.setAlignment(Qt.AlignCenter | Qt.AlignRight)
+        queuedepthlabel.setStyleSheet("color:white")
+        collectionlabelsLayout.addWidget(queuedepthlabel)
+
+        droppedframeslabel = QLabel('Frames Dropped/Merged:', self)
+        droppedframeslabel.setAlignment(Qt.AlignCenter | Qt.AlignRight)
+        droppedframeslabel.setStyleSheet("color:white")
+        collectionlabelsLayout.addWidget(droppedframeslabel)
+
+        plotuploadlabel = QLabel('Plot Upload (KB/s):', self)
+        plotuploadlabel.setAlignment(Qt.AlignCenter | Qt.AlignRight)
+        plotuploadlabel.setStyleSheet("color:white")
+        collectionlabelsLayout.addWidget(plotuploadlabel)
+
+        frametimelabel = QLabel('Plot Frame Time (ms):', self)
+        frametimelabel.setAlignment(Qt.AlignCenter | Qt.AlignRight)
+        frametimelabel.setStyleSheet("color:white")
+        collectionlabelsLayout.addWidget(frametimelabel)
+
         collectionLabelPanel.setFixedWidth(200)
         collectionLabelPanel.setLayout(collectionlabelsLayout)
 
@@ -329,8 +358,27 @@ class CollectDataWindow(QWidget):
             self.scan_callback()
 
     def scan_callback(self):
-        sensorList = self.CallbackConnector.base.Scan_Callback()
-
+        """Scan in the background; while scanning the Scan button cancels the scan"""
+        if self.scanTask is not None and self.scanTask.running():
+            self.scanTask.cancel()
+            return
+        self.scan_button.setText('Cancel Scan')
+        self.start_button.setEnabled(False)
+        self.start_button.setStyleSheet("color : grey")
+        self.scanTask = BaseTask(self.CallbackConnector.base.Scan_Callback, parent=self)
+        self.scanTask.progress.connect(self.task_progress)
+        self.scanTask.finished.connect(self.scan_finished)
+        self.scanTask.failed.connect(self.scan_failed)
+        self.scanTask.cancelled.connect(self.scan_cancelled)
+        self.scanTask.start()
+
+    def task_progress(self, message, done, total):
+        if total:
+            message += " " + str(done) + "/" + str(total)
+        self.MetricsConnector.pipelinestatelabel.setText(message)
+
+    def scan_finished(self, sensorList):
+        self.scan_button.setText('Scan')
         self.set_sensor_list_box(sensorList)
 
         if len(sensorList) > 0:
@@ -345,6 +393,18 @@ class CollectDataWindow(QWidget):
         self.exportcsv_button.setEnabled(False)
         self.exportcsv_button.setStyleSheet("color : gray")
 
+    def scan_failed(self, message):
+        self.scan_button.setText('Scan')
+        self.getpipelinestate()
+        self.MetricsConnector.pipelinestatelabel.setText(self.pipelinetext + " (Scan failed: " + message + ")")
+
+    def scan_cancelled(self):
+        self.scan_button.setText('Scan')
+        self.getpipelinestate()
+        if self.SensorListBox.count() > 0:
+            self.start_button.setEnabled(True)
+            self.start_button.setStyleSheet("color : white")
+
     def set_sensor_list_box(self, sensorList):
         self.SensorListBox.clear()
 
@@ -359,8 +419,25 @@ class CollectDataWindow(QWidget):
         self.SensorListBox.addItems(number_and_names_str)
 
     def start_callback(self):
-        self.CallbackConnector.base.Start_Callback(self.starttriggercheckbox.isChecked(),
-                                                   self.stoptriggercheckbox.isChecked())
+        """Configure the collection in the background, then start streaming (start_prepared)"""
+        if self.startTask is not None and self.startTask.running():
+            return
+        self.start_button.setEnabled(False)
+        self.scan_button.setEnabled(False)
+        self.startTask = BaseTask(self.CallbackConnector.base.prepareCollection,
+                                  self.starttriggercheckbox.isChecked(), self.stoptriggercheckbox.isChecked(),
+                                  parent=self)
+        self.startTask.progress.connect(self.task_progress)
+        self.startTask.finished.connect(self.start_prepared)
+        self.startTask.failed.connect(self.start_failed)
+        self.startTask.cancelled.connect(self.start_cancelled)
+        self.startTask.start()
+
+    def start_prepared(self, configured):
+        self.start_button.setEnabled(True)
+        self.scan_button.setEnabled(True)
+        if configured and not self.startTask.cancel_event.is_set():   # Stop pressed as configuration completed
+            self.CallbackConnector.base.beginCollection()
         self.CallbackConnector.resetmetrics()
         self.starttriggercheckbox.setEnabled(False)
         self.stoptriggercheckbox.setEnabled(False)
@@ -369,7 +446,20 @@ class CollectDataWindow(QWidget):
         self.exportcsv_button.setStyleSheet("color : gray")
         self.getpipelinestate()
 
+    def start_failed(self, message):
+        self.start_cancelled()
+        self.MetricsConnector.pipelinestatelabel.setText(self.pipelinetext + " (Start failed: " + message + ")")
+
+    def start_cancelled(self):
+        self.start_button.setEnabled(True)
+        self.scan_button.setEnabled(True)
+        self.getpipelinestate()
+
     def stop_callback(self):
+        # Stop while the collection is still being configured: cancel the configuration instead
+        if self.startTask is not None and self.startTask.running():
+            self.startTask.cancel()
+            return
         self.CallbackConnector.base.Stop_Callback()
         self.getpipelinestate()
         self.exportcsv_button.setEnabled(True)
@@ -386,25 +476,9 @@ class CollectDataWindow(QWidget):
             # Set the custom filename in the CSV writer
             self.CallbackConnector.base.csv_writer.set_custom_filename(custom_filename)
             
-            # Get muscle names from the sensor mappings (if available)
+            # Muscle names of every sensor (sensor header row of the export)
             if hasattr(self.CallbackConnector.base, 'sensor_muscle_map'):
-                # Find which sensors are being used (first two for simplicity)
-                sensors = self.CallbackConnector.base.TrigBase.GetScannedSensorsFound()
-                if len(sensors) >= 2:
-                    sensor1_num = sensors[0].PairNumber
-                    sensor2_num = sensors[1].PairNumber
-                    
-                    # Get their assigned muscle names (if any)
-                    muscle1 = self.CallbackConnector.base.sensor_muscle_map.get(sensor1_num, "")
-                    muscle2 = self.CallbackConnector.base.sensor_muscle_map.get(sensor2_num, "")
-                    
-                    # Set in CSV writer
-                    self.CallbackConnector.base.csv_writer.set_muscle_names(
-                        muscle1_name=muscle1,
-                        muscle2_name=muscle2,
-                        muscle1_id=str(sensor1_num),
-                        muscle2_id=str(sensor2_num)
-                    )
+                self.CallbackConnector.base.csv_writer.set_muscle_map(self.CallbackConnector.base.sensor_muscle_map)
             
             # Export CSV
             export = None
@@ -413,9 +487,31 @@ class CollectDataWindow(QWidget):
             else:
                 export = self.CallbackConnector.base.csv_writer.exportCSV()
             
+            # Binary session file next to the CSV (fast reload for analysis, see Export/SessionFile.py)
+            if export and self.CallbackConnector.base.csv_writer.export_session_file:
+                self.CallbackConnector.base.csv_writer.exportSession()
+            
+            # Compressed archive (lossless, a fraction of the CSV size), see Export/SessionArchive.py
+            if export and self.CallbackConnector.base.csv_writer.export_archive:
+                self.CallbackConnector.base.csv_writer.exportArchive()
+            
+            # Per-throw index (onset/end sample of every channel) next to the CSV, see Processing/ThrowDetector.py
+            if export and self.CallbackConnector.base.csv_writer.export_throw_index:
+                self.CallbackConnector.base.csv_writer.exportThrowIndex()
+            
+            # Session catalog entry (athlete, date, muscles, rates, summary stats), see Export/SessionCatalog.py
+            if export and self.CallbackConnector.base.csv_writer.export_catalog:
+                self.CallbackConnector.base.csv_writer.catalogSession()
+            
             self.getpipelinestate()
             print("CSV Export: " + str(export))
 
+    def exportstats_callback(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Pipeline Statistics", "pipeline_stats.json",
+                                                  "JSON (*.json)")
+        if filename:
+            print("Statistics Export: " + str(self.CallbackConnector.exportinstrumentation(filename)))
+
     def sensorList_callback(self):
         current_selected = self.SensorListBox.currentRow()
         if self.selectedSensor is None or self.selectedSensor != current_selected:
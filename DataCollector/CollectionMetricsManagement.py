@@ -1,10 +1,13 @@
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import *
 
+from DataCollector.Instrumentation import STAGES
+
 
 class CollectionMetricsManagement():
     def __init__(self):
         self.collectionmetrics = self.CollectionValuesPanel()
+        self.instrumentationmetrics = self.InstrumentationPanel()
 
 
     def CollectionValuesPanel(self):
@@ -30,7 +33,89 @@ class CollectionMetricsManagement():
         self.framescollected.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
         self.framescollected.setStyleSheet("color : white ")
         collectionvaluesLayout.addWidget(self.framescollected)
+
+        self.queuedepth = QLabel('-')
+        self.queuedepth.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+        self.queuedepth.setStyleSheet("color : white ")
+        collectionvaluesLayout.addWidget(self.queuedepth)
+
+        self.droppedframes = QLabel('-')
+        self.droppedframes.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+        self.droppedframes.setStyleSheet("color : white ")
+        collectionvaluesLayout.addWidget(self.droppedframes)
+
+        self.plotupload = QLabel('-')
+        self.plotupload.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+        self.plotupload.setStyleSheet("color : white ")
+        collectionvaluesLayout.addWidget(self.plotupload)
+
+        self.frametime = QLabel('-')
+        self.frametime.setAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+        self.frametime.setStyleSheet("color : white ")
+        collectionvaluesLayout.addWidget(self.frametime)
         collectionValuesPanel.setFixedWidth(200)
         collectionValuesPanel.setLayout(collectionvaluesLayout)
 
-        return collectionValuesPanel
\ No newline at end of file
+        return collectionValuesPanel
+
+    def InstrumentationPanel(self):
+        """Latency percentiles per pipeline stage and sample throughput (see Instrumentation.py)"""
+        instrumentationPanel = QWidget()
+        instrumentationLayout = QGridLayout()
+
+        for column, title in enumerate(["Latency (ms)", "p50", "p95", "p99"]):
+            header = QLabel(title)
+            header.setAlignment(Qt.AlignVCenter | (Qt.AlignLeft if column == 0 else Qt.AlignRight))
+            header.setStyleSheet("color : white ")
+            instrumentationLayout.addWidget(header, 0, column)
+
+        self.latencylabels = {}
+        for row, stage in enumerate(STAGES, start=1):
+            name = QLabel(stage.replace('_', ' ').capitalize() + ":")
+            name.setStyleSheet("color : white ")
+            instrumentationLayout.addWidget(name, row, 0)
+            self.latencylabels[stage] = []
+            for column in range(1, 4):
+                value = QLabel('-')
+                value.setAlignment(Qt.AlignVCenter | Qt.AlignRight)
+                value.setStyleSheet("color : white ")
+                instrumentationLayout.addWidget(value, row, column)
+                self.latencylabels[stage].append(value)
+
+        samplesname = QLabel("Samples/s (min-max ch):")
+        samplesname.setStyleSheet("color : white ")
+        instrumentationLayout.addWidget(samplesname, len(STAGES) + 1, 0)
+        self.samplerate = QLabel('-')
+        self.samplerate.setAlignment(Qt.AlignVCenter | Qt.AlignRight)
+        self.samplerate.setStyleSheet("color : white ")
+        instrumentationLayout.addWidget(self.samplerate, len(STAGES) + 1, 1, 1, 3)
+
+        self.exportstats_button = QPushButton('Export Stats (JSON)')
+        self.exportstats_button.setStyleSheet("color : white")
+        instrumentationLayout.addWidget(self.exportstats_button, len(STAGES) + 2, 0, 1, 4)
+
+        instrumentationPanel.setFixedWidth(400)
+        instrumentationPanel.setLayout(instrumentationLayout)
+
+        return instrumentationPanel
+
+    def applymetrics(self, metrics):
+        """Slot for MetricsPublisher.updated: refresh the labels from a metrics dict"""
+        self.framescollected.setText(str(metrics['framescollected']))
+        self.queuedepth.setText(str(metrics['queuedepth']))
+        self.droppedframes.setText(str(metrics['droppedframes']))
+        if 'upload_bytes_per_s' in metrics:
+            self.plotupload.setText(f"{metrics['upload_bytes_per_s'] / 1024:.1f}")
+            self.frametime.setText(f"{metrics['frame_time_ms']:.1f}")
+        if 'latency' in metrics:
+            self.updateinstrumentation(metrics['latency'], metrics['sample_rates'])
+
+    def updateinstrumentation(self, latency, sample_rates):
+        for stage, labels in self.latencylabels.items():
+            values = latency.get(stage, {})
+            for label, key in zip(labels, ('p50_ms', 'p95_ms', 'p99_ms')):
+                label.setText(f"{values.get(key, 0.0):.2f}")
+        if len(sample_rates):
+            self.samplerate.setText(f"{min(sample_rates):.0f} - {max(sample_rates):.0f}")
+        else:
+            self.samplerate.setText('-')
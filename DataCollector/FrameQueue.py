@@ -0,0 +1,132 @@
+"""
+Bounded single-producer/single-consumer frame queue between the acquisition thread and the plot thread.
+
+Each Frame holds one packet of all channels as a single contiguous float32 block plus the per-channel lengths,
+so a packet costs one allocation instead of a list of object arrays. When the plot thread falls behind, the queue
+either drops the oldest frame ('drop_oldest') or merges the incoming frame into the newest queued one
+('coalesce', no samples lost, fewer and larger frames). Depth, drop and coalesce counters are exposed for
+CollectionMetricsManagement.
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce')
+
+
+class Frame():
+    """One packet: channel samples packed back to back in a float32 block"""
+    __slots__ = ('data', 'lengths', 'offsets', 'polled', 'enqueued')
+
+    def __init__(self, data, lengths):
+        self.data = data
+        self.lengths = lengths
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.polled = None      # time.perf_counter() when the packet was polled from the base
+        self.enqueued = None    # time.perf_counter() when it entered the queue
+
+    @classmethod
+    def from_channels(cls, channel_arrays):
+        lengths = np.fromiter((len(chan) for chan in channel_arrays), dtype=np.int64, count=len(channel_arrays))
+        data = np.empty(int(lengths.sum()), dtype=np.float32)
+        offset = 0
+        for chan, length in zip(channel_arrays, lengths):
+            data[offset:offset + length] = chan
+            offset += length
+        return cls(data, lengths)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def channel(self, index):
+        """Zero-copy view of one channel's samples"""
+        return self.data[self.offsets[index]:self.offsets[index + 1]]
+
+    def channels(self, indexes=None):
+        if indexes is None:
+            indexes = range(len(self.lengths))
+        return [self.channel(i) for i in indexes]
+
+    def merged(self, other):
+        """Return a new frame with other's samples appended channel by channel (keeps this frame's timestamps)"""
+        frame = Frame.from_channels([np.concatenate((a, b)) for a, b in zip(self.channels(), other.channels())])
+        frame.polled, frame.enqueued = self.polled, self.enqueued
+        return frame
+
+
+class FrameQueue():
+    def __init__(self, capacity=64, overflow='drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: " + str(overflow))
+        self.capacity = int(capacity)
+        self.overflow = overflow
+        self._frames = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self.pushed = 0
+        self.popped = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def depth(self):
+        return len(self._frames)
+
+    def push(self, channel_arrays, polled=None):
+        """Producer side: pack one packet (list of per-channel arrays) and enqueue it"""
+        frame = channel_arrays if isinstance(channel_arrays, Frame) else Frame.from_channels(channel_arrays)
+        frame.enqueued = time.perf_counter()
+        frame.polled = frame.enqueued if polled is None else polled
+        with self._lock:
+            self.pushed += 1
+            if len(self._frames) >= self.capacity:
+                if self.overflow == 'coalesce':
+                    # Frames are never mutated in place, the consumer may still hold a reference to the old one
+                    self._frames[-1] = self._frames[-1].merged(frame)
+                    self.coalesced += 1
+                    return
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append(frame)
+            self.max_depth = max(self.max_depth, len(self._frames))
+            self._not_empty.notify()
+
+    def pop(self):
+        """Consumer side: return the oldest frame, or None when empty"""
+        with self._lock:
+            if not self._frames:
+                return None
+            self.popped += 1
+            return self._frames.popleft()
+
+    def peek(self):
+        """Return the oldest frame without removing it, or None when empty"""
+        with self._lock:
+            return self._frames[0] if self._frames else None
+
+    def wait(self, count=1, timeout=None):
+        """Consumer side: block until at least count frames are queued, wake() is called or timeout expires.
+        Returns True if count frames are available"""
+        with self._not_empty:
+            if len(self._frames) < count:
+                self._not_empty.wait(timeout)
+            return len(self._frames) >= count
+
+    def wake(self):
+        """Wake a consumer blocked in wait(), e.g. when collection is paused"""
+        with self._not_empty:
+            self._not_empty.notify_all()
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def stats(self):
+        return {'depth': len(self._frames), 'max_depth': self.max_depth, 'pushed': self.pushed,
+                'popped': self.popped, 'dropped': self.dropped, 'coalesced': self.coalesced}
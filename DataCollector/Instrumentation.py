@@ -0,0 +1,110 @@
+"""
+Latency and throughput instrumentation of the collection pipeline.
+
+Each packet is timestamped (time.perf_counter) along its way to the screen:
+
+    poll      DataKernel.GetData() call            'poll'     time spent in GetData (DelsysAPI + conversion)
+    enqueue   FrameQueue.push()                    'process'  poll start -> enqueue (storage, DSP, CSV stream)
+    dequeue   plot thread pops the frame           'queue'    enqueue -> dequeue
+    upload    GenericPlot buffers updated          'upload'   dequeue -> upload done (resampling + GPU upload)
+    draw      next GenericPlot.on_draw()           'draw'     upload done -> drawn,  'end_to_end' poll -> drawn
+
+Stages keep the last `window` values in a RollingHistogram (p50/p95/p99 on demand). Recording is a couple of
+array writes, so it stays on in normal use. snapshot() adds samples/sec per channel and queue depth/drop
+counters; export_json() writes the snapshot for offline analysis.
+"""
+import json
+import threading
+import time
+
+import numpy as np
+
+STAGES = ('poll', 'process', 'queue', 'upload', 'draw', 'end_to_end')
+
+
+class RollingHistogram():
+    """Last `size` values of a measurement (seconds), percentiles computed when read"""
+
+    def __init__(self, size=2048):
+        self.values = np.zeros(size)
+        self.count = 0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def percentiles(self, points=(50, 95, 99)):
+        filled = self.values[:min(self.count, len(self.values))]
+        if len(filled) == 0:
+            return [0.0] * len(points)
+        return list(np.percentile(filled, points))
+
+
+class PipelineInstrumentation():
+    def __init__(self, window=2048):
+        self.histograms = {stage: RollingHistogram(window) for stage in STAGES}
+        self.channel_samples = np.zeros(0, dtype=np.int64)
+        self._rate_lock = threading.Lock()
+        self._rate_sample = (time.perf_counter(), self.channel_samples.copy())
+        self.channel_rates = np.zeros(0)
+        self.started = time.perf_counter()
+
+    def reset(self, channel_count=0):
+        for histogram in self.histograms.values():
+            histogram.clear()
+        self.channel_samples = np.zeros(channel_count, dtype=np.int64)
+        self._rate_sample = (time.perf_counter(), self.channel_samples.copy())
+        self.channel_rates = np.zeros(channel_count)
+        self.started = time.perf_counter()
+
+    def record(self, stage, seconds):
+        self.histograms[stage].add(seconds)
+
+    def count_samples(self, channel_arrays):
+        """Acquisition side: add one packet to the per-channel sample counters"""
+        if len(self.channel_samples) != len(channel_arrays):
+            self.channel_samples = np.zeros(len(channel_arrays), dtype=np.int64)
+        self.channel_samples += [len(chan) for chan in channel_arrays]
+
+    def sample_rates(self, min_interval=0.5):
+        """Samples/sec per channel since the previous call (kept for min_interval seconds)"""
+        now = time.perf_counter()
+        with self._rate_lock:
+            sample_time, samples = self._rate_sample
+            current = self.channel_samples.copy()
+            if now - sample_time >= min_interval or len(samples) != len(current):
+                if len(samples) == len(current):
+                    self.channel_rates = (current - samples) / (now - sample_time)
+                self._rate_sample = (now, current)
+        return self.channel_rates
+
+    def latency_summary(self):
+        """p50/p95/p99 per stage in milliseconds"""
+        summary = {}
+        for stage, histogram in self.histograms.items():
+            p50, p95, p99 = histogram.percentiles()
+            summary[stage] = {'p50_ms': p50 * 1e3, 'p95_ms': p95 * 1e3, 'p99_ms': p99 * 1e3,
+                              'count': histogram.count}
+        return summary
+
+    def snapshot(self, queue=None, channel_guids=None):
+        """All statistics as a dict. queue: the FrameQueue/SharedFrameRing feeding the plot"""
+        rates = self.sample_rates()
+        guids = [str(guid) for guid in channel_guids] if channel_guids is not None else []
+        stats = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                 'elapsed_s': time.perf_counter() - self.started,
+                 'latency': self.latency_summary(),
+                 'samples_per_second': {(guids[i] if i < len(guids) else str(i)): float(rate)
+                                        for i, rate in enumerate(rates)},
+                 'samples_total': int(self.channel_samples.sum())}
+        if queue is not None:
+            stats['queue'] = queue.stats()
+        return stats
+
+    def export_json(self, filename, queue=None, channel_guids=None):
+        with open(filename, 'w') as f:
+            json.dump(self.snapshot(queue, channel_guids), f, indent=2)
+        return filename
@@ -0,0 +1,34 @@
+"""
+Publishes collection metrics to the GUI at a fixed rate.
+
+The acquisition and plot threads only bump plain counters (DataKernel.packetCount, FrameQueue counters,
+PipelineInstrumentation). A QTimer living on the GUI thread calls `collect` at `rate_hz`, and the resulting dict
+is emitted through the `updated` signal, so labels are only ever touched from the GUI thread and at most
+rate_hz times per second, however fast packets arrive.
+"""
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class MetricsPublisher(QObject):
+    updated = Signal(dict)
+
+    def __init__(self, collect, rate_hz=10.0, parent=None):
+        """collect: callable returning the metrics dict, called on the GUI thread"""
+        QObject.__init__(self, parent)
+        self.collect = collect
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.publish)
+        self.set_rate(rate_hz)
+
+    def set_rate(self, rate_hz):
+        self.rate_hz = float(rate_hz)
+        self.timer.setInterval(max(1, int(round(1000.0 / self.rate_hz))))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def publish(self):
+        self.updated.emit(self.collect())
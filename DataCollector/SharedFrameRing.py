@@ -0,0 +1,154 @@
+"""
+Single-producer/single-consumer frame ring in multiprocessing.shared_memory.
+
+Used in multiprocess mode (see AcquisitionProcess.py): the acquisition process pushes packets, the GUI process pops
+them, without pickling or copying through a pipe. The consumer side has the FrameQueue interface used by
+PlottingManagement (pop, peek, wait, wake, clear, depth, counters, stats), so the plot thread reads either.
+
+Layout of the shared block:
+    counters  int64[8]                          write count, read count, dropped, oversized
+    counts    int32[capacity]                   channels in each slot
+    lengths   int32[capacity, max_channels]     samples per channel in each slot
+    stamps    float64[capacity]                 time.perf_counter() when the packet was polled
+    data      float32[capacity, slot_samples]   channel samples packed back to back (as in Frame)
+
+Only the producer advances the write count and only the consumer the read count, so no lock is needed: a slot is
+filled before the write count that publishes it is stored. A full ring drops the incoming packet.
+"""
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from DataCollector.FrameQueue import Frame
+
+_WRITE, _READ, _DROPPED, _OVERSIZED = range(4)
+
+
+class SharedFrameRing():
+    def __init__(self, capacity=64, max_channels=64, slot_samples=8192, name=None):
+        """Create a new ring, or attach to the ring called name (created by another process)"""
+        self.capacity = int(capacity)
+        self.max_channels = int(max_channels)
+        self.slot_samples = int(slot_samples)
+        self._sizes = [8 * 8, 4 * self.capacity, 4 * self.capacity * self.max_channels, 8 * self.capacity,
+                       4 * self.capacity * self.slot_samples]
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=sum(self._sizes))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        offsets = np.cumsum([0] + self._sizes)
+        buf = self.shm.buf
+        self._counters = np.ndarray((8,), dtype=np.int64, buffer=buf, offset=offsets[0])
+        self._counts = np.ndarray((self.capacity,), dtype=np.int32, buffer=buf, offset=offsets[1])
+        self._lengths = np.ndarray((self.capacity, self.max_channels), dtype=np.int32, buffer=buf, offset=offsets[2])
+        self._stamps = np.ndarray((self.capacity,), dtype=np.float64, buffer=buf, offset=offsets[3])
+        self._data = np.ndarray((self.capacity, self.slot_samples), dtype=np.float32, buffer=buf, offset=offsets[4])
+        if self.owner:
+            self._counters[:] = 0
+        self._woken = False
+        self.popped = 0
+        self.coalesced = 0      # Never coalesces, kept for the FrameQueue interface
+        self.max_depth = 0
+        self.last_stamp = None  # Poll time of the last popped frame
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Arguments to attach to this ring from another process"""
+        return {'capacity': self.capacity, 'max_channels': self.max_channels, 'slot_samples': self.slot_samples,
+                'name': self.name}
+
+    def __len__(self):
+        return self.depth
+
+    @property
+    def depth(self):
+        return int(self._counters[_WRITE] - self._counters[_READ])
+
+    @property
+    def pushed(self):
+        return int(self._counters[_WRITE])
+
+    @property
+    def dropped(self):
+        return int(self._counters[_DROPPED] + self._counters[_OVERSIZED])
+
+    # ---- Producer side
+    def push(self, channel_arrays, stamp=None):
+        """Copy one packet (list of per-channel arrays) into the next slot. Returns False if it was dropped"""
+        write = int(self._counters[_WRITE])
+        if write - int(self._counters[_READ]) >= self.capacity:
+            self._counters[_DROPPED] += 1
+            return False
+        lengths = [len(chan) for chan in channel_arrays]
+        if len(lengths) > self.max_channels or sum(lengths) > self.slot_samples:
+            self._counters[_OVERSIZED] += 1
+            return False
+        slot = write % self.capacity
+        data = self._data[slot]
+        offset = 0
+        for chan, length in zip(channel_arrays, lengths):
+            data[offset:offset + length] = chan
+            offset += length
+        self._lengths[slot, :len(lengths)] = lengths
+        self._counts[slot] = len(lengths)
+        self._stamps[slot] = time.perf_counter() if stamp is None else stamp
+        self._counters[_WRITE] = write + 1      # Publish the slot
+        return True
+
+    # ---- Consumer side
+    def _frame(self, slot):
+        count = int(self._counts[slot])
+        lengths = self._lengths[slot, :count].astype(np.int64)
+        return Frame(self._data[slot, :int(lengths.sum())].copy(), lengths)
+
+    def pop(self):
+        """Return the oldest frame (a copy, the slot is released), or None when empty"""
+        read = int(self._counters[_READ])
+        depth = int(self._counters[_WRITE]) - read
+        if depth <= 0:
+            return None
+        self.max_depth = max(self.max_depth, depth)
+        slot = read % self.capacity
+        frame = self._frame(slot)
+        self.last_stamp = float(self._stamps[slot])
+        self._counters[_READ] = read + 1
+        self.popped += 1
+        return frame
+
+    def peek(self):
+        read = int(self._counters[_READ])
+        if int(self._counters[_WRITE]) <= read:
+            return None
+        return self._frame(read % self.capacity)
+
+    def wait(self, count=1, timeout=None, interval=0.0005):
+        """Poll until at least count frames are queued, wake() is called or timeout expires"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        self._woken = False
+        while self.depth < count and not self._woken:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            time.sleep(interval)
+        return self.depth >= count
+
+    def wake(self):
+        self._woken = True
+
+    def clear(self):
+        self._counters[_READ] = self._counters[_WRITE]
+
+    def stats(self):
+        return {'depth': self.depth, 'max_depth': self.max_depth, 'pushed': self.pushed, 'popped': self.popped,
+                'dropped': self.dropped, 'coalesced': self.coalesced}
+
+    def close(self):
+        """Detach from the shared block; the creating process also frees it"""
+        self._counters = self._counts = self._lengths = self._stamps = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
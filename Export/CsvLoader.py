@@ -0,0 +1,235 @@
+"""
+Fast loader for Trigno CSV files.
+
+Reads both layouts written over time:
+
+    export      Application/Date/Collection Length preamble, sensor/mode/name/rate header rows and a time/value
+                column pair per channel (CsvWriter.exportCSV/exportYTCSV, StreamingCsvWriter)
+    Discover    two header rows, "(1) Avanti Sensor" and "EMG 1 (1925.926),ACC X (148.148),...", one column per
+                channel (data.csv)
+
+Slower channels leave empty fields: at the end of the file, or after each batch of packets in streaming exports
+written before StreamingCsvWriter kept the columns contiguous. The body is read in large chunks and each chunk is
+parsed with a few NumPy operations: field boundaries are found from the delimiter bytes, the delimiters of empty
+fields are dropped, and the remaining text is converted in one np.fromstring call (C strtod, so values are
+bit-identical to float()). Empty fields are tracked per column and skipped, so each channel gets exactly the samples
+written for it. Rows that do not fit the header (quoted or malformed fields) fall back to csv.reader for their
+chunk.
+
+load_many()/load_directory() load batches of files on a process pool.
+
+Use Example:
+channel_info, values, times, metadata = load_csv("data.csv")
+sessions = load_directory(r"C:\\...\\Pitching_DataSet", workers=4)
+"""
+import csv
+import glob
+import io
+import os
+import re
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+CHUNK_BYTES = 8 * 2 ** 20   # Body bytes parsed at once: large enough to amortize the NumPy calls
+_COMMA, _PLUS, _MINUS = ord(','), ord('+'), ord('-')
+
+
+def _parse_rate(text):
+    match = re.search(r"([\d.,]+)\s*(?:Hz)?\)?\s*$", text)
+    return float(match.group(1).replace(',', '')) if match else 0.0
+
+
+def _read_header(f):
+    """Header rows of an open (binary) file. Returns (channel_info, metadata, paired, number of columns); f is
+    left at the start of the body"""
+    def row():
+        return next(csv.reader([f.readline().decode('utf-8-sig')]), [])
+
+    first = row()
+    metadata = {}
+    if first and first[0] == "Application:":
+        metadata['application'] = first[1]
+        metadata['date_time'] = row()[1]
+        metadata['collection_length'] = float(row()[1])
+        sensor_row, mode_row, name_row, rate_row = row(), row(), row(), row()
+        paired = True
+    else:
+        sensor_row, name_row = first, row()
+        mode_row, rate_row = [""] * len(name_row), None
+        paired = False
+
+    channel_info = []
+    sensor = {}
+    for col in range(0, len(name_row), 2 if paired else 1):
+        label = sensor_row[col] if col < len(sensor_row) else ""
+        if label:
+            match = re.match(r"\s*\((\d+)\)\s*(.*)", label) or re.match(r"\s*(.*?)\s*\((\d+)\)\s*$", label)
+            if match and label.lstrip().startswith("("):
+                sensor = {'pair_number': int(match.group(1)), 'sensor_name': match.group(2)}
+            elif match:
+                sensor = {'pair_number': int(match.group(2)), 'sensor_name': match.group(1)}
+            else:
+                sensor = {'pair_number': len(channel_info) + 1, 'sensor_name': label}
+            mode = mode_row[col] if col < len(mode_row) else ""
+            sensor['mode'] = mode.replace("sensor mode:", "").strip()
+        info = dict(sensor)
+        if paired:
+            name = re.sub(r"\s*Time Series \(s\)\s*$", "", name_row[col])
+            info.update({'name': name, 'sample_rate': _parse_rate(rate_row[col + 1])})
+        else:
+            match = re.match(r"\s*(.*?)\s*\(([\d.,]+)", name_row[col])
+            info.update({'name': match.group(1) if match else name_row[col],
+                         'sample_rate': float(match.group(2).replace(',', '')) if match else 0.0})
+        info['type'] = info['name'].split()[0] if info['name'] else ""
+        channel_info.append(info)
+    return channel_info, metadata, paired, len(name_row)
+
+
+def _parse_chunk(text, columns):
+    """
+    Parse whole rows of CSV text.
+
+    Returns:
+    --------
+    tuple
+        ((rows, columns) float64 values with nan in empty fields, (rows, columns) bool mask of non-empty fields)
+    """
+    if b'"' in text:
+        return _parse_chunk_rows(text, columns)
+    if not text.endswith(b"\n"):
+        text += b"\r\n" if b"\r" in text else b"\n"
+    rows = text.count(b"\n")
+    # The '\r' of CRLF rows is a delimiter too, it adds an (always empty) field to every row
+    returns = text.count(b"\r")
+    if returns not in (0, rows):
+        return _parse_chunk_rows(text, columns)
+    fields = columns + (returns > 0)
+    chars = np.frombuffer(text, dtype=np.uint8)
+    # ',', '\n' and '\r' are the only bytes below '-' in numeric rows ('+' of exponents aside)
+    delimiter = chars < _MINUS if b"+" not in text else (chars < _PLUS) | (chars == _COMMA)
+    after_delimiter = np.empty_like(delimiter)
+    after_delimiter[0] = True
+    after_delimiter[1:] = delimiter[:-1]
+    # A field is empty when its delimiter directly follows the previous one (or starts the text)
+    nonempty = ~after_delimiter[delimiter]
+    if nonempty.size != rows * fields:
+        return _parse_chunk_rows(text, columns)
+    # Keep every byte except the delimiters of empty fields, so each value is followed by exactly one delimiter
+    kept = chars[~(delimiter & after_delimiter)]
+    kept[kept < _MINUS] = _COMMA
+    # Text that is not a number stops the parse (a ValueError, or a warning and a short result on older NumPy);
+    # the row parser then reports the field
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            parsed = np.fromstring(kept.tobytes(), dtype=np.float64, sep=',')
+    except ValueError:
+        parsed = None
+    if parsed is None or parsed.size != np.count_nonzero(nonempty):
+        return _parse_chunk_rows(text, columns)
+    values = np.full(nonempty.size, np.nan)
+    values[nonempty] = parsed
+    return values.reshape(rows, fields)[:, :columns], nonempty.reshape(rows, fields)[:, :columns]
+
+
+def _parse_chunk_rows(text, columns):
+    """csv.reader fallback of _parse_chunk"""
+    rows = [row for row in csv.reader(io.StringIO(text.decode('utf-8'))) if row]
+    values = np.full((len(rows), columns), np.nan)
+    nonempty = np.zeros((len(rows), columns), dtype=bool)
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row[:columns]):
+            if value != '':
+                values[r, c] = float(value)
+                nonempty[r, c] = True
+    return values, nonempty
+
+
+def load_csv(filename, chunk_bytes=CHUNK_BYTES):
+    """
+    Load a Trigno CSV into per-channel arrays.
+
+    Parameters:
+    -----------
+    filename : str
+        CSV path (export or Discover layout)
+    chunk_bytes : int
+        Body bytes parsed at once
+
+    Returns:
+    --------
+    tuple
+        (list of channel_info dicts, list of value arrays, list of time arrays or None, metadata dict)
+    """
+    with open(filename, 'rb') as f:
+        channel_info, metadata, paired, columns = _read_header(f)
+        parts = [[] for _ in range(columns)]
+        carry = b""
+        while True:
+            data = f.read(chunk_bytes)
+            text = carry + data
+            if data:
+                cut = text.rfind(b"\n") + 1     # Whole rows only, the partial last row goes with the next chunk
+                text, carry = text[:cut], text[cut:]
+            if text:
+                values, nonempty = _parse_chunk(text, columns)
+                for c in range(columns):
+                    parts[c].append(values[nonempty[:, c], c])
+            if not data:
+                break
+
+    arrays = [np.concatenate(part) if part else np.zeros(0) for part in parts]
+    if paired:
+        return channel_info, arrays[1::2], arrays[0::2], metadata
+    return channel_info, arrays, None, metadata
+
+
+def _load(filename, chunk_bytes):
+    return filename, load_csv(filename, chunk_bytes)
+
+
+def load_many(filenames, workers=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Load a batch of CSV files on a process pool.
+
+    Parameters:
+    -----------
+    filenames : list of str
+        CSV paths
+    workers : int
+        Worker processes, defaults to the number of CPUs. 1 loads in this process
+
+    Returns:
+    --------
+    dict
+        filename -> load_csv() result. Files that fail to load are reported and left out
+    """
+    filenames = list(filenames)
+    workers = min(workers or os.cpu_count() or 1, max(len(filenames), 1))
+    results = {}
+    if workers <= 1:
+        for filename in filenames:
+            try:
+                results[filename] = load_csv(filename, chunk_bytes)
+            except Exception as e:
+                print(f"Error loading {filename}: {e}")
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_load, filename, chunk_bytes): filename for filename in filenames}
+        for future in as_completed(futures):
+            try:
+                filename, result = future.result()
+                results[filename] = result
+            except Exception as e:
+                print(f"Error loading {futures[future]}: {e}")
+    return {filename: results[filename] for filename in filenames if filename in results}
+
+
+def load_directory(directory, pattern="*.csv", workers=None, recursive=False, chunk_bytes=CHUNK_BYTES):
+    """Load every CSV of a directory (see load_many). Throw index files (*_throws.csv) are skipped"""
+    filenames = sorted(glob.glob(os.path.join(directory, "**", pattern) if recursive else
+                                 os.path.join(directory, pattern), recursive=recursive))
+    filenames = [name for name in filenames if not name.endswith("_throws.csv")]
+    return load_many(filenames, workers, chunk_bytes)
@@ -1,15 +1,23 @@
 import csv
 import os
+import re
 from datetime import datetime
 
+from AeroPy.SampleClock import SampleClock
+from Export.CsvFormatter import TIME_DECIMALS, VALUE_DECIMALS, iter_formatted
+from Export.StreamingCsvWriter import PARTIAL_EXTENSION, StreamingCsvWriter, channel_header_rows
+from Export import SessionArchive, SessionCatalog, SessionFile
+
 class CsvWriter:
     def __init__(self):
         # Lists to store header information
         self.h1_sensors = []
         self.h2_channels = []
         
-        # Data storage
+        # Data storage (one array per channel, plus per-channel time stamps when streaming YT data)
         self.data = []
+        self.time_data = []
+        self.clock = None   # Session SampleClock (DataKernel.clock): time of every sample of self.data
         
         # Output file path (adjust this when the time comes)
         self.output_directory = r"C:\Users\alex.britton\Documents\DelsysTesting\Pitching_DataSet"
@@ -17,6 +25,35 @@ class CsvWriter:
         
         # Custom filename (optional)
         self.custom_filename = None
+
+        # Per-channel metadata (name, type, sample rate, sensor pair number/name/mode), in data order
+        self.channel_info = []
+        self._current_sensor = {}
+
+        # Streaming export: when enabled, data is written to disk during collection (under a .partial name, so
+        # session discovery skips it) and exportCSV() only renames the finished file. A stream that is never
+        # exported is deleted by the next start_stream() or clearall()
+        self.streaming_export = True
+        self.stream_writer = None
+        self.streamed_filename = None
+
+        # Binary session file (.tsf) written next to the CSV on export, see SessionFile.py
+        self.export_session_file = True
+        self.muscle_map = {}
+        self.last_export_filename = None
+
+        # Compressed session archive (.tsz, lossless, ~15x smaller than the CSV) written on export, see
+        # SessionArchive.py
+        self.export_archive = False
+
+        # Throws found by the ThrowDetector during collection, written as an index next to the CSV on export
+        self.throws = []
+        self.export_throw_index = True
+
+        # SQLite catalog of exported sessions (athlete, date, muscles, rates, stats), see SessionCatalog.py. None
+        # keeps it in the output directory
+        self.export_catalog = True
+        self.catalog_filename = None
     
     def set_custom_filename(self, filename):
         """
@@ -41,6 +78,11 @@ class CsvWriter:
         # Add sensor name or identifier to the headers
         sensor_name = f"({selectedSensor.PairNumber}) {selectedSensor.FriendlyName}"
         self.h1_sensors.append(sensor_name)
+        self._current_sensor = {
+            'pair_number': selectedSensor.PairNumber,
+            'sensor_name': str(selectedSensor.FriendlyName),
+            'mode': str(selectedSensor.Configuration.ModeString),
+        }
     
     def appendChannelHeader(self, channel_object):
         """
@@ -54,6 +96,7 @@ class CsvWriter:
         # Construct channel header with name and sample rate
         channel_header = f"{channel_object.Name} ({channel_object.SampleRate} Hz)"
         self.h2_channels.append(channel_header)
+        self.appendChannelInfo(channel_object)
     
     def appendYTChannelHeader(self, channel_object):
         """
@@ -67,6 +110,25 @@ class CsvWriter:
         # Similar to appendChannelHeader, but could be customized for YT data
         channel_header = f"{channel_object.Name} (YT) ({channel_object.SampleRate} Hz)"
         self.h2_channels.append(channel_header)
+        self.appendChannelInfo(channel_object)
+
+    def appendChannelInfo(self, channel_object):
+        """
+        Record structured metadata for a channel of the current sensor (see appendSensorHeader).
+        
+        Parameters:
+        -----------
+        channel_object : Delsys Channel Object
+            Channel object to extract metadata from
+        """
+        info = dict(self._current_sensor)
+        info.update({
+            'name': str(channel_object.Name),
+            'type': str(channel_object.Type),
+            'sample_rate': float(channel_object.SampleRate),
+            'guid': str(channel_object.Id),
+        })
+        self.channel_info.append(info)
     
     def appendSensorHeaderSeperator(self):
         """
@@ -85,6 +147,8 @@ class CsvWriter:
         Clear stored data.
         """
         self.data = []
+        self.time_data = []
+        self.throws = []
         self.h1_sensors = []
         self.h2_channels = []
         self.custom_filename = None
@@ -94,16 +158,95 @@ class CsvWriter:
         Completely reset the writer.
         """
         self.cleardata()
+        self.discard_stream()
+        self.channel_info = []
+        self._current_sensor = {}
+    
+    def start_stream(self, muscle_map=None, clock=None):
+        """
+        Open a streaming export for the configured channels. Rows are written by a background thread while
+        data is collected (see StreamingCsvWriter).
+        
+        Parameters:
+        -----------
+        muscle_map : dict
+            Sensor pair number -> muscle name, used in the sensor header row
+        clock : SampleClock
+            Session clock, source of the time columns
+        
+        Returns:
+        --------
+        StreamingCsvWriter or None
+            Writer to feed with write_block(), None if streaming export is disabled
+        """
+        self.discard_stream()
+        if not self.streaming_export or not self.channel_info:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join(self.output_directory, f"delsys_stream_{timestamp}.csv{PARTIAL_EXTENSION}")
+        self.clock = clock
+        self.stream_writer = StreamingCsvWriter(filename, self.channel_info, muscle_map, clock=clock)
+        return self.stream_writer
+    
+    def finish_stream(self):
+        """
+        Finalize the streaming export, if one is open.
+        
+        Returns:
+        --------
+        str
+            Path to the streamed CSV file, or None
+        """
+        if self.stream_writer is not None:
+            self.streamed_filename = self.stream_writer.finalize()
+            self.stream_writer = None
+        return self.streamed_filename
+    
+    def discard_stream(self):
+        """
+        Close the streaming export and delete its file if it was not exported.
+        """
+        filename = self.finish_stream()
+        self.streamed_filename = None
+        if filename and os.path.exists(filename):
+            try:
+                os.remove(filename)
+            except OSError as e:
+                print(f"Error deleting unexported stream {filename}: {e}")
+    
+    def export_streamed_file(self):
+        """
+        Move the finished streaming export to the export filename.
+        
+        Returns:
+        --------
+        str
+            Path to the exported CSV file
+        """
+        if self.custom_filename:
+            filename = os.path.join(self.output_directory, self.custom_filename)
+        else:
+            filename = self.streamed_filename[:-len(PARTIAL_EXTENSION)]
+        os.replace(self.streamed_filename, filename)
+        self.streamed_filename = None
+        self.last_export_filename = filename
+        print(f"CSV exported to {filename} (streamed during collection)")
+        return filename
     
     def exportCSV(self):
         """
-        Export collected data to a CSV file in the exact Trigno Discover format.
+        Export collected data to a CSV file in the Trigno Discover format: a time/value column pair for every
+        configured channel (see ConfigureCollectionOutput), headers from the channel metadata.
         
         Returns:
         --------
         str
             Path to the exported CSV file
         """
+        # Data was already written during collection, only move the file into place
+        if self.streamed_filename and os.path.exists(self.streamed_filename):
+            return self.export_streamed_file()
+
         # Use custom filename if provided, otherwise generate a default
         if self.custom_filename:
             filename = os.path.join(self.output_directory, self.custom_filename)
@@ -113,118 +256,9 @@ class CsvWriter:
             filename = os.path.join(self.output_directory, f"delsys_data_{timestamp}.csv")
         
         try:
-            # Current date and time
-            date_now = datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')
-            
-            # Get sensor IDs and names - these should be set by the GUI
-            muscle1_id = getattr(self, 'muscle1_id', "81728")  # Default ID
-            muscle2_id = getattr(self, 'muscle2_id', "81745")  # Default ID
-            
-            # Extract muscle names from class attributes or use defaults
-            muscle1_name = getattr(self, 'muscle1_name', "")  # No default
-            muscle2_name = getattr(self, 'muscle2_name', "")  # No default
-            
-            # Use generic names for display if no custom names were set
-            muscle1_display = muscle1_name if muscle1_name else "Muscle 1"
-            muscle2_display = muscle2_name if muscle2_name else "Muscle 2"
-            
-            # Extract sampling rates from channel headers (or use defaults)
-            sampling_rate1 = 1259.2593  # Default for first muscle
-            sampling_rate2 = 2148.1481  # Default for second muscle
-            
-            if len(self.h2_channels) >= 2:
-                for i, channel in enumerate(self.h2_channels):
-                    if i == 0 and "Hz" in channel:
-                        hz_index = channel.find('Hz')
-                        paren_start = channel.find('(')
-                        if paren_start != -1 and hz_index != -1:
-                            try:
-                                rate_text = channel[paren_start+1:hz_index].strip()
-                                # Handle commas in sampling rate
-                                rate_text = rate_text.replace(',', '')
-                                sampling_rate1 = float(rate_text)
-                            except ValueError:
-                                pass
-                    elif i == 1 and "Hz" in channel:
-                        hz_index = channel.find('Hz')
-                        paren_start = channel.find('(')
-                        if paren_start != -1 and hz_index != -1:
-                            try:
-                                rate_text = channel[paren_start+1:hz_index].strip()
-                                # Handle commas in sampling rate
-                                rate_text = rate_text.replace(',', '')
-                                sampling_rate2 = float(rate_text)
-                            except ValueError:
-                                pass
-            
-            # Calculate collection length (use actual data or default)
-            collection_length = 1180.3455  # Default
-            if len(self.data) >= 2 and len(self.data[0]) > 0:
-                try:
-                    # If we have time data
-                    if len(self.data) >= 4:
-                        last_time = max(self.data[0][-1], self.data[2][-1])
-                        collection_length = round(last_time, 4)
-                    # If we only have EMG data
-                    else:
-                        max_samples = max(len(self.data[0]), len(self.data[1]))
-                        # Estimate time based on sample rate
-                        collection_length = round(max_samples / max(sampling_rate1, sampling_rate2), 4)
-                except Exception as e:
-                    print(f"Error calculating collection length: {e}")
-            
-            with open(filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write exact Trigno Discover headers
-                writer.writerow(["Application:", "Trigno Discover (1.7.0)"])
-                writer.writerow(["Date/Time:", date_now])
-                writer.writerow(["Collection Length (seconds):", str(collection_length)])
-                writer.writerow([f"{muscle1_display} ({muscle1_id})", "", f"{muscle2_display} ({muscle2_id})"])
-                writer.writerow(["sensor mode: 50", "", "sensor mode: 40"])
-                writer.writerow(["EMG 1 Time Series (s)", "EMG 1 (mV)", "EMG 1 Time Series (s)", "EMG 1 (mV)"])
-                writer.writerow(["", f"{sampling_rate1} Hz", "", f"{sampling_rate2} Hz"])
-                
-                # Process data
-                if len(self.data) < 2:
-                    print("Warning: Not enough data channels (need at least 2)")
-                    return ""
-                
-                # Handle different data scenarios
-                if len(self.data) == 2:
-                    # We have only EMG channels, need to generate time series
-                    emg1 = self.data[0]
-                    emg2 = self.data[1]
-                    
-                    # Generate time series using sampling rates
-                    time_step1 = 1.0 / sampling_rate1
-                    time_step2 = 1.0 / sampling_rate2
-                    
-                    time1 = [round(i * time_step1, 7) for i in range(len(emg1))]
-                    time2 = [round(i * time_step2, 7) for i in range(len(emg2))]
-                    
-                    # Determine number of samples to write
-                    min_length = min(len(emg1), len(emg2))
-                    
-                    # Write data rows
-                    for i in range(min_length):
-                        writer.writerow([time1[i], emg1[i], time2[i], emg2[i]])
-                    
-                elif len(self.data) >= 4:
-                    # Assume format is Time1, EMG1, Time2, EMG2
-                    time1 = self.data[0]
-                    emg1 = self.data[1]
-                    time2 = self.data[2]
-                    emg2 = self.data[3]
-                    
-                    # Determine number of samples to write
-                    min_length = min(len(time1), len(emg1), len(time2), len(emg2))
-                    
-                    # Write data rows
-                    for i in range(min_length):
-                        writer.writerow([time1[i], emg1[i], time2[i], emg2[i]])
-                
+            self.writeChannels(filename)
             print(f"CSV exported to {filename} in Trigno Discover format")
+            self.last_export_filename = filename
             return filename
         
         except Exception as e:
@@ -233,6 +267,67 @@ class CsvWriter:
             traceback.print_exc()
             return ""
 
+    def exportChannelInfo(self):
+        """
+        Channel metadata for the collected data: channel_info, or (when it does not match the data) the names and
+        sample rates of the channel headers.
+        
+        Returns:
+        --------
+        list of dict
+            One entry per channel of self.data (name, type, sample_rate and, when known, sensor pair number/name/mode)
+        """
+        if len(self.channel_info) == len(self.data):
+            return self.channel_info
+        channel_info = []
+        for k in range(len(self.data)):
+            header = self.h2_channels[k] if k < len(self.h2_channels) else f"Channel {k + 1}"
+            match = re.match(r"\s*(.*?)\s*(?:\(YT\)\s*)?\(([\d.,]+)\s*Hz\)", header)
+            name = match.group(1) if match else header
+            rate = float(match.group(2).replace(',', '')) if match else 0.0
+            if rate <= 0 and self.clock is not None and len(self.clock) == len(self.data):
+                rate = float(self.clock.rates[k])
+            channel_info.append({'name': name, 'type': name.split()[0] if name else "", 'sample_rate': rate})
+        return channel_info
+
+    def writeChannels(self, filename, times=None):
+        """
+        Write self.data with the Trigno Discover headers. Formatting is done in row chunks (see CsvFormatter), so
+        the cost is a few NumPy operations per chunk whatever the number of channels.
+        
+        Parameters:
+        -----------
+        filename : str
+            Output path
+        times : list of array-like
+            Time stamps of every channel (YT data). Defaults to the session clock, or sample index / sample rate
+        """
+        if not self.data:
+            raise ValueError("no data channels to export")
+        channel_info = self.exportChannelInfo()
+        lengths = [len(values) for values in self.data]
+        # Sample times of every channel come from the session clock; without one (or for another layout) a clock
+        # is built from the channel sample rates
+        clock = self.clock
+        if clock is None or len(clock) != len(self.data):
+            clock = SampleClock(range(len(self.data)), [info['sample_rate'] or 1.0 for info in channel_info])
+            clock.counts[:] = lengths
+        if times is None:
+            times = [_TimeColumn(clock, k, length) for k, length in enumerate(lengths)]
+        collection_length = clock.duration()
+
+        columns = []
+        for t, values in zip(times, self.data):
+            columns += [t, values]
+        with open(filename, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["Application:", "Trigno Discover (1.7.0)"])
+            writer.writerow(["Date/Time:", datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')])
+            writer.writerow(["Collection Length (seconds):", str(round(collection_length, 4))])
+            writer.writerows(channel_header_rows(channel_info, self.muscle_map))
+            for text in iter_formatted(columns, [TIME_DECIMALS, VALUE_DECIMALS] * len(self.data)):
+                csvfile.write(text.decode('ascii'))
+        return filename
 
     def set_muscle_names(self, muscle1_name="", muscle2_name="", muscle1_id="81728", muscle2_id="81745"):
         """
@@ -253,18 +348,176 @@ class CsvWriter:
         self.muscle2_name = muscle2_name
         self.muscle1_id = muscle1_id
         self.muscle2_id = muscle2_id
+        # Export headers are labelled per sensor through muscle_map
+        for muscle_id, muscle_name in ((muscle1_id, muscle1_name), (muscle2_id, muscle2_name)):
+            pair_number = int(muscle_id) if str(muscle_id).isdigit() else muscle_id
+            if muscle_name and not self.muscle_map.get(pair_number):
+                self.muscle_map[pair_number] = muscle_name
         print(f"Muscle names set: {muscle1_name} ({muscle1_id}), {muscle2_name} ({muscle2_id})")
     
+    def set_muscle_map(self, muscle_map):
+        """
+        Set the muscle assigned to each sensor.
+        
+        Parameters:
+        -----------
+        muscle_map : dict
+            Sensor pair number -> muscle name
+        """
+        self.muscle_map = dict(muscle_map or {})
+    
+    def exportSession(self, filename=None):
+        """
+        Export collected data to a binary session file (one contiguous typed array per channel, see SessionFile.py).
+        
+        Parameters:
+        -----------
+        filename : str
+            Output path, defaults to the last exported CSV name (or the custom filename) with a .tsf extension
+        
+        Returns:
+        --------
+        str
+            Path to the exported session file
+        """
+        if filename is None:
+            base = self.last_export_filename or os.path.join(
+                self.output_directory,
+                self.custom_filename or f"delsys_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+            filename = os.path.splitext(base)[0] + SessionFile.EXTENSION
+        
+        try:
+            metadata = {
+                'date_time': datetime.now().strftime('%m/%d/%Y %I:%M:%S %p'),
+                'source': os.path.basename(self.last_export_filename) if self.last_export_filename else "",
+                'muscle_map': self.muscle_map,
+            }
+            times = self.time_data if len(self.time_data) == len(self.data) and self.time_data else None
+            SessionFile.write_session(filename, self.data, self.channel_info, metadata, times)
+            print(f"Session file exported to {filename}")
+            return filename
+        except Exception as e:
+            print(f"Error exporting session file: {e}")
+            return ""
+    
+    def exportArchive(self, filename=None):
+        """
+        Export collected data to a compressed session archive (per-channel blocks, lossless float codec, see
+        SessionArchive.py).
+        
+        Parameters:
+        -----------
+        filename : str
+            Output path, defaults to the last exported CSV name (or the custom filename) with a .tsz extension
+        
+        Returns:
+        --------
+        str
+            Path to the exported archive
+        """
+        if filename is None:
+            base = self.last_export_filename or os.path.join(
+                self.output_directory,
+                self.custom_filename or f"delsys_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+            filename = os.path.splitext(base)[0] + SessionArchive.EXTENSION
+        
+        try:
+            metadata = {
+                'date_time': datetime.now().strftime('%m/%d/%Y %I:%M:%S %p'),
+                'source': os.path.basename(self.last_export_filename) if self.last_export_filename else "",
+                'muscle_map': self.muscle_map,
+            }
+            times = self.time_data if len(self.time_data) == len(self.data) and self.time_data else None
+            SessionArchive.write_archive(filename, self.data, self.exportChannelInfo(), metadata, times)
+            print(f"Session archive exported to {filename} ({round(os.path.getsize(filename) / 1e6, 2)} MB)")
+            return filename
+        except Exception as e:
+            print(f"Error exporting session archive: {e}")
+            return ""
+    
+    def exportThrowIndex(self, filename=None):
+        """
+        Export the detected throws: one row per throw with onset/end times and the onset/end sample index of every
+        channel, so each delivery can be cut out of the CSV (or session file) without searching for it.
+        
+        Parameters:
+        -----------
+        filename : str
+            Output path, defaults to the last exported CSV name with a _throws.csv suffix
+        
+        Returns:
+        --------
+        str
+            Path to the exported throw index
+        """
+        if filename is None:
+            base = self.last_export_filename or os.path.join(
+                self.output_directory,
+                self.custom_filename or f"delsys_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+            filename = os.path.splitext(base)[0] + "_throws.csv"
+        
+        try:
+            channel_names = [f"({info['pair_number']}) {info['name']}" if 'pair_number' in info else info['name']
+                             for info in self.channel_info]
+            with open(filename, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                header = ["Throw", "Onset (s)", "End (s)", "Duration (s)", "Peak ACC (g)", "Peak EMG envelope"]
+                for name in channel_names:
+                    header += [f"{name} onset sample", f"{name} end sample"]
+                writer.writerow(header)
+                for throw in self.throws:
+                    row = [throw['throw'], round(throw['onset_time'], 4), round(throw['end_time'], 4),
+                           round(throw['duration'], 4), round(throw['peak_acc'], 4), round(throw['peak_emg'], 4)]
+                    for onset, end in zip(throw['onset_samples'], throw['end_samples']):
+                        row += [onset, end]
+                    writer.writerow(row)
+            print(f"Throw index exported to {filename} ({len(self.throws)} throws)")
+            return filename
+        except Exception as e:
+            print(f"Error exporting throw index: {e}")
+            return ""
+    
+    def catalogSession(self, filename=None):
+        """
+        Add the exported session to the session catalog.
+        
+        Parameters:
+        -----------
+        filename : str
+            Exported session file, defaults to the last exported CSV
+        
+        Returns:
+        --------
+        str
+            Path to the catalog
+        """
+        filename = filename or self.last_export_filename
+        catalog_filename = self.catalog_filename or os.path.join(self.output_directory, SessionCatalog.CATALOG_NAME)
+        try:
+            metadata = {'date_time': datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')}
+            with SessionCatalog.SessionCatalog(catalog_filename) as catalog:
+                catalog.add_session(filename, self.exportChannelInfo(), self.data, metadata, self.muscle_map,
+                                    len(self.throws))
+            print(f"Session {os.path.basename(filename)} added to {catalog_filename}")
+            return catalog_filename
+        except Exception as e:
+            print(f"Error adding session to catalog: {e}")
+            return ""
+    
     def exportYTCSV(self):
         """
-        Export YT (Time-Y) data to a CSV file.
+        Export YT (Time-Y) data to a CSV file: same layout as exportCSV, with the recorded time stamps in the time
+        columns.
         
         Returns:
         --------
         str
             Path to the exported CSV file
         """
-        # Similar to exportCSV, but could be customized for YT data format
+        # Data was already written during collection (with the recorded time stamps), only move the file into place
+        if self.streamed_filename and os.path.exists(self.streamed_filename):
+            return self.export_streamed_file()
+
         if self.custom_filename:
             filename = os.path.join(self.output_directory, self.custom_filename)
         else:
@@ -272,27 +525,28 @@ class CsvWriter:
             filename = os.path.join(self.output_directory, f"delsys_yt_data_{timestamp}.csv")
         
         try:
-            with open(filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write headers
-                writer.writerow(self.h1_sensors)
-                writer.writerow(self.h2_channels)
-                
-                # YT data might require special handling depending on data structure
-                # This is a generic implementation
-                max_length = max(len(channel) for channel in self.data)
-                padded_data = [
-                    channel + [None] * (max_length - len(channel)) 
-                    for channel in self.data
-                ]
-                
-                transposed_data = list(map(list, zip(*padded_data)))
-                writer.writerows(transposed_data)
-            
+            times = self.time_data if len(self.time_data) == len(self.data) and self.time_data else None
+            self.writeChannels(filename, times)
             print(f"YT CSV exported to {filename}")
+            self.last_export_filename = filename
             return filename
         
         except Exception as e:
             print(f"Error exporting YT CSV: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+
+class _TimeColumn():
+    """Time stamps of one channel computed from the clock chunk by chunk, so no full time column is materialized"""
+
+    def __init__(self, clock, channel, length):
+        self.clock = clock
+        self.channel = channel
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(self.length)
+        return self.clock.times(self.channel, start, stop)
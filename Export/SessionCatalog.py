@@ -0,0 +1,415 @@
+"""
+SQLite catalog of exported sessions, for cross-session queries without opening the session files.
+
+    sessions    one row per session file: athlete, TraqID, date and session type (from the
+                MMDDYY_TraqID_FirstLast_sessiontype file name, see FilenameGeneratorDialog), recording time,
+                duration, channel/sensor/throw counts, file size and modification time
+    channels    one row per channel: sensor pair number and name, muscle, channel name/type, sample rate, sample
+                count and summary stats (mean, RMS, peak absolute value)
+
+CsvWriter.catalogSession() adds each session at export time (into CATALOG_NAME in the output directory).
+backfill() indexes the sessions already on disk on a process pool (the .tsf next to a CSV is read instead of the
+CSV when there is one) and skips files whose size and modification time did not change.
+
+Use Example:
+catalog = SessionCatalog(r"C:\\...\\Pitching_DataSet\\session_catalog.sqlite")
+catalog.backfill(r"C:\\...\\Pitching_DataSet")
+catalog.find(athlete="JohnSmith", session_type="veloday", date_from="2025-03-01", date_to="2025-03-31",
+             muscle="FCR", pair_number=2)
+
+Run from the project root:
+    python -m Export.SessionCatalog backfill <directory> [--catalog file] [--workers N] [--recursive]
+    python -m Export.SessionCatalog find <catalog> [--athlete A] [--traq-id T] [--session-type S] [--from D]
+                                                   [--to D] [--muscle M] [--pair N]
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from Export.CsvLoader import load_csv
+from Export.SessionFile import EXTENSION as SESSION_EXTENSION
+from Export.SessionFile import SessionFile
+
+CATALOG_NAME = "session_catalog.sqlite"
+_FILENAME = re.compile(r"^(\d{2})(\d{2})(\d{2})_([^_]+)_([^_]+)_(.+)$")
+# The sensor header row holds the muscle when one was assigned, the device name otherwise
+_DEVICE_NAME = re.compile(r"sensor|avanti|trigno|quattro|galileo|duo|maize", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    file TEXT NOT NULL,
+    athlete TEXT,
+    traq_id TEXT,
+    date TEXT,
+    session_type TEXT,
+    recorded_at TEXT,
+    duration REAL,
+    channel_count INTEGER,
+    sensor_count INTEGER,
+    throw_count INTEGER,
+    file_size INTEGER,
+    file_mtime REAL,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    channel_index INTEGER NOT NULL,
+    pair_number INTEGER,
+    sensor_name TEXT,
+    muscle TEXT COLLATE NOCASE,
+    name TEXT,
+    type TEXT,
+    sample_rate REAL,
+    samples INTEGER,
+    mean REAL,
+    rms REAL,
+    peak REAL,
+    PRIMARY KEY (session_id, channel_index)
+);
+CREATE INDEX IF NOT EXISTS sessions_athlete ON sessions (athlete, date);
+CREATE INDEX IF NOT EXISTS sessions_traq_id ON sessions (traq_id, date);
+CREATE INDEX IF NOT EXISTS sessions_type ON sessions (session_type, date);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date);
+DROP INDEX IF EXISTS channels_muscle;
+CREATE INDEX IF NOT EXISTS channels_muscle_session ON channels (muscle, pair_number, session_id);
+CREATE INDEX IF NOT EXISTS channels_pair_session ON channels (pair_number, session_id);
+"""
+_SESSION_COLUMNS = ['path', 'file', 'athlete', 'traq_id', 'date', 'session_type', 'recorded_at', 'duration',
+                    'channel_count', 'sensor_count', 'throw_count', 'file_size', 'file_mtime', 'indexed_at']
+_CHANNEL_COLUMNS = ['channel_index', 'pair_number', 'sensor_name', 'muscle', 'name', 'type', 'sample_rate',
+                    'samples', 'mean', 'rms', 'peak']
+
+
+def parse_session_filename(path):
+    """
+    Session fields of a MMDDYY_TraqID_FirstLast_sessiontype file name.
+
+    Returns:
+    --------
+    dict
+        date (YYYY-MM-DD), traq_id, athlete, session_type; empty values when the name does not follow the pattern
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = _FILENAME.match(stem)
+    if not match:
+        return {'date': "", 'traq_id': "", 'athlete': "", 'session_type': ""}
+    month, day, year, traq_id, athlete, session_type = match.groups()
+    return {'date': f"20{year}-{month}-{day}", 'traq_id': traq_id, 'athlete': athlete, 'session_type': session_type}
+
+
+def find_sessions(directory, recursive=False, exclude=()):
+    """
+    Session CSVs of a directory.
+
+    Throw indexes (*_throws.csv) and batch analysis summaries (a CSV with its <name>.json manifest next to it, see
+    BatchAnalysis) are skipped, as are the paths in exclude.
+
+    Returns:
+    --------
+    list of str
+        Sorted paths
+    """
+    pattern = os.path.join(directory, "**", "*.csv") if recursive else os.path.join(directory, "*.csv")
+    excluded = set(os.path.normcase(os.path.abspath(path)) for path in exclude)
+    return sorted(path for path in glob.glob(pattern, recursive=recursive)
+                  if not path.endswith("_throws.csv") and not os.path.exists(path + ".json")
+                  and os.path.normcase(os.path.abspath(path)) not in excluded)
+
+
+def _iso_time(date_time):
+    """Export header date ('%m/%d/%Y %I:%M:%S %p') as ISO 8601, or "" """
+    try:
+        return datetime.strptime(date_time, '%m/%d/%Y %I:%M:%S %p').isoformat()
+    except (TypeError, ValueError):
+        return ""
+
+
+def session_record(path, channel_info, values, metadata=None, muscle_map=None, throw_count=None):
+    """
+    Catalog entry of one session.
+
+    Parameters:
+    -----------
+    path : str
+        Session file (the CSV export)
+    channel_info : list of dict
+        Per-channel metadata (name, type, sample_rate, sensor pair number/name, muscle)
+    values : list of array
+        Samples of each channel
+    metadata : dict
+        Export metadata (date_time)
+    muscle_map : dict
+        Sensor pair number -> muscle name
+    throw_count : int
+        Detected throws, None when unknown
+
+    Returns:
+    --------
+    dict
+        'session' (sessions columns) and 'channels' (list of channels columns)
+    """
+    metadata = metadata or {}
+    muscle_map = {int(k) if str(k).isdigit() else k: v for k, v in (muscle_map or {}).items()}
+    channels = []
+    for k, (info, samples) in enumerate(zip(channel_info, values)):
+        samples = np.asarray(samples, dtype=np.float64)
+        pair_number = info.get('pair_number')
+        sensor_name = info.get('sensor_name', "")
+        muscle = muscle_map.get(pair_number) or info.get('muscle') or (
+            sensor_name if sensor_name and not _DEVICE_NAME.search(sensor_name) else "")
+        count = len(samples)
+        channels.append({
+            'channel_index': k, 'pair_number': pair_number, 'sensor_name': sensor_name, 'muscle': muscle,
+            'name': info.get('name', ""), 'type': str(info.get('type') or "").upper(),
+            'sample_rate': float(info.get('sample_rate') or 0.0), 'samples': count,
+            'mean': float(samples.mean()) if count else None,
+            'rms': float(np.sqrt(np.dot(samples, samples) / count)) if count else None,
+            'peak': float(np.abs(samples).max()) if count else None,
+        })
+    stat = os.stat(path) if os.path.exists(path) else None
+    fields = parse_session_filename(path)
+    recorded_at = _iso_time(metadata.get('date_time'))
+    session = dict(
+        fields, path=os.path.abspath(path), file=os.path.basename(path), recorded_at=recorded_at,
+        date=fields['date'] or recorded_at[:10],
+        duration=max((c['samples'] / c['sample_rate'] for c in channels if c['sample_rate'] > 0), default=0.0),
+        channel_count=len(channels),
+        sensor_count=len(set(c['pair_number'] for c in channels if c['pair_number'] is not None)),
+        throw_count=throw_count, file_size=stat.st_size if stat else None, file_mtime=stat.st_mtime if stat else None,
+        indexed_at=datetime.now().isoformat(timespec='seconds'))
+    return {'session': session, 'channels': channels}
+
+
+def read_session_record(path):
+    """Catalog entry of a session CSV on disk (from its .tsf when there is one). Runs in the backfill workers"""
+    session_path = os.path.splitext(path)[0] + SESSION_EXTENSION
+    if os.path.exists(session_path):
+        with SessionFile(session_path) as session:
+            channel_info = session.channels
+            values = [session.channel(i) for i in range(len(session))]
+            metadata = session.metadata
+            record = session_record(path, channel_info, values, metadata, metadata.get('muscle_map'))
+    else:
+        channel_info, values, _, metadata = load_csv(path)
+        record = session_record(path, channel_info, values, metadata)
+    throw_index = os.path.splitext(path)[0] + "_throws.csv"
+    if os.path.exists(throw_index):
+        with open(throw_index) as f:
+            record['session']['throw_count'] = max(sum(1 for line in f if line.strip()) - 1, 0)
+    return record
+
+
+class SessionCatalog():
+    def __init__(self, filename):
+        """
+        Parameters:
+        -----------
+        filename : str
+            SQLite database, created with the catalog tables when it does not exist
+        """
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def add(self, record):
+        """Insert or replace a session_record(). Returns the session id"""
+        with self.connection:
+            return self._add(record)
+
+    def _add(self, record):
+        session = record['session']
+        self.connection.execute("DELETE FROM sessions WHERE path = ?", (session['path'],))
+        cursor = self.connection.execute(
+            f"INSERT INTO sessions ({', '.join(_SESSION_COLUMNS)}) VALUES ({', '.join('?' * len(_SESSION_COLUMNS))})",
+            [session.get(column) for column in _SESSION_COLUMNS])
+        session_id = cursor.lastrowid
+        self.connection.executemany(
+            f"INSERT INTO channels (session_id, {', '.join(_CHANNEL_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' * len(_CHANNEL_COLUMNS))})",
+            [[session_id] + [channel.get(column) for column in _CHANNEL_COLUMNS] for channel in record['channels']])
+        return session_id
+
+    def add_session(self, path, channel_info, values, metadata=None, muscle_map=None, throw_count=None):
+        """Index a session from its data in memory (see session_record). Returns the session id"""
+        return self.add(session_record(path, channel_info, values, metadata, muscle_map, throw_count))
+
+    def backfill(self, directory, workers=None, recursive=False):
+        """
+        Index the session CSVs of a directory. Files already indexed with the same size and modification time are
+        skipped.
+
+        Parameters:
+        -----------
+        directory : str
+            Session directory (CsvWriter.output_directory)
+        workers : int
+            Worker processes, defaults to the number of CPUs. 1 runs in this process
+
+        Returns:
+        --------
+        dict
+            indexed, skipped and failed file counts
+        """
+        paths = find_sessions(directory, recursive)
+        known = {row['path']: (row['file_size'], row['file_mtime'])
+                 for row in self.connection.execute("SELECT path, file_size, file_mtime FROM sessions")}
+        pending = []
+        for path in paths:
+            stat = os.stat(path)
+            if known.get(os.path.abspath(path)) != (stat.st_size, stat.st_mtime):
+                pending.append(path)
+
+        indexed, failed = 0, 0
+        workers = min(workers or os.cpu_count() or 1, max(len(pending), 1))
+        with self.connection:
+            if workers <= 1:
+                results = (self._read(path) for path in pending)
+            else:
+                pool = ProcessPoolExecutor(max_workers=workers)
+                futures = {pool.submit(read_session_record, path): path for path in pending}
+                results = (self._result(future, futures[future]) for future in as_completed(futures))
+            for path, record in results:
+                if record is None:
+                    failed += 1
+                    continue
+                self._add(record)
+                indexed += 1
+            if workers > 1:
+                pool.shutdown()
+        return {'indexed': indexed, 'skipped': len(paths) - len(pending), 'failed': failed}
+
+    @staticmethod
+    def _read(path):
+        try:
+            return path, read_session_record(path)
+        except Exception as e:
+            print(f"Error indexing {path}: {e}")
+            return path, None
+
+    @staticmethod
+    def _result(future, path):
+        try:
+            return path, future.result()
+        except Exception as e:
+            print(f"Error indexing {path}: {e}")
+            return path, None
+
+    def find(self, athlete=None, traq_id=None, session_type=None, date_from=None, date_to=None, muscle=None,
+             pair_number=None):
+        """
+        Sessions matching every given field, newest first.
+
+        Parameters:
+        -----------
+        date_from, date_to : str
+            Inclusive YYYY-MM-DD bounds
+        muscle : str
+            A channel of the session records this muscle (case-insensitive)
+        pair_number : int
+            A channel of the session comes from this sensor (on the given muscle when both are set)
+
+        Returns:
+        --------
+        list of dict
+            sessions rows
+        """
+        where, params = [], []
+        for column, value in (('athlete', athlete), ('traq_id', traq_id), ('session_type', session_type)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if date_from is not None:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("date <= ?")
+            params.append(date_to)
+        if muscle is not None or pair_number is not None:
+            # Matching session ids are collected once from the channel indexes (not looked up per session)
+            channel_where, channel_params = [], []
+            if muscle is not None:
+                channel_where.append("muscle = ?")
+                channel_params.append(muscle)
+            if pair_number is not None:
+                channel_where.append("pair_number = ?")
+                channel_params.append(int(pair_number))
+            where.append(f"id IN (SELECT session_id FROM channels WHERE {' AND '.join(channel_where)})")
+            params += channel_params
+        sql = "SELECT * FROM sessions" + (" WHERE " + " AND ".join(where) if where else "") + \
+              " ORDER BY date DESC, recorded_at DESC"
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def channels(self, session_id):
+        """channels rows of a session, in data order"""
+        return [dict(row) for row in self.connection.execute(
+            "SELECT * FROM channels WHERE session_id = ? ORDER BY channel_index", (session_id,))]
+
+    def remove_missing(self):
+        """Drop the sessions whose file no longer exists. Returns the number removed"""
+        missing = [(row['path'],) for row in self.connection.execute("SELECT path FROM sessions")
+                   if not os.path.exists(row['path'])]
+        with self.connection:
+            self.connection.executemany("DELETE FROM sessions WHERE path = ?", missing)
+        return len(missing)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite catalog of exported sessions")
+    commands = parser.add_subparsers(dest='command', required=True)
+    backfill = commands.add_parser('backfill', help="index the session CSVs of a directory")
+    backfill.add_argument('directory')
+    backfill.add_argument('--catalog', help=f"catalog file (default: {CATALOG_NAME} in the directory)")
+    backfill.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    backfill.add_argument('--recursive', action='store_true', help="include subdirectories")
+    find = commands.add_parser('find', help="list the sessions matching every given field")
+    find.add_argument('catalog')
+    find.add_argument('--athlete')
+    find.add_argument('--traq-id')
+    find.add_argument('--session-type')
+    find.add_argument('--from', dest='date_from', help="first date, YYYY-MM-DD")
+    find.add_argument('--to', dest='date_to', help="last date, YYYY-MM-DD")
+    find.add_argument('--muscle')
+    find.add_argument('--pair', type=int, help="sensor pair number")
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        with SessionCatalog(args.catalog or os.path.join(args.directory, CATALOG_NAME)) as catalog:
+            result = catalog.backfill(args.directory, args.workers, args.recursive)
+            removed = catalog.remove_missing()
+            print(f"{result['indexed']} sessions indexed, {result['skipped']} unchanged, {result['failed']} failed, "
+                  f"{removed} removed -> {catalog.filename} ({len(catalog)} sessions)")
+        return result
+    with SessionCatalog(args.catalog) as catalog:
+        sessions = catalog.find(args.athlete, args.traq_id, args.session_type, args.date_from, args.date_to,
+                                args.muscle, args.pair)
+    for session in sessions:
+        print(f"{session['date']}  {session['athlete']:16} {session['traq_id']:8} {session['session_type']:10} "
+              f"{session['duration']:8.1f} s  {session['path']}")
+    print(f"{len(sessions)} sessions")
+    return sessions
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Binary columnar session file (.tsf) with memory-mapped readback.
+
+Layout:
+    8 bytes   magic b"TRIGNOSF"
+    4 bytes   format version (little-endian uint32)
+    8 bytes   header length in bytes (little-endian uint64)
+    header    UTF-8 JSON: session metadata and one entry per channel (name, type, sample rate, sensor pair
+              number / name / mode, muscle, dtype, length and the file offset of its samples)
+    data      one contiguous little-endian array per channel (and per channel time stamps for YT data),
+              each aligned to 64 bytes
+
+SessionFile reads only the header on open; channel arrays are memory-mapped on first access, so notebooks can
+pull a single channel out of a long session without loading or parsing the rest. csv_to_session() and
+session_to_csv() convert from/to the CSV written by CsvWriter/StreamingCsvWriter (and two-header-row files such
+as data.csv).
+"""
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from Export.CsvLoader import load_csv
+
+MAGIC = b"TRIGNOSF"
+VERSION = 1
+ALIGNMENT = 64
+EXTENSION = ".tsf"
+_PREAMBLE = struct.Struct("<8sIQ")
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_session(filename, channel_arrays, channel_info, metadata=None, channel_times=None, dtype=np.float64):
+    """
+    Write a session file.
+
+    Parameters:
+    -----------
+    filename : str
+        Output path
+    channel_arrays : list of array-like
+        Samples of each channel, in the order of channel_info
+    channel_info : list of dict
+        Per-channel metadata, at least 'name' and 'sample_rate' (see CsvWriter.appendChannelInfo)
+    metadata : dict
+        Session level metadata (date, athlete, ...). A 'muscle_map' entry (sensor pair number -> muscle name)
+        is also stored per channel as 'muscle'
+    channel_times : list of array-like
+        Optional per-channel time stamps (YT data)
+
+    Returns:
+    --------
+    str
+        Path to the written file
+    """
+    arrays = [np.ascontiguousarray(np.asarray(values), dtype=np.dtype(dtype).newbyteorder('<'))
+              for values in channel_arrays]
+    times = None
+    if channel_times is not None:
+        times = [np.ascontiguousarray(np.asarray(t), dtype='<f8') for t in channel_times]
+
+    muscle_map = (metadata or {}).get('muscle_map') or {}
+    channels = []
+    for i, (info, values) in enumerate(zip(channel_info, arrays)):
+        entry = {key: value for key, value in info.items()}
+        if muscle_map.get(entry.get('pair_number')):
+            entry['muscle'] = muscle_map[entry.get('pair_number')]
+        entry.update({'dtype': values.dtype.str, 'length': int(values.size)})
+        if times is not None:
+            entry['time_dtype'] = times[i].dtype.str
+        channels.append(entry)
+    header = {'format': 'trigno-session', 'version': VERSION,
+              'created': datetime.now().isoformat(timespec='seconds'),
+              'metadata': metadata or {}, 'channels': channels}
+
+    # The header holds the data offsets, so reserve room for them before laying out the data
+    reserved = len(json.dumps(header, default=str).encode('utf-8')) + 64 * len(channels) + 64
+    offset = _aligned(_PREAMBLE.size + reserved)
+    for i, entry in enumerate(channels):
+        entry['offset'] = offset
+        offset = _aligned(offset + arrays[i].nbytes)
+        if times is not None:
+            entry['time_offset'] = offset
+            offset = _aligned(offset + times[i].nbytes)
+    header_bytes = json.dumps(header, default=str).encode('utf-8')
+    header_bytes += b" " * (reserved - len(header_bytes))
+
+    with open(filename, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for i, entry in enumerate(channels):
+            f.seek(entry['offset'])
+            f.write(arrays[i].tobytes())
+            if times is not None:
+                f.seek(entry['time_offset'])
+                f.write(times[i].tobytes())
+    return filename
+
+
+class SessionFile():
+    """Lazily memory-mapped reader for .tsf session files"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            magic, version, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(filename + " is not a Trigno session file")
+            if version > VERSION:
+                raise ValueError("Unsupported session file version: " + str(version))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        self.version = version
+        self.created = header.get('created')
+        self.metadata = header.get('metadata', {})
+        self.channels = header['channels']
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._maps = {}
+
+    def index(self, channel):
+        """Channel position from an index, a GUID or a 'Sensor name/Channel name' style label"""
+        if isinstance(channel, (int, np.integer)):
+            return int(channel)
+        for i, entry in enumerate(self.channels):
+            if channel in (entry.get('guid'), entry.get('name'), self.label(i)):
+                return i
+        raise KeyError(channel)
+
+    def label(self, index):
+        entry = self.channels[index]
+        return f"({entry.get('pair_number', '')}) {entry.get('name', '')}"
+
+    def channel(self, channel):
+        """Samples of one channel as a read-only memory map (nothing is read until the data is used)"""
+        i = self.index(channel)
+        if ('values', i) not in self._maps:
+            entry = self.channels[i]
+            self._maps[('values', i)] = self._map(entry['offset'], entry['dtype'], entry['length'])
+        return self._maps[('values', i)]
+
+    def times(self, channel):
+        """Time stamps of one channel: the recorded YT stamps if stored, else sample index / sample rate"""
+        i = self.index(channel)
+        entry = self.channels[i]
+        if 'time_offset' in entry:
+            if ('times', i) not in self._maps:
+                self._maps[('times', i)] = self._map(entry['time_offset'], entry['time_dtype'], entry['length'])
+            return self._maps[('times', i)]
+        return np.arange(entry['length']) / float(entry['sample_rate'])
+
+    def _map(self, offset, dtype, length):
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.filename, dtype=np.dtype(dtype), mode='r', offset=offset, shape=(length,))
+
+    def sample_rate(self, channel):
+        return float(self.channels[self.index(channel)]['sample_rate'])
+
+
+def read_csv_channels(filename):
+    """
+    Read a CsvWriter / Trigno CSV into per-channel arrays (see CsvLoader.load_csv).
+
+    Handles the export layout (Application/Date/Collection Length preamble, sensor/mode/name/rate rows and
+    time/value column pairs) and the two-header-row layout of data.csv (sensor row, "Name (rate)" row, one column
+    per channel).
+
+    Returns:
+    --------
+    tuple
+        (list of channel_info dicts, list of value arrays, list of time arrays or None, metadata dict)
+    """
+    return load_csv(filename)
+
+
+def csv_to_session(csv_filename, session_filename=None):
+    """Convert a CSV export to a session file next to it (or to session_filename), with the time stamps of its time
+    columns (YT or clock-corrected exports). Returns the session path"""
+    channel_info, values, times, metadata = read_csv_channels(csv_filename)
+    metadata['source'] = os.path.basename(csv_filename)
+    session_filename = session_filename or os.path.splitext(csv_filename)[0] + EXTENSION
+    return write_session(session_filename, values, channel_info, metadata, times)
+
+
+def session_to_csv(session_filename, csv_filename=None):
+    """Convert a session file back to the CSV export layout. Returns the CSV path"""
+    from Export.StreamingCsvWriter import StreamingCsvWriter
+
+    session = SessionFile(session_filename)
+    csv_filename = csv_filename or os.path.splitext(session_filename)[0] + ".csv"
+    writer = StreamingCsvWriter(csv_filename, session.channels, date_time=session.metadata.get('date_time'))
+    has_times = all('time_offset' in entry for entry in session.channels)
+    writer.write_block([session.channel(i) for i in range(len(session))],
+                       [session.times(i) for i in range(len(session))] if has_times else None)
+    return writer.finalize()
@@ -0,0 +1,202 @@
+"""
+Streaming CSV export during collection.
+
+StreamingCsvWriter writes the Trigno Discover style CSV (see CsvWriter.exportCSV) while data is collected: the
+acquisition thread hands each packet to write_block(), a background thread turns the queued packets into text in
+bulk and appends them to the file. Each channel gets a time/value column pair and the layout is the one of
+CsvWriter.writeChannels: row k holds sample k of every channel, so each column is contiguous and slower channels
+only leave empty fields at the end of the file.
+
+The background thread appends every channel's (time, value) pairs to a temporary spool file (raw float64, next to
+the CSV) and writes the rows every channel has reached. Samples of the faster channels past the slowest channel wait
+in their spools, so memory stays flat; finalize() formats them (the rows where slower channels have ended) and
+patches the Collection Length header field in place. The file is flushed after every batch, so a crash mid-session
+leaves a usable partial file with every row all channels had reached (the spools are deleted). A channel that never
+receives samples holds every row back until finalize(). Time columns come from the session SampleClock when one is
+given. CsvWriter streams to a name ending in PARTIAL_EXTENSION and renames the file on export, so session discovery
+(*.csv) never picks up an unexported or interrupted stream.
+"""
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from Export.CsvFormatter import TIME_DECIMALS, VALUE_DECIMALS, format_columns, iter_formatted
+
+PARTIAL_EXTENSION = ".partial"  # Appended to the CSV name until the stream is exported
+COLLECTION_LENGTH_FORMAT = "%012.4f"  # Fixed width so the value can be patched in place at finalize
+_RECORD_BYTES = 16  # Spool record: time and value, float64
+UNITS = {"EMG": "mV", "ACC": "g", "GYRO": "deg/s"}
+
+
+def channel_header_rows(channel_info, muscle_map=None):
+    """Sensor, mode, channel name and sample rate header rows for a time/value column pair per channel"""
+    muscle_map = muscle_map or {}
+    sensor_row, mode_row, name_row, rate_row = [], [], [], []
+    previous_sensor = None
+    for info in channel_info:
+        sensor = (info.get('pair_number'), info.get('sensor_name'))
+        if sensor != previous_sensor:
+            muscle = muscle_map.get(info.get('pair_number')) or info.get('muscle', "")
+            label = muscle if muscle else info.get('sensor_name', "")
+            pair_number = info.get('pair_number')
+            sensor_row += [f"{label} ({pair_number})" if pair_number is not None else label, ""]
+            mode_row += [f"sensor mode: {info['mode']}" if info.get('mode') else "", ""]
+            previous_sensor = sensor
+        else:
+            sensor_row += ["", ""]
+            mode_row += ["", ""]
+        unit = UNITS.get(str(info.get('type', '')).upper(), "")
+        name_row += [f"{info['name']} Time Series (s)", f"{info['name']} ({unit})" if unit else info['name']]
+        rate_row += ["", f"{info['sample_rate']} Hz"]
+    return [sensor_row, mode_row, name_row, rate_row]
+
+
+def _csv_line(cells):
+    """Join header cells, quoting only when needed (matches csv.writer output for these fields)"""
+    out = []
+    for cell in cells:
+        cell = str(cell)
+        if any(c in cell for c in ',"\n'):
+            cell = '"' + cell.replace('"', '""') + '"'
+        out.append(cell)
+    return ",".join(out) + "\r\n"
+
+
+def format_rows(times, values):
+    """Format rows of time/value column pairs in bulk (see CsvFormatter).
+
+    times/values: lists (one entry per channel) of arrays, or None for a channel that has no sample in these rows.
+    There are as many rows as the longest array, shorter channels get empty fields in the remaining rows. Times
+    get TIME_DECIMALS decimals, values VALUE_DECIMALS."""
+    columns = []
+    for t, v in zip(times, values):
+        columns += [t, v]
+    return format_columns(columns, [TIME_DECIMALS, VALUE_DECIMALS] * len(times)).decode('ascii')
+
+
+class _SpoolColumn():
+    """Time (field 0) or value (field 1) column of a spool file from row start on, read a slice at a time (a column
+    for iter_formatted)"""
+
+    def __init__(self, spool, field, start, stop):
+        self.spool, self.field, self.start, self.stop = spool, field, start, stop
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, item):
+        first, last, _ = item.indices(len(self))
+        self.spool.seek((self.start + first) * _RECORD_BYTES)
+        records = np.frombuffer(self.spool.read(max(last - first, 0) * _RECORD_BYTES), dtype=np.float64)
+        return records[self.field::2]
+
+
+class StreamingCsvWriter():
+    def __init__(self, filename, channel_info, muscle_map=None, application="Trigno Discover (1.7.0)", date_time=None,
+                 clock=None):
+        self.filename = filename
+        self.channel_info = list(channel_info)
+        self.rates = [float(info['sample_rate']) for info in self.channel_info]
+        self.clock = clock if clock is not None and len(clock) == len(self.channel_info) else None
+        self._received = [0] * len(self.channel_info)
+        self._written = 0   # Rows in the file (every channel has a sample in each of them)
+        self._blocks = queue.Queue()
+        self._file = open(filename, 'w', newline='')
+        # (time, value) records of every sample, deleted on close
+        self._spools = [tempfile.TemporaryFile(prefix="stream_", suffix=".spool", dir=os.path.dirname(filename) or None)
+                        for _ in self.channel_info]
+
+        self._file.write(_csv_line(["Application:", application]))
+        self._file.write(_csv_line(["Date/Time:", date_time or datetime.now().strftime('%m/%d/%Y %I:%M:%S %p')]))
+        self._file.write("Collection Length (seconds):,")
+        self._length_offset = self._file.tell()
+        self._file.write(COLLECTION_LENGTH_FORMAT % 0 + "\r\n")
+        for row in channel_header_rows(self.channel_info, muscle_map):
+            self._file.write(_csv_line(row))
+        self._file.flush()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write_block(self, channel_values, channel_times=None):
+        """Called from the acquisition thread with one packet (one array per channel). Never blocks"""
+        self._blocks.put((channel_values, channel_times))
+
+    def _run(self):
+        while True:
+            item = self._blocks.get()
+            if item is None:
+                break
+            blocks = [item]
+            while True:  # Drain everything queued so rows are formatted in as few, large batches as possible
+                try:
+                    item = self._blocks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._blocks.put(None)
+                    break
+                blocks.append(item)
+            self._write_blocks(blocks)
+
+    def _write_blocks(self, blocks):
+        """Spool the samples of a batch of packets, then write the rows every channel has reached"""
+        for i in range(len(self.channel_info)):
+            values = [np.asarray(block[0][i], dtype=np.float64).ravel() for block in blocks]
+            values = values[0] if len(values) == 1 else np.concatenate(values)
+            if blocks[0][1] is not None:
+                times = [np.asarray(block[1][i], dtype=np.float64).ravel() for block in blocks]
+                times = times[0] if len(times) == 1 else np.concatenate(times)
+            elif self.clock is not None:
+                times = self.clock.times(i, self._received[i], self._received[i] + values.size)
+            else:
+                times = (self._received[i] + np.arange(values.size)) / self.rates[i]
+            self._received[i] += values.size
+            self._spools[i].seek(0, os.SEEK_END)
+            self._spools[i].write(np.column_stack((times, values)).tobytes())
+        ready = min(self._received, default=0)
+        if ready > self._written:
+            columns = [self._read_spool(i, self._written, ready) for i in range(len(self.channel_info))]
+            self._file.write(format_rows([c[:, 0] for c in columns], [c[:, 1] for c in columns]))
+            self._file.flush()
+            self._written = ready
+
+    def _read_spool(self, channel, start, stop):
+        """(rows, 2) times and values of rows start..stop of a channel"""
+        spool = self._spools[channel]
+        spool.seek(start * _RECORD_BYTES)
+        return np.frombuffer(spool.read((stop - start) * _RECORD_BYTES), dtype=np.float64).reshape(-1, 2)
+
+    def _write_tail(self):
+        """Write the rows past the slowest channel (slower channels get empty fields), a chunk at a time"""
+        columns = []
+        for i, spool in enumerate(self._spools):
+            columns += [_SpoolColumn(spool, 0, self._written, self._received[i]),
+                        _SpoolColumn(spool, 1, self._written, self._received[i])]
+        for text in iter_formatted(columns, [TIME_DECIMALS, VALUE_DECIMALS] * len(self._spools)):
+            self._file.write(text.decode('ascii'))
+        self._written = max(self._received, default=0)
+
+    @property
+    def collection_length(self):
+        lengths = [received / rate for received, rate in zip(self._received, self.rates) if rate > 0]
+        return round(max(lengths), 4) if lengths else 0.0
+
+    def finalize(self):
+        """Flush everything, patch the Collection Length header and close the file. Returns the filename"""
+        if self._file.closed:
+            return self.filename
+        self._blocks.put(None)
+        self._thread.join()
+        self._write_tail()
+        for spool in self._spools:
+            spool.close()
+        self._file.seek(self._length_offset)
+        self._file.write(COLLECTION_LENGTH_FORMAT % self.collection_length)
+        self._file.seek(0, os.SEEK_END)
+        self._file.close()
+        return self.filename
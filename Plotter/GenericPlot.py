@@ -11,6 +11,15 @@ You can set color and index of the data if desired. If not, set these to null.
 Update the plot with a call to plot_new_data(). New data should come as an np array shaped to rows and columns.
 For example: to update a 4x1 grid of subplots, data should be a 4xn array where n is how many new data points are being plotted.
 
+In ring buffer mode (the default) the position buffer is not re-uploaded on every update: only the newly written
+columns are sent to the GPU with set_subdata, and scrolling is done in the vertex shader by offsetting the time index
+with the ring head (u_offset) instead of shifting the whole array on the CPU. Upload rate and frame time are
+available from plot_metrics().
+
+With level of detail enabled (the default) each channel is drawn as a min/max envelope with about one bucket per
+visible pixel column (see LevelOfDetail.py) instead of one vertex per sample. The bucket size is picked again on
+resize and horizontal zoom.
+
 Use Example:
 plotCanvas = PlottingCanvas()
 plotCanvas.initiateCanvas(None,None,1, 1,numSamples)
@@ -20,11 +29,15 @@ from vispy import gloo
 from vispy import app
 import numpy as np
 import math
-import random
+import time
+from collections import deque
+
+from Plotter.LevelOfDetail import MinMaxEnvelope, choose_bucket_size
+from Plotter.Resampler import resample_frame
 
 
 class GenericPlot(app.Canvas):
-    def __init__(self, plot_mode: str = 'windowed'):
+    def __init__(self, plot_mode: str = 'windowed', ring_buffer: bool = True, level_of_detail: bool = True):
         app.use_app('PySide6')
         app.Canvas.__init__(self, title='Use your wheel to zoom!',
                             keys='interactive', app='PySide6')
@@ -37,6 +50,26 @@ class GenericPlot(app.Canvas):
         self.plot_mode = plot_mode
         self.last_plotted_column = -1
 
+        #---- GPU upload state
+        self.ring_buffer = ring_buffer          # Upload only new columns and scroll in the shader
+        self.ring_head = 0                      # Column of the oldest sample in scrolling ring mode
+        self.full_upload_pending = True         # Buffer changed outside the tracked columns (reset, paused updates)
+
+        #---- Level of detail
+        self.level_of_detail = level_of_detail  # Draw min/max envelopes sized to the canvas width
+        self.envelope = None                    # MinMaxEnvelope of the current level, None when drawing raw samples
+        self.bucket_size = 1
+        self.requested_bucket_size = 1          # Set on resize/zoom, applied by the plot thread on its next update
+
+        #---- Plot metrics
+        self.upload_bytes = 0                   # Total bytes sent to the GPU
+        self.frame_times = deque(maxlen=60)     # Seconds between recent draws
+        self._last_draw = None
+        self._rate_sample = (time.perf_counter(), 0)
+        self._upload_rate = 0.0
+        self.instrumentation = None             # PipelineInstrumentation receiving draw / end-to-end latency
+        self._uploaded = deque(maxlen=256)      # (poll time, upload time) of packets not drawn yet
+
     def initiateCanvas(self, color, index, nrows=1, ncols=1, plot_window_sample_count=10000):
         #---- Define subplot dimensions and plot granularity
         self.nrows = nrows
@@ -52,14 +85,15 @@ class GenericPlot(app.Canvas):
         #---- Generate the signals as a (m, n) array
         self._reset_data_plot_buffer()
 
-        #---- Color of each vertex (TODO: make it more efficient by using a GLSL-based color map and the index).
+        #---- Color of each signal. Caller supplied per-vertex colors or indexes fix the vertex layout, so the
+        #---- level of detail is only used with the generated ones.
+        self.channel_colors = np.random.uniform(size=(self.m, 3), low=.5, high=.9).astype(np.float32)
+        self.custom_layout = color is not None or index is not None
         if color is None:
-            color = np.repeat(np.random.uniform(size=(self.m, 3), low=.5, high=.9), self.n, axis=0).astype(np.float32)
+            color = np.repeat(self.channel_colors, self.n, axis=0)
 
         if index is None:
-            index = np.c_[np.repeat(np.repeat(np.arange(self.ncols), self.nrows), self.n),
-                          np.repeat(np.tile(np.arange(self.nrows), self.ncols), self.n),
-                          np.tile(np.arange(self.n), self.m)].astype(np.float32)
+            index = self._vertex_index(np.arange(self.n))
 
         # Signal 2D index of each vertex (row and col) and x-index (sample index
         # within each signal).
@@ -78,6 +112,10 @@ class GenericPlot(app.Canvas):
         uniform vec2 u_size;
         // Number of samples per signal.
         uniform float u_n;
+        // Ring buffer head: column index drawn at the left edge.
+        uniform float u_offset;
+        // 1 for columns written after the ring wrapped, 0 before. Fractional only on the wrap segment.
+        varying float v_seam;
         // Color.
         attribute vec3 a_color;
         varying vec4 v_color;
@@ -88,7 +126,9 @@ class GenericPlot(app.Canvas):
             float nrows = u_size.x;
             float ncols = u_size.y;
             // Compute the x coordinate from the time index.
-            float x = -1 + 2*a_index.z / (u_n-1);
+            float t = mod(a_index.z - u_offset + u_n, u_n);
+            float x = -1 + 2*t / (u_n-1);
+            v_seam = 1. - step(u_offset, a_index.z);
             vec2 position = vec2(x - (1 - 1 / u_scale.x), a_position);
             // Find the affine transformation for the subplots.
             vec2 a = vec2(1./ncols, 1./nrows)*1;
@@ -110,11 +150,15 @@ class GenericPlot(app.Canvas):
         varying vec3 v_index;
         varying vec2 v_position;
         varying vec4 v_ab;
+        varying float v_seam;
         void main() {
             gl_FragColor = v_color;
             // Discard the fragments between the signals (emulate glMultiDrawArrays).
             if ((fract(v_index.x) > 0.) || (fract(v_index.y) > 0.))
                 discard;
+            // Discard the segment joining the newest and oldest column of the ring buffer.
+            if (fract(v_seam) > 0.)
+                discard;
             // Clipping test.
             vec2 test = abs((v_position.xy-v_ab.zw)/v_ab.xy);
             if ((test.x > 1) || (test.y > 1))
@@ -130,6 +174,15 @@ class GenericPlot(app.Canvas):
         self.program['u_scale'] = (1., 1.)
         self.program['u_size'] = (nrows, ncols)
         self.program['u_n'] = self.n
+        self.program['u_offset'] = 0.
+        self.ring_head = 0
+        self.full_upload_pending = False
+
+        self.envelope = None
+        self.bucket_size = 1
+        self._select_level(self.physical_size[0])
+        if self.requested_bucket_size != self.bucket_size:
+            self._apply_level()
 
         self.pause = False
         self.is_initialized = True
@@ -141,6 +194,8 @@ class GenericPlot(app.Canvas):
     def on_resize(self, event):
         if self.plot_interact_flag:
             gloo.set_viewport(0, 0, event.physical_size[0], event.physical_size[1])
+            if self.is_initialized:
+                self._select_level(event.physical_size[0])
             self.update()
 
     def on_mouse_wheel(self, event):
@@ -150,6 +205,7 @@ class GenericPlot(app.Canvas):
             scale_x_new, scale_y_new = (scale_x * math.exp(0.0 * dx),
                                         scale_y * math.exp(2.5 * dx))
             self.program['u_scale'] = (max(1, scale_x_new), max(1, scale_y_new))
+            self._select_level(self.physical_size[0])
             self.update()
 
     def on_pause(self):
@@ -162,44 +218,11 @@ class GenericPlot(app.Canvas):
     #-----------------------------------------------------------------------
     #---- Plotting Functions
     def plot_new_data(self, data_frame, next_val):
-        #---- Process possibly jagged array into rectangular array
-        emgLen = max(len(x) for x in data_frame)                 # All processing is normalized to the fastest EMG rate
-        for i in range(len(data_frame)):
-            #--- Spread out / interpolate data 
-            if len(data_frame[i]) < emgLen:
-                #-- Generate Index Vector 
-                indexVector = []
-                for j in range(len(data_frame[i])):
-                    indexVector.append(emgLen/len(data_frame[i]) * j)
-                #-- Quantize Index Vector 
-                quantIndexVector = []
-                for j in range(len(indexVector)):
-                    quantIndexVector.append(round(indexVector[j]))
-                #-- Copy data values to quantized indices
-                quantData = [None] * emgLen
-                dataInd = 0
-                for j in quantIndexVector:
-                    quantData[j] = data_frame[i][dataInd]
-                    dataInd += 1
-                #-- Piecewise linearly interpolate any empty points
-                for j in range(len(quantIndexVector)):
-                    if j == len(quantIndexVector)-1:
-                        #- Interpolate the last recorded point of time T to the first point of time T+1
-                        arrToInsert = np.linspace(quantData[quantIndexVector[j]], next_val[i], len(quantData)-quantIndexVector[j], endpoint=True)
-                        quantData[quantIndexVector[j]:] = arrToInsert
-                    else:
-                        #- Interpolate between points of time T
-                        arrToInsert = np.linspace(quantData[quantIndexVector[j]], quantData[quantIndexVector[j+1]], quantIndexVector[j+1]-quantIndexVector[j], endpoint=False)
-                        quantData[quantIndexVector[j]:quantIndexVector[j+1]] = arrToInsert
-                #-- Overwrite data_frame[i]
-                data_frame[i] = quantData
-            #--- Shrink data (shouldn't happen, but kept just in case)
-            elif len(data_frame[i]) > emgLen:
-                #-- Randomly delete data until length matches
-                while len(data_frame[i]) != emgLen:
-                    randIndex = random.randint(1, len(data_frame[i])-2)
-                    data_frame[i] = np.delete(data_frame[i], randIndex)
+        #---- Process possibly jagged array into a rectangular (m, emgLen) array, normalized to the fastest EMG rate
+        self.plot_frame(resample_frame(data_frame, next_val))
 
+    def plot_frame(self, data_frame):
+        """Plot an already rectangular (m, samples) frame"""
         #---- Plot according to mode defined in Plotter() in CollectDataWindow.py
         if self.plot_mode.lower() == 'scrolling':
             self.plot_scrolling_data(data_frame)
@@ -209,14 +232,27 @@ class GenericPlot(app.Canvas):
             raise Exception('Plot mode not defined')
 
     def plot_scrolling_data(self, data_frame):
-        new = np.asarray(data_frame, dtype='object')
+        new = np.asarray(data_frame, dtype=np.float32)
         sp = np.shape(new)
-        self.y[:, :-sp[1]] = self.y[:, sp[1]:]
-        self.y[:, -sp[1]:] = new
-        self._update_data()
+        if not self.ring_buffer:
+            self.y[:, :-sp[1]] = self.y[:, sp[1]:]
+            self.y[:, -sp[1]:] = new
+            self._update_data()
+            return
+
+        #---- Overwrite the oldest columns in place and move the ring head past them
+        new = new[:, -self.n:]
+        count = new.shape[1]
+        first = min(count, self.n - self.ring_head)
+        self.y[:, self.ring_head:self.ring_head + first] = new[:, :first]
+        self.y[:, :count - first] = new[:, first:]
+        columns = [(self.ring_head, self.ring_head + first), (0, count - first)]
+        self.ring_head = (self.ring_head + count) % self.n
+        self.program['u_offset'] = float(self.ring_head)
+        self._update_data(columns)
 
     def plot_windowed_data(self, data_frame):
-        new_data = np.asarray(data_frame, dtype='object')
+        new_data = np.asarray(data_frame, dtype=np.float32)
 
         try: 
             new_data_count = np.size(new_data, 1)
@@ -233,7 +269,7 @@ class GenericPlot(app.Canvas):
             plot_data_indexes = range(start_index, end_index)
             self.y[:, plot_data_indexes] = new_data
             self.last_plotted_column = plot_data_indexes[-1]
-            self._update_data()
+            self._update_data([(start_index, end_index)])
         else:
             #---- Visualize in the remaining plot space and cache leftover data
             plot_data_indexes = range(start_index, self.plot_window_sample_count)
@@ -243,7 +279,7 @@ class GenericPlot(app.Canvas):
                 self.y[:, plot_data_indexes] = new_data[:, from_data_index]
             except:
                 self.y[:, plot_data_indexes] = new_data[from_data_index]
-            self._update_data()
+            self._update_data([(start_index, self.plot_window_sample_count)])
 
             #---- Wrap the graph to the next window
             self._reset_data_plot_buffer()
@@ -258,27 +294,120 @@ class GenericPlot(app.Canvas):
                 except:
                     self.y[:, plot_data_indexes] = new_data[from_data_index]
                 self.last_plotted_column = plot_data_indexes[-1]
-                self._update_data()
+                self._update_data([(0, remaining_data_count)])
 
     #-----------------------------------------------------------------------
     #---- Helper Functions
     def _reset_data_plot_buffer(self):
         self.y = np.nan * np.zeros((self.m, self.n)).astype(np.float32)
         self.last_plotted_column = -1
-
-    def _update_data(self):
-        if not self.pause:
-            self.program['a_position'].set_data(self.y.ravel().astype(np.float32))
-            self.update()
+        self.full_upload_pending = True
+
+    def _update_data(self, columns=None):
+        """Send the plot buffer to the GPU: only the given (start, stop) column ranges in ring buffer mode"""
+        if self.pause:
+            self.full_upload_pending = True
+            return
+        if self.requested_bucket_size != self.bucket_size:
+            self._apply_level()
+        if not self.ring_buffer or columns is None or self.full_upload_pending:
+            positions = self._positions()
+            self.program['a_position'].set_data(positions.ravel())
+            self.upload_bytes += positions.size * 4
+            self.full_upload_pending = False
+        else:
+            for start, stop in columns:
+                if stop <= start:
+                    continue
+                if self.envelope is None:
+                    self._upload_columns(self.y, start, stop)
+                else:
+                    first, last = self.envelope.update(self.y, start, stop)
+                    self._upload_columns(self.envelope.vertices, 2 * first, 2 * last)
+        self.update()
+
+    def _upload_columns(self, positions, start, stop):
+        """Upload columns [start, stop) of each signal of an (m, vertices per signal) position array"""
+        buffer = self.program['a_position']
+        width = positions.shape[1]
+        for row in range(self.m):
+            buffer.set_subdata(positions[row, start:stop].reshape(-1, 1), offset=row * width + start)
+        self.upload_bytes += self.m * (stop - start) * 4
+
+    def _positions(self):
+        """Vertex y positions of the current level as an (m, vertices per signal) float32 array"""
+        if self.envelope is None:
+            return self.y.astype(np.float32)
+        self.envelope.rebuild(self.y)
+        return self.envelope.vertices
+
+    def _vertex_index(self, sample_index):
+        """(col, row, sample) index of every vertex for the given per-signal sample positions"""
+        count = len(sample_index)
+        return np.c_[np.repeat(np.repeat(np.arange(self.ncols), self.nrows), count),
+                     np.repeat(np.tile(np.arange(self.nrows), self.ncols), count),
+                     np.tile(sample_index, self.m)].astype(np.float32)
+
+    def _select_level(self, width):
+        """Request the bucket size matching the canvas width and horizontal zoom"""
+        if not self.level_of_detail or self.custom_layout:
+            self.requested_bucket_size = 1
+            return
+        zoom = float(self.program['u_scale'][0])
+        self.requested_bucket_size = choose_bucket_size(self.n, width, zoom)
+
+    def _apply_level(self):
+        """Rebuild the vertex attributes for the requested bucket size"""
+        self.bucket_size = self.requested_bucket_size
+        if self.bucket_size > 1:
+            self.envelope = MinMaxEnvelope(self.m, self.n, self.bucket_size)
+            sample_index = self.envelope.sample_index()
+        else:
+            self.envelope = None
+            sample_index = np.arange(self.n)
+        positions = self._positions()
+        self.program['a_position'] = positions.reshape(-1, 1)
+        self.program['a_color'] = np.repeat(self.channel_colors, len(sample_index), axis=0)
+        self.program['a_index'] = self._vertex_index(sample_index)
+        self.upload_bytes += positions.size * 4
+        self.full_upload_pending = False
+
+    def mark_uploaded(self, polled):
+        """Record that the packet polled at `polled` (perf_counter) is in the plot buffers, timed at the next draw"""
+        if polled is not None:
+            self._uploaded.append((polled, time.perf_counter()))
+
+    def plot_metrics(self):
+        """Upload rate (bytes/s) and mean frame time (ms) of the recent draws"""
+        now = time.perf_counter()
+        sample_time, sample_bytes = self._rate_sample
+        if now - sample_time >= 0.5:
+            self._upload_rate = (self.upload_bytes - sample_bytes) / (now - sample_time)
+            self._rate_sample = (now, self.upload_bytes)
+        frame_times = list(self.frame_times)
+        frame_time = sum(frame_times) / len(frame_times) * 1e3 if frame_times else 0.0
+        return {'upload_bytes_per_s': self._upload_rate, 'frame_time_ms': frame_time}
 
     def on_draw(self, event):
+        now = time.perf_counter()
+        if self._last_draw is not None:
+            self.frame_times.append(now - self._last_draw)
+        self._last_draw = now
         if self.is_initialized:
             gloo.clear()
             self.program.draw('line_strip')
+            instrumentation = self.instrumentation
+            drawn = time.perf_counter()
+            while self._uploaded:
+                polled, uploaded = self._uploaded.popleft()
+                if instrumentation is not None:
+                    instrumentation.record('draw', drawn - uploaded)
+                    instrumentation.record('end_to_end', drawn - polled)
 
     def set_scaling(self, x_int, y_int):
         if self.is_initialized:
             self.program['u_scale'] = (float(x_int), float(y_int))
+            self._select_level(self.physical_size[0])
 
     def set_interactive(self, flag):
         self.plot_interact_flag = flag
@@ -0,0 +1,58 @@
+"""
+Min/max level of detail for the live plot.
+
+A plot window holds far more samples per channel than the canvas has pixel columns. MinMaxEnvelope reduces each
+channel of the (m, n) plot buffer to buckets of bucket_size samples and keeps the minimum and maximum of each
+bucket. Drawn as a line strip (min, max, min, max, ...) the envelope looks the same as the raw trace at that zoom
+level, spikes included, with 2 vertices per bucket instead of one per sample. Buckets are updated incrementally:
+only the buckets overlapping newly written columns are recomputed.
+"""
+import math
+
+import numpy as np
+
+
+def choose_bucket_size(samples, pixels, zoom=1.0):
+    """Power of two bucket size giving at least one bucket per visible pixel column (1 = draw raw samples)"""
+    samples_per_pixel = samples / max(1.0, pixels * max(1.0, zoom))
+    if samples_per_pixel < 2:
+        return 1
+    return 2 ** int(math.floor(math.log2(samples_per_pixel)))
+
+
+class MinMaxEnvelope():
+    def __init__(self, channels, samples, bucket_size):
+        self.channels = channels
+        self.samples = samples
+        self.bucket_size = bucket_size
+        self.buckets = -(-samples // bucket_size)
+        self.vertices = np.full((channels, 2 * self.buckets), np.nan, dtype=np.float32)
+
+    @property
+    def vertex_count(self):
+        """Vertices per channel"""
+        return 2 * self.buckets
+
+    def sample_index(self):
+        """Sample position of each vertex of a channel (both vertices of a bucket sit at its first sample)"""
+        return np.repeat(np.arange(self.buckets) * self.bucket_size, 2)
+
+    def update(self, y, start, stop):
+        """Recompute the buckets overlapping columns [start, stop) of y. Returns the (first, last) bucket range"""
+        first = start // self.bucket_size
+        last = min(self.buckets, -(-stop // self.bucket_size))
+        if last <= first:
+            return first, first
+        block = y[:, first * self.bucket_size:min(last * self.bucket_size, self.samples)]
+        padding = (last - first) * self.bucket_size - block.shape[1]
+        if padding:
+            block = np.concatenate((block, np.full((self.channels, padding), np.nan, dtype=block.dtype)), axis=1)
+        block = block.reshape(self.channels, last - first, self.bucket_size)
+        # fmin/fmax skip NaN (not yet plotted samples) unless the whole bucket is empty
+        pairs = self.vertices.reshape(self.channels, self.buckets, 2)
+        pairs[:, first:last, 0] = np.fmin.reduce(block, axis=2)
+        pairs[:, first:last, 1] = np.fmax.reduce(block, axis=2)
+        return first, last
+
+    def rebuild(self, y):
+        self.update(y, 0, self.samples)
@@ -0,0 +1,71 @@
+"""
+Vectorized multi-rate resampling for the live plot.
+
+GenericPlot draws every channel on a common sample grid (the fastest channel in the frame). resample_frame()
+brings a whole frame to that grid in one pass: slower channels are linearly interpolated towards the first
+sample of the next frame, longer channels are decimated with an evenly spaced index map. The interpolation
+weights and index maps only depend on (input length, output length), so they are computed once and cached.
+Output is deterministic.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=256)
+def interpolation_map(n_in, n_out):
+    """Left sample index and weight of the right sample for stretching n_in samples to n_out.
+
+    Input sample j sits at output position j * n_out / n_in; position n_out is the next frame's first sample."""
+    positions = np.arange(n_out) * (n_in / n_out)
+    left = np.floor(positions).astype(np.intp)
+    weight = (positions - left).astype(np.float32)
+    left.setflags(write=False)
+    weight.setflags(write=False)
+    return left, weight
+
+
+@lru_cache(maxsize=256)
+def decimation_map(n_in, n_out):
+    """Evenly spaced indexes that pick n_out of n_in samples (first and last kept)"""
+    index = np.round(np.linspace(0, n_in - 1, n_out)).astype(np.intp)
+    index.setflags(write=False)
+    return index
+
+
+def resample_frame(data_frame, next_val, out_len=None):
+    """
+    Resample a jagged frame (list of per-channel arrays) to an (m, out_len) float32 array.
+
+    Parameters:
+    -----------
+    data_frame : list of array-like
+        Samples of each channel for this frame
+    next_val : list of float
+        First sample of each channel in the next frame (interpolation target past the last sample)
+    out_len : int
+        Output length, defaults to the longest channel
+    """
+    lengths = [len(chan) for chan in data_frame]
+    if out_len is None:
+        out_len = max(lengths)
+    out = np.empty((len(data_frame), out_len), dtype=np.float32)
+
+    # Channels with the same length share one index map, so each group is resampled in a single operation
+    groups = {}
+    for i, length in enumerate(lengths):
+        groups.setdefault(length, []).append(i)
+
+    for length, rows in groups.items():
+        block = np.asarray([data_frame[i] for i in rows], dtype=np.float32).reshape(len(rows), length)
+        if length == out_len:
+            out[rows] = block
+        elif length == 0:
+            out[rows] = np.asarray([next_val[i] for i in rows], dtype=np.float32)[:, None]
+        elif length < out_len:
+            left, weight = interpolation_map(length, out_len)
+            extended = np.concatenate((block, np.asarray([[next_val[i]] for i in rows], dtype=np.float32)), axis=1)
+            out[rows] = extended[:, left] * (1 - weight) + extended[:, left + 1] * weight
+        else:
+            out[rows] = block[:, decimation_map(length, out_len)]
+    return out
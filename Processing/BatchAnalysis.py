@@ -0,0 +1,259 @@
+"""
+Batch offline analysis of exported sessions.
+
+Finds the session CSVs of a directory (MMDDYY_TraqID_FirstLast_sessiontype.csv, see FilenameGeneratorDialog),
+runs the EMG pipeline on each one and writes one summary table with a row per throw and EMG channel:
+
+    EmgProcessor    bandpass + notch, rectification, RMS envelope (the same filters as during collection)
+    ThrowDetector   throws from the ACC magnitude and the envelopes
+    per throw       peak and mean envelope between throw onset and end, muscle onset (first envelope sample above
+                    onset_fraction of the throw peak, from pre_onset seconds before the throw) and time to peak,
+                    both in ms relative to the throw onset
+
+Sessions run on a process pool. Rows are appended to the summary as sessions finish and a manifest next to it
+records each processed file (size, modification time), so an interrupted or repeated run only processes new or
+changed files. The file column holds the path relative to the directory (subdirectories with --recursive), which
+also keys the manifest. Sessions without throws get one row with empty throw fields. When a session file (.tsf)
+with the same name exists it is read instead of the CSV.
+
+Run from the project root:
+    python -m Processing.BatchAnalysis <directory> [--output summary.csv] [--workers N] [--recursive] [--rerun]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from Export.CsvLoader import load_csv
+from Export.SessionCatalog import find_sessions, parse_session_filename
+from Export.SessionFile import EXTENSION as SESSION_EXTENSION
+from Export.SessionFile import SessionFile
+from Processing.EmgProcessor import EmgProcessor
+from Processing.ThrowDetector import ThrowDetector
+
+ANALYSIS_VERSION = 3        # Bump when the results change: a resumed run then processes every file again
+SUMMARY_NAME = "emg_summary.csv"
+COLUMNS = ['file', 'date', 'traq_id', 'athlete', 'session_type', 'session_duration_s', 'throw', 'onset_s', 'end_s',
+           'throw_duration_s', 'peak_acc_g', 'sensor', 'channel', 'peak_envelope', 'mean_envelope', 'emg_onset_ms',
+           'time_to_peak_ms']
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def _load_session(path):
+    """channel_info and value arrays of a session, from its .tsf when there is one"""
+    session_path = os.path.splitext(path)[0] + SESSION_EXTENSION
+    if os.path.exists(session_path):
+        with SessionFile(session_path) as session:
+            return session.channels, [np.asarray(session.channel(i)) for i in range(len(session))]
+    channel_info, values, _, _ = load_csv(path)
+    return channel_info, values
+
+
+def analyze_session(channel_info, values, onset_fraction=0.2, pre_onset=0.5):
+    """
+    Throws and per-throw EMG measures of one session.
+
+    Parameters:
+    -----------
+    channel_info : list of dict
+        Per-channel metadata (name, type, sample_rate, sensor pair number/name, muscle)
+    values : list of array
+        Samples of each channel
+    onset_fraction : float
+        Muscle onset threshold, as a fraction of the envelope peak during the throw
+    pre_onset : float
+        Seconds before the throw onset searched for the muscle onset
+
+    Returns:
+    --------
+    tuple
+        (session duration in seconds, list of row dicts with the throw and channel columns of the summary)
+    """
+    channels = [(str(k), float(info['sample_rate']), str(info.get('type') or info['name'].split()[0]).upper())
+                for k, info in enumerate(channel_info)]
+    processor = EmgProcessor()
+    processor.configure(channels)
+    detector = ThrowDetector()
+    detector.configure(channels, list(zip(processor.channel_guids, processor.channel_rates)))
+    envelopes = processor.process(values)
+    detector.process(values, envelopes)
+    detector.flush()
+    duration = max((len(v) / rate for v, (_, rate, _) in zip(values, channels) if rate > 0), default=0.0)
+
+    emg_rows = [row for row, (_, _, ch_type) in enumerate(channels) if ch_type == 'EMG']
+    rows = []
+    for throw in detector.throws:
+        for k, row in enumerate(emg_rows):
+            info = channel_info[row]
+            rate = channels[row][1]
+            envelope = envelopes[k]
+            onset = min(throw['onset_samples'][row], len(envelope))
+            end = min(max(throw['end_samples'][row], onset + 1), len(envelope))
+            segment = envelope[onset:end]
+            fields = {
+                'throw': throw['throw'], 'onset_s': round(throw['onset_time'], 4),
+                'end_s': round(throw['end_time'], 4), 'throw_duration_s': round(throw['duration'], 4),
+                'peak_acc_g': round(throw['peak_acc'], 4), 'sensor': _sensor_label(info), 'channel': info['name'],
+            }
+            if segment.size:
+                peak = float(segment.max())
+                search = envelope[max(0, onset - int(round(pre_onset * rate))):end]
+                first = int(np.argmax(search >= onset_fraction * peak))
+                fields.update({
+                    'peak_envelope': round(peak, 6), 'mean_envelope': round(float(segment.mean()), 6),
+                    'emg_onset_ms': round((max(0, onset - int(round(pre_onset * rate))) + first - onset)
+                                          / rate * 1000.0, 1),
+                    'time_to_peak_ms': round(int(np.argmax(segment)) / rate * 1000.0, 1),
+                })
+            rows.append(fields)
+    return duration, rows
+
+
+def _sensor_label(info):
+    name = info.get('muscle') or info.get('sensor_name', "")
+    return f"({info['pair_number']}) {name}" if 'pair_number' in info else name
+
+
+def analyze_file(path, onset_fraction=0.2, pre_onset=0.5, name=None):
+    """Summary rows of one session file, name in the file column (default: the file name). Runs in the worker
+    processes"""
+    channel_info, values = _load_session(path)
+    duration, throw_rows = analyze_session(channel_info, values, onset_fraction, pre_onset)
+    session = dict(parse_session_filename(path), file=name or os.path.basename(path),
+                   session_duration_s=round(duration, 4))
+    return [dict(session, **fields) for fields in throw_rows] or [session]
+
+
+class BatchAnalysis():
+    def __init__(self, directory, output=None, workers=None, recursive=False, onset_fraction=0.2, pre_onset=0.5):
+        """
+        Parameters:
+        -----------
+        directory : str
+            Session directory (CsvWriter.output_directory)
+        output : str
+            Summary table, defaults to emg_summary.csv in the directory. The manifest is <output>.json
+        workers : int
+            Worker processes, defaults to the number of CPUs. 1 runs in this process
+        """
+        self.directory = directory
+        self.output = output or os.path.join(directory, SUMMARY_NAME)
+        self.manifest_path = self.output + ".json"
+        self.workers = workers or os.cpu_count() or 1
+        self.recursive = recursive
+        self.onset_fraction = onset_fraction
+        self.pre_onset = pre_onset
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.output):
+            return {}
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        return manifest.get('files', {}) if manifest.get('version') == ANALYSIS_VERSION else {}
+
+    def _save_manifest(self, files):
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'version': ANALYSIS_VERSION, 'files': files}, f)
+        os.replace(temporary, self.manifest_path)
+
+    def run(self, rerun=False):
+        """
+        Analyze the new and changed sessions (every session with rerun=True) and update the summary.
+
+        Returns:
+        --------
+        dict
+            processed, skipped and failed file counts, and the elapsed time
+        """
+        start = time.perf_counter()
+        # The summary and manifest may be written inside the directory (the default, or --output)
+        sessions = find_sessions(self.directory, self.recursive, exclude=(self.output, self.manifest_path))
+        done = {} if rerun else self._load_manifest()
+        signatures = {path: _signature(path) for path in sessions}
+        keys = {path: os.path.relpath(path, self.directory) for path in sessions}
+        pending = [path for path in sessions if done.get(keys[path]) != signatures[path]]
+        # Rows of sessions processed again (or removed) are dropped, the others are kept as they are
+        kept = set(keys[path] for path in sessions) - set(keys[path] for path in pending)
+        done = {key: signature for key, signature in done.items() if key in kept}
+        self._rewrite_summary(set(done))
+
+        failed = 0
+        with open(self.output, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            for path, rows, error in self._results(pending, keys):
+                if error is not None:
+                    print(f"Error analyzing {path}: {error}")
+                    failed += 1
+                    continue
+                writer.writerows(rows)
+                f.flush()
+                done[keys[path]] = signatures[path]
+                self._save_manifest(done)
+        self._save_manifest(done)
+        return {'processed': len(pending) - failed, 'skipped': len(sessions) - len(pending), 'failed': failed,
+                'seconds': time.perf_counter() - start}
+
+    def _rewrite_summary(self, keep_files):
+        """Summary with only the rows of keep_files (paths relative to the directory, as in the file column; a new
+        file with the header row when there is none)"""
+        rows = []
+        if keep_files and os.path.exists(self.output):
+            with open(self.output, newline='') as f:
+                rows = [row for row in csv.DictReader(f) if row.get('file') in keep_files]
+        temporary = self.output + ".tmp"
+        with open(temporary, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temporary, self.output)
+
+    def _results(self, paths, names):
+        """(path, rows, error) of every path, as the sessions finish. names: file column of each path"""
+        options = (self.onset_fraction, self.pre_onset)
+        if self.workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    yield path, analyze_file(path, *options, names[path]), None
+                except Exception as e:
+                    yield path, None, e
+            return
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(paths))) as pool:
+            futures = {pool.submit(analyze_file, path, *options, names[path]): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EMG analysis of every session CSV in a directory")
+    parser.add_argument('directory', help="session directory (CsvWriter output directory)")
+    parser.add_argument('--output', help=f"summary table (default: {SUMMARY_NAME} in the directory)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--recursive', action='store_true', help="include subdirectories")
+    parser.add_argument('--rerun', action='store_true', help="process every session, not only new or changed ones")
+    parser.add_argument('--onset-fraction', type=float, default=0.2,
+                        help="muscle onset threshold as a fraction of the throw's envelope peak")
+    parser.add_argument('--pre-onset', type=float, default=0.5,
+                        help="seconds before the throw onset searched for the muscle onset")
+    args = parser.parse_args(argv)
+    batch = BatchAnalysis(args.directory, args.output, args.workers, args.recursive, args.onset_fraction,
+                          args.pre_onset)
+    result = batch.run(rerun=args.rerun)
+    print(f"{result['processed']} sessions analyzed, {result['skipped']} unchanged, {result['failed']} failed "
+          f"in {result['seconds']:.1f} s -> {batch.output}")
+    return result
+
+
+if __name__ == '__main__':
+    main()
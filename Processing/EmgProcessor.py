@@ -0,0 +1,196 @@
+"""
+Streaming EMG processing: bandpass + notch filter, full-wave rectification and a moving RMS (or low-pass linear)
+envelope.
+
+EmgProcessor runs on the acquisition thread, once per packet, between DataKernel.processData and the consumers.
+Filter state (sosfilt zi) and the envelope window tail are carried over between packets per channel GUID, so the
+output of a session processed packet by packet equals processing it in one block. Channels with the same sample
+rate share one filter design and are filtered together in a single sosfilt call; the RMS window is a running sum,
+so the cost per packet is proportional to the packet length, not to the window length.
+
+Use Example:
+processor = EmgProcessor(bandpass=(20, 450), notch=60, envelope='rms', envelope_window=0.05)
+processor.configure([(guid, sample_rate, 'EMG'), ...])      # Channel order of the DataKernel packets
+envelopes = processor.process(packet)                       # One envelope array per EMG channel
+"""
+import numpy as np
+
+
+def _signal():
+    """scipy.signal, imported on first use: it takes about a second to import, which would delay application startup"""
+    from scipy import signal
+    return signal
+
+
+class _RateGroup():
+    """EMG channels sharing a sample rate: one filter design, stacked per channel state"""
+
+    def __init__(self, sample_rate, rows, guids, sos, window, envelope_sos):
+        self.sample_rate = sample_rate
+        self.rows = rows                    # Channel positions in the packet
+        self.guids = guids
+        self.outputs = []                   # Positions in EmgProcessor.channel_guids
+        self.sos = sos
+        self.window = window                # RMS window in samples
+        self.envelope_sos = envelope_sos    # Low-pass for the linear envelope (None for RMS)
+        self.reset()
+
+    def reset(self):
+        count = len(self.rows)
+        self.zi = None                      # (sections, channels, 2), set from the first samples
+        self.envelope_zi = None
+        self.started = np.zeros(count, dtype=bool)      # Channels whose state was set from their first sample
+        self.tail = np.zeros((count, self.window - 1))  # Last squared samples of the previous packets
+
+    def _initial_state(self, state, sos, first, new):
+        """Filter state with the channels of the new mask starting from their first samples"""
+        if state is None:
+            state = np.zeros((sos.shape[0], len(new), 2))
+        state[:, new, :] = _signal().sosfilt_zi(sos)[:, None, :] * first[None, new, None]
+        return state
+
+    def process(self, block):
+        """Filter, rectify and envelope a (channels, samples) block"""
+        new = ~self.started
+        if new.any():
+            self.zi = self._initial_state(self.zi, self.sos, block[:, 0], new)
+        filtered, self.zi = _signal().sosfilt(self.sos, block, axis=-1, zi=self.zi)
+        rectified = np.abs(filtered)
+        if self.envelope_sos is not None:
+            if new.any():
+                self.envelope_zi = self._initial_state(self.envelope_zi, self.envelope_sos, rectified[:, 0], new)
+            self.started[:] = True
+            envelope, self.envelope_zi = _signal().sosfilt(self.envelope_sos, rectified, axis=-1, zi=self.envelope_zi)
+            return envelope
+        self.started[:] = True
+        squared = np.concatenate((self.tail, rectified * rectified), axis=1)
+        running = np.zeros((squared.shape[0], squared.shape[1] + 1))
+        np.cumsum(squared, axis=1, out=running[:, 1:])
+        sums = running[:, self.window:] - running[:, :-self.window]
+        if self.window > 1:
+            self.tail = squared[:, -(self.window - 1):]
+        return np.sqrt(np.maximum(sums, 0.0) / self.window)
+
+    def process_channel(self, k, samples):
+        """Process one channel of the group on its own (packet lengths differ within the group). The channel's state
+        starts from its own first sample, as in process()"""
+        count = len(self.rows)
+        if self.zi is None:
+            self.zi = np.zeros((self.sos.shape[0], count, 2))
+        if self.envelope_sos is not None and self.envelope_zi is None:
+            self.envelope_zi = np.zeros((self.envelope_sos.shape[0], count, 2))
+        saved = (self.zi, self.envelope_zi, self.tail, self.started)
+        self.zi = saved[0][:, k:k + 1, :].copy()
+        self.envelope_zi = None if saved[1] is None else saved[1][:, k:k + 1, :].copy()
+        self.tail = saved[2][k:k + 1]
+        self.started = saved[3][k:k + 1].copy()
+        envelope = self.process(samples[None, :])[0]
+        saved[0][:, k:k + 1, :] = self.zi
+        if saved[1] is not None:
+            saved[1][:, k:k + 1, :] = self.envelope_zi
+        if self.window > 1:
+            saved[2][k] = self.tail[0]
+        saved[3][k] = self.started[0]
+        self.zi, self.envelope_zi, self.tail, self.started = saved
+        return envelope
+
+
+class EmgProcessor():
+    def __init__(self, bandpass=(20.0, 450.0), notch=60.0, notch_quality=30.0, order=4,
+                 envelope='rms', envelope_window=0.05, envelope_cutoff=6.0):
+        """
+        Parameters:
+        -----------
+        bandpass : tuple of float
+            Bandpass corner frequencies (Hz). The upper corner is capped below Nyquist
+        notch : float
+            Power line frequency to notch out (Hz), None to disable
+        envelope : str
+            'rms' for a moving RMS over envelope_window seconds, 'linear' for a low-pass (envelope_cutoff Hz)
+            of the rectified signal
+        """
+        if envelope not in ('rms', 'linear'):
+            raise ValueError("envelope must be 'rms' or 'linear'")
+        self.bandpass = bandpass
+        self.notch = notch
+        self.notch_quality = notch_quality
+        self.order = order
+        self.envelope = envelope
+        self.envelope_window = envelope_window
+        self.envelope_cutoff = envelope_cutoff
+        self.groups = []
+        self.channel_guids = []     # Processed (EMG) channels, in envelope output order
+        self.channel_rates = []
+
+    def design(self, sample_rate):
+        """Second-order sections of the bandpass (and notch) filter for a sample rate"""
+        nyquist = sample_rate / 2.0
+        low, high = self.bandpass
+        high = min(high, 0.95 * nyquist)
+        sos = _signal().butter(self.order, [low, high], btype='bandpass', fs=sample_rate, output='sos')
+        if self.notch and self.notch < nyquist:
+            b, a = _signal().iirnotch(self.notch, self.notch_quality, fs=sample_rate)
+            sos = np.vstack((sos, _signal().tf2sos(b, a)))
+        return sos
+
+    def configure(self, channels):
+        """
+        Set up filters and state for a channel layout.
+
+        Parameters:
+        -----------
+        channels : list of tuple
+            (guid, sample_rate, channel type) for every channel of a DataKernel packet, in packet order.
+            Only 'EMG' channels are processed
+        """
+        by_rate = {}
+        self.channel_guids = []
+        self.channel_rates = []
+        for row, (guid, sample_rate, ch_type) in enumerate(channels):
+            if str(ch_type).upper() != 'EMG':
+                continue
+            rate = round(float(sample_rate), 4)
+            by_rate.setdefault(rate, []).append((row, guid, len(self.channel_guids)))
+            self.channel_guids.append(guid)
+            self.channel_rates.append(float(sample_rate))
+
+        self.groups = []
+        for rate, members in by_rate.items():
+            envelope_sos = None
+            if self.envelope == 'linear':
+                envelope_sos = _signal().butter(2, self.envelope_cutoff, btype='lowpass', fs=rate, output='sos')
+            window = max(1, int(round(self.envelope_window * rate)))
+            group = _RateGroup(rate, [m[0] for m in members], [m[1] for m in members], self.design(rate), window,
+                               envelope_sos)
+            group.outputs = [m[2] for m in members]
+            self.groups.append(group)
+
+    def reset(self):
+        """Clear the filter and envelope state (new collection on the same layout)"""
+        for group in self.groups:
+            group.reset()
+
+    def state(self, guid):
+        """Carried-over sosfilt state (sections, 2) of a channel, None before its first packet"""
+        for group in self.groups:
+            if guid in group.guids and group.started[group.guids.index(guid)]:
+                return group.zi[:, group.guids.index(guid), :]
+        return None
+
+    def process(self, channel_values):
+        """Envelope of each EMG channel of a packet (list of per-channel arrays), in channel_guids order"""
+        envelopes = [None] * len(self.channel_guids)
+        for group in self.groups:
+            samples = [np.asarray(channel_values[row], dtype=np.float64) for row in group.rows]
+            lengths = set(len(s) for s in samples)
+            if lengths == {0}:
+                for out in group.outputs:
+                    envelopes[out] = np.zeros(0)
+            elif len(lengths) == 1:
+                block = group.process(np.vstack(samples))
+                for k, out in enumerate(group.outputs):
+                    envelopes[out] = block[k]
+            else:
+                for k, out in enumerate(group.outputs):
+                    envelopes[out] = group.process_channel(k, samples[k]) if len(samples[k]) else np.zeros(0)
+        return envelopes
@@ -0,0 +1,305 @@
+"""
+Online throw detection on the ACC magnitude and the EMG envelope.
+
+ThrowDetector runs on the acquisition thread after EmgProcessor, once per packet. Every stream is max-pooled onto
+a common detection grid (by default the slowest stream, i.e. one frame per ACC sample) and each frame is scored:
+
+    ACC      | |a| - gravity |  per sensor (x, y, z triad), max over sensors. All-zero samples (dropouts) score 0
+    EMG      EmgProcessor envelope, max over EMG channels
+
+A throw starts when a frame reaches the on threshold and ends at the first frame below the off threshold
+(hysteresis). Throws shorter than min_duration and onsets within refractory seconds of the previous throw end are
+ignored. Pooling and thresholding are vectorized; the state machine only loops over threshold crossings, so the
+cost per packet is bounded by the packet length.
+
+Channels of one rate are evaluated over the samples all of them have received. A channel that falls more than
+stall seconds behind the others (sensor dropout, dead battery) is padded with zeros up to them, so detection goes
+on with the remaining sensors and the samples carried over stay bounded; when it delivers again its samples
+continue from the padded position. Streams of different rates are padded the same way on the detection grid.
+
+Use Example:
+detector = ThrowDetector(acc_on=1.0, acc_off=0.3, emg_on=1.0, emg_off=0.3)
+detector.configure([(guid, sample_rate, 'ACC'), ...], [(guid, sample_rate), ...])  # Packet channels, envelopes
+new_throws = detector.process(packet, envelopes)
+detector.throws     # [{'throw', 'onset_time', 'end_time', 'onset_samples', 'end_samples', ...}]
+"""
+import math
+
+import numpy as np
+
+
+class _PooledStream():
+    """Max of a stream's samples per detection frame. Samples of the frame still being filled are carried over"""
+
+    def __init__(self, sample_rate, frame_rate):
+        self.sample_rate = float(sample_rate)
+        self.frame_rate = float(frame_rate)
+        self.reset()
+
+    def reset(self):
+        self.count = 0                      # Samples received (or skipped by pad)
+        self.produced = 0                   # Frames completed (or padded)
+        self.pending = np.zeros(0)          # Samples of the open frame
+        self.frames = np.zeros(0)           # Completed frames not consumed yet
+
+    def push(self, values):
+        values = np.concatenate((self.pending, values))
+        first = self.count - len(self.pending)
+        self.count += len(values) - len(self.pending)
+        # Frame of every sample, frames before the one of the next (future) sample are complete. The tolerance keeps
+        # index * rate / rate from truncating to the previous frame (a stream at the grid rate maps 1:1)
+        ratio = self.frame_rate / self.sample_rate
+        frame_ids = np.floor((first + np.arange(len(values))) * ratio + 1e-9).astype(np.int64)
+        complete = int(math.floor(self.count * ratio + 1e-9))
+        done = int(np.searchsorted(frame_ids, complete))
+        if done:
+            starts = np.flatnonzero(np.diff(frame_ids[:done], prepend=-1))
+            self.frames = np.concatenate((self.frames, np.maximum.reduceat(values[:done], starts)))
+            self.produced += len(starts)
+        self.pending = values[done:]
+
+    def pad(self, frames):
+        """Append zero frames for a stalled stream, its next sample starts the frame after them"""
+        self.frames = np.concatenate((self.frames, np.zeros(frames)))
+        self.produced += frames
+        self.count = int(math.ceil(self.produced * self.sample_rate / self.frame_rate - 1e-9))
+        self.pending = np.zeros(0)
+
+    def take(self, count):
+        taken, self.frames = self.frames[:count], self.frames[count:]
+        return taken
+
+
+class _AlignedRows():
+    """Channels of one sample rate: returns the samples all of them have received as a (channels, samples) block,
+    the rest is carried over to the next packet. Channels more than max_lag samples behind the longest one are
+    zero padded up to it"""
+
+    def __init__(self, rows, max_lag):
+        self.rows = rows                    # Positions in the packet (or in the envelope list)
+        self.max_lag = max_lag
+        self.reset()
+
+    def reset(self):
+        self.carry = [np.zeros(0)] * len(self.rows)
+
+    def push(self, channel_values):
+        values = [np.concatenate((carry, np.asarray(channel_values[row], dtype=np.float64)))
+                  if len(carry) else np.asarray(channel_values[row], dtype=np.float64)
+                  for carry, row in zip(self.carry, self.rows)]
+        longest = max(len(v) for v in values)
+        if longest - min(len(v) for v in values) > self.max_lag:
+            values = [v if longest - len(v) <= self.max_lag else np.concatenate((v, np.zeros(longest - len(v))))
+                      for v in values]
+        length = min(len(v) for v in values)
+        self.carry = [v[length:] for v in values]
+        return np.vstack([v[:length] for v in values])
+
+
+class ThrowDetector():
+    def __init__(self, acc_on=1.0, acc_off=0.3, emg_on=1.0, emg_off=0.3, require='any', gravity=1.0,
+                 min_duration=0.05, refractory=1.0, frame_rate=None, stall=0.25):
+        """
+        Parameters:
+        -----------
+        acc_on, acc_off : float
+            Dynamic acceleration (g) starting / ending a throw, None to ignore the ACC channels
+        emg_on, emg_off : float
+            EMG envelope (sensor units) starting / ending a throw, None to ignore the envelopes
+        require : str
+            'any' starts a throw when the ACC or the EMG reaches its on threshold, 'all' when both do
+        min_duration, refractory : float
+            Shortest throw, and minimum time between a throw end and the next onset (seconds)
+        frame_rate : float
+            Detection grid (Hz), defaults to (and is capped at) the slowest configured stream
+        stall : float
+            Seconds a channel may fall behind the others before it is zero padded (stalled sensor)
+        """
+        if require not in ('any', 'all'):
+            raise ValueError("require must be 'any' or 'all'")
+        self.acc_on = acc_on
+        self.acc_off = acc_off
+        self.emg_on = emg_on
+        self.emg_off = emg_off
+        self.require = require
+        self.gravity = gravity
+        self.min_duration = min_duration
+        self.refractory = refractory
+        self.frame_rate = frame_rate
+        self.stall = stall
+        self.grid_rate = None
+        self.clock = None
+        self.channel_guids = []     # Every packet channel, for the per-channel sample indices of a throw
+        self.channel_rates = []
+        self.acc_triads = []        # Packet rows of the x, y, z channels of each accelerometer
+        self.acc_groups = []        # (_AlignedRows, _PooledStream) per ACC sample rate, rows in x, y, z order
+        self.emg_groups = []        # (_AlignedRows, _PooledStream) per envelope sample rate
+        self.throws = []
+        self.reset()
+
+    def configure(self, channels, envelope_channels=(), clock=None):
+        """
+        Set up the streams for a channel layout.
+
+        Parameters:
+        -----------
+        channels : list of tuple
+            (guid, sample_rate, channel type) for every channel of a DataKernel packet, in packet order.
+            Consecutive 'ACC' channels are grouped in threes (x, y, z of one sensor)
+        envelope_channels : list of tuple
+            (guid, sample_rate) of the EmgProcessor envelopes, in envelope order
+        clock : SampleClock
+            Session clock of the packet channels, used for the onset/end sample index of every channel
+        """
+        self.clock = clock
+        self.channel_guids = [guid for guid, _, _ in channels]
+        self.channel_rates = [float(rate) for _, rate, _ in channels]
+        self.acc_triads = []
+        axes = []
+        for row, (guid, rate, ch_type) in enumerate(channels):
+            if str(ch_type).upper() != 'ACC':
+                axes = []
+                continue
+            axes.append(row)
+            if len(axes) == 3:
+                self.acc_triads.append(axes)
+                axes = []
+        if self.acc_on is None:
+            self.acc_triads = []
+        envelope_rates = [float(rate) for _, rate in envelope_channels] if self.emg_on is not None else []
+        acc_rates = {}
+        for triad in self.acc_triads:
+            acc_rates.setdefault(round(self.channel_rates[triad[0]], 4), []).extend(triad)
+        emg_rates = {}
+        for k, rate in enumerate(envelope_rates):
+            emg_rates.setdefault(round(rate, 4), []).append(k)
+        rates = list(acc_rates) + list(emg_rates)
+        # Every frame needs at least one sample of every stream: the grid is never faster than the slowest stream
+        slowest = min(rates) if rates else 100.0
+        self.grid_rate = float(min(self.frame_rate, slowest) if self.frame_rate else slowest)
+        # Channels of one rate are pooled together: max over sensors first, then max per frame
+        self.acc_groups = [(_AlignedRows(rows, int(self.stall * rate)), _PooledStream(rate, self.grid_rate))
+                           for rate, rows in acc_rates.items()]
+        self.emg_groups = [(_AlignedRows(rows, int(self.stall * rate)), _PooledStream(rate, self.grid_rate))
+                           for rate, rows in emg_rates.items()]
+        self.reset()
+
+    def reset(self):
+        """Forget throws and detection state (new collection on the same layout)"""
+        for rows, stream in self.acc_groups + self.emg_groups:
+            rows.reset()
+            stream.reset()
+        self.frames = 0             # Detection frames evaluated
+        self.active = False
+        self.onset = 0
+        self.last_end = None
+        self.peak_acc = 0.0
+        self.peak_emg = 0.0
+        self.throws = []
+
+    def process(self, channel_values, envelopes=()):
+        """Add a packet (list of per-channel arrays) and its envelopes. Returns the throws that ended in it"""
+        for rows, stream in self.acc_groups:
+            block = rows.push(channel_values)
+            if block.shape[1] == 0:
+                continue
+            xyz = block.reshape(-1, 3, block.shape[1])
+            magnitude = np.sqrt(np.einsum('sij,sij->sj', xyz, xyz))
+            stream.push(np.where(magnitude > 0, np.abs(magnitude - self.gravity), 0.0).max(axis=0))
+        for rows, stream in self.emg_groups:
+            block = rows.push(envelopes)
+            if block.shape[1]:
+                stream.push(block.max(axis=0))
+
+        groups = self.acc_groups + self.emg_groups
+        if not groups:
+            return []
+        # A stream of another rate that stalled is padded like a stalled channel
+        lead = max(len(stream.frames) for _, stream in groups)
+        for _, stream in groups:
+            if lead - len(stream.frames) > self.stall * self.grid_rate:
+                stream.pad(lead - len(stream.frames))
+        count = min(len(stream.frames) for _, stream in groups)
+        if count == 0:
+            return []
+        acc = np.zeros(count)
+        for _, stream in self.acc_groups:
+            np.maximum(acc, stream.take(count), out=acc)
+        emg = np.zeros(count)
+        for _, stream in self.emg_groups:
+            np.maximum(emg, stream.take(count), out=emg)
+        return self._detect(acc, emg)
+
+    def _detect(self, acc, emg):
+        """Hysteresis over a block of frames: +1 where a throw can start, -1 where an active throw ends"""
+        starts, stops = [], []
+        if self.acc_groups:
+            starts.append(acc >= self.acc_on)
+            stops.append(acc < self.acc_off)
+        if self.emg_groups:
+            starts.append(emg >= self.emg_on)
+            stops.append(emg < self.emg_off)
+        on = np.logical_or.reduce(starts) if self.require == 'any' else np.logical_and.reduce(starts)
+        off = np.logical_and.reduce(stops)
+        level = np.where(on, 1, np.where(off, -1, 0))
+
+        first = self.frames
+        self.frames += len(level)
+        ended = []
+        position = 0
+        while position < len(level):
+            # Next frame that changes the state: an onset while idle, an end while active
+            candidates = np.flatnonzero(level[position:] == (-1 if self.active else 1))
+            if len(candidates) == 0:
+                break
+            index = position + int(candidates[0])
+            if self.active:
+                self.peak_acc = max(self.peak_acc, float(acc[position:index].max(initial=0.0)))
+                self.peak_emg = max(self.peak_emg, float(emg[position:index].max(initial=0.0)))
+                self.active = False
+                throw = self._finish(first + index)
+                if throw is not None:
+                    ended.append(throw)
+            elif self.last_end is None or (first + index - self.last_end) / self.grid_rate >= self.refractory:
+                self.active = True
+                self.onset = first + index
+                self.peak_acc = float(acc[index])
+                self.peak_emg = float(emg[index])
+            position = index + 1
+        if self.active:
+            start = max(0, self.onset - first)
+            self.peak_acc = max(self.peak_acc, float(acc[start:].max(initial=0.0)))
+            self.peak_emg = max(self.peak_emg, float(emg[start:].max(initial=0.0)))
+        return ended
+
+    def _finish(self, end):
+        if (end - self.onset) / self.grid_rate < self.min_duration:
+            return None
+        self.last_end = end
+        onset_time = self.onset / self.grid_rate
+        end_time = end / self.grid_rate
+        throw = {
+            'throw': len(self.throws) + 1,
+            'onset_time': onset_time,
+            'end_time': end_time,
+            'duration': end_time - onset_time,
+            'peak_acc': self.peak_acc,
+            'peak_emg': self.peak_emg,
+            'onset_samples': self._sample_index(onset_time),
+            'end_samples': self._sample_index(end_time),
+        }
+        self.throws.append(throw)
+        return throw
+
+    def _sample_index(self, t):
+        """First sample at or after time t of every packet channel"""
+        if self.clock is not None and len(self.clock) == len(self.channel_rates):
+            return self.clock.index(t, clip=False).tolist()
+        return [int(math.ceil(t * rate - 1e-9)) for rate in self.channel_rates]
+
+    def flush(self):
+        """End a throw still active at the end of the collection. Returns it (None if there is none)"""
+        if not self.active:
+            return None
+        self.active = False
+        return self._finish(self.frames)
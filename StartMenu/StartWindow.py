@@ -3,12 +3,15 @@ from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
 
+from AeroPy.TrignoBase import aeropy_ready
+
 
 class StartWindow(QWidget):
 
     def __init__(self, controller):
         QWidget.__init__(self)
         self.controller = controller
+        self.connecting = False
         grid = QGridLayout()
         self.setStyleSheet("background-color:#3d4c51;")
         self.setWindowTitle("Start Menu")
@@ -61,6 +64,15 @@ class StartWindow(QWidget):
 
     def Connect_Button_Callback(self):
         """Shows the Data Collector GUI window"""
+        if self.connecting:
+            return
+        if not aeropy_ready():
+            # DelsysAPI still loading in the background (TrignoBase.preload_aeropy), check again without blocking
+            self.connecting = True
+            self.error.setText("Loading Delsys API...")
+            QTimer.singleShot(100, self._retry_connect)
+            return
+        self.error.setText("")
         try:
             self.controller.showCollectData()
 
@@ -74,3 +86,7 @@ class StartWindow(QWidget):
             self.controller.startWindow.show()
             print(Exception)
 
+    def _retry_connect(self):
+        self.connecting = False
+        self.Connect_Button_Callback()
+
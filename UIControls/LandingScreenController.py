@@ -1,3 +1,6 @@
+from PySide6.QtCore import QTimer
+
+from AeroPy.TrignoBase import preload_aeropy
 from DataCollector.CollectDataWindow import CollectDataWindow
 from StartMenu.StartWindow import StartWindow
 
@@ -8,6 +11,8 @@ class LandingScreenController():
         self.collectWindow = CollectDataWindow(self)
 
         self.startWindow.show()
+        # The .NET runtime and DelsysAPI load in the background once the start window is up, Connect waits for them
+        QTimer.singleShot(0, preload_aeropy)
 
         self.curHeight = 900
         self.curWidth = 1400